@@ -0,0 +1,216 @@
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict
+from app.database import db
+
+
+class CacheBackend:
+    """
+    Giao diện backend cho cache đọc của model.
+    LRUCache chạy trong process; khi chạy nhiều worker có thể thay bằng
+    backend dùng chung (Redis, memcached...) cài đặt cùng các phương thức này.
+    """
+
+    def get(self, key):
+        """Trả về giá trị đã cache hoặc None nếu không có"""
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def delete(self, *keys):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+
+class LRUCache(CacheBackend):
+    """
+    Cache LRU + TTL trong process, giới hạn số phần tử, an toàn đa luồng.
+    max_bytes: giới hạn thêm tổng len(value) (cho value là bytes/str, vd: body đã nén)
+    """
+
+    def __init__(self, max_entries=10000, ttl=300, max_bytes=None):
+        self.max_entries = max(max_entries, 1)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (hết hạn lúc, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if self.ttl and expires_at < time.monotonic():
+                self._pop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def _size(self, value):
+        return len(value) if self.max_bytes is not None else 0
+
+    def _pop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= self._size(entry[1])
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0
+        size = self._size(value)
+        with self._lock:
+            self._pop(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = (expires_at, value)
+            self._bytes += size
+            while len(self._data) > self.max_entries or \
+                    (self.max_bytes is not None and self._bytes > self.max_bytes):
+                _, (_, evicted) = self._data.popitem(last=False)
+                self._bytes -= self._size(evicted)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                **({"bytes": self._bytes, "max_bytes": self.max_bytes} if self.max_bytes is not None else {}),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Phiên bản DataVersion mà request hiện tại đã dùng cho ETag ({scope: version},
+# check_etag đặt). db.run giữ contextvars nên model đọc được trong thread.
+version_snapshot = contextvars.ContextVar('version_snapshot', default=None)
+
+
+class ReadThroughCache:
+    """
+    Cache đọc cho các truy vấn model: get_or_load gọi loader khi cache miss
+    và lưu kết quả (không lưu None). Các hàm ghi gọi invalidate với cùng key.
+
+    Mỗi phần tử lưu kèm phiên bản các scope (`scopes`) lúc nạp. Worker khác
+    ghi dữ liệu không xóa được cache của process này, nên khi phiên bản trong
+    version_snapshot khác phiên bản đã lưu thì nạp lại: body trả về luôn mới
+    ít nhất bằng phiên bản trong ETag.
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+
+    def use_backend(self, backend: CacheBackend):
+        """Đổi backend (vd: cache dùng chung giữa các worker)"""
+        self.backend = backend
+
+    def get_or_load(self, key, loader, scopes=()):
+        snapshot = version_snapshot.get() or {}
+        stamp = {scope: snapshot[scope] for scope in scopes if scope in snapshot}
+        entry = self.backend.get(key)
+        if entry is not None:
+            loaded_at, value = entry
+            if all(loaded_at.get(scope) == version for scope, version in stamp.items()):
+                return value
+        value = loader()
+        if value is not None:
+            self.backend.set(key, (stamp, value))
+        return value
+
+    def invalidate(self, *keys):
+        self.backend.delete(*keys)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return self.backend.stats()
+
+
+class VersionStore:
+    """
+    Bộ đếm phiên bản theo scope (vd: "catalog", "product:5", "reviews") lưu
+    trong bảng DataVersion (migrations/006_data_versions.sql), tăng mỗi khi
+    dữ liệu của scope thay đổi. Mọi worker và lệnh CLI dùng chung bộ đếm nên
+    ETag tạo từ đây giống nhau giữa các process và đổi theo mọi lần ghi.
+    """
+
+    def get_many(self, scopes):
+        """Trả về {scope: version} bằng một câu SELECT (scope chưa từng đổi là 0)"""
+        scopes = list(scopes)
+        if not scopes:
+            return {}
+        placeholders = ", ".join(["%s"] * len(scopes))
+        rows = db.fetch_all(
+            f"SELECT scope, version FROM DataVersion WHERE scope IN ({placeholders})",
+            tuple(scopes)
+        )
+        found = {row['scope']: row['version'] for row in rows}
+        return {scope: found.get(scope, 0) for scope in scopes}
+
+    def get(self, scope):
+        return self.get_many([scope])[scope]
+
+    def bump(self, *scopes):
+        """
+        Tăng phiên bản các scope. Gọi sau khi transaction ghi dữ liệu đã commit
+        (để request đọc ETag mới luôn thấy dữ liệu mới).
+        """
+        # Sắp xếp để các lần bump đồng thời khóa dòng theo cùng thứ tự
+        scopes = sorted(set(scopes))
+        if not scopes:
+            return
+        values = ", ".join(["(%s, 1)"] * len(scopes))
+        try:
+            db.execute(
+                f"INSERT INTO DataVersion (scope, version) VALUES {values} "
+                "ON DUPLICATE KEY UPDATE version = version + 1",
+                tuple(scopes)
+            )
+        except Exception as e:
+            # Dữ liệu đã commit: không biến lần ghi thành lỗi, ETag cũ chỉ
+            # còn đúng đến lần bump kế tiếp
+            print(f"Không cập nhật được DataVersion {scopes}: {e}")
+
+
+# Cache dùng chung cho Product / ProductVariant
+# Usage: from app.cache import cache
+cache = ReadThroughCache(LRUCache(
+    max_entries=int(os.getenv('CACHE_MAX_ENTRIES', 10000)),
+    ttl=float(os.getenv('CACHE_TTL', 300)),
+))
+
+# Phiên bản dữ liệu catalog cho ETag
+# Usage: from app.cache import versions
+versions = VersionStore()
@@ -0,0 +1,56 @@
+"""
+Lệnh quản trị chạy ngoài API.
+
+Usage:
+    python -m app.cli rebuild-ratings
+    python -m app.cli rebuild-eligibility
+    python -m app.cli import-catalog products.csv --format csv
+"""
+import argparse
+
+
+def rebuild_ratings(args):
+    from app.models.rating_stats import RatingStats
+    result = RatingStats.rebuild()
+    print(f"Đã tính lại thống kê rating: {result['variants']} variant, {result['products']} sản phẩm")
+
+
+def rebuild_eligibility(args):
+    from app.models.purchase_eligibility import PurchaseEligibility
+    count = PurchaseEligibility.rebuild()
+    print(f"Đã tính lại quyền review: {count} cặp khách hàng / variant")
+
+
+def import_catalog(args):
+    from app.services.catalog_import import import_catalog as run_import
+    format = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    with open(args.path, encoding="utf-8-sig", newline="") as lines:
+        report = run_import(lines, format, args.chunk_size)
+    print(f"Đã tạo {report['created']} sản phẩm, {report['failed']} lỗi")
+    for error in report['errors']:
+        print(f"  dòng {error['row']}: {error['error']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Handicraft API admin commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("rebuild-ratings", help="Tính lại thống kê rating từ bảng Reviews") \
+        .set_defaults(func=rebuild_ratings)
+
+    subparsers.add_parser("rebuild-eligibility", help="Tính lại bảng PurchaseEligibility từ đơn hàng đã nhận") \
+        .set_defaults(func=rebuild_eligibility)
+
+    importer = subparsers.add_parser("import-catalog", help="Nhập sản phẩm từ file CSV/NDJSON")
+    importer.add_argument("path")
+    importer.add_argument("--format", choices=["ndjson", "csv"], default=None,
+                          help="Mặc định đoán theo đuôi file")
+    importer.add_argument("--chunk-size", type=int, default=500)
+    importer.set_defaults(func=import_catalog)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Middleware nén response (gzip, brotli nếu đã cài) theo Accept-Encoding.
+
+- Chỉ nén response có content-type dạng text/JSON và lớn hơn minimum_size.
+  Mọi response thuộc các content-type này đều có Vary: Accept-Encoding (kể
+  cả bản không nén) để cache trung gian không trả nhầm bản cho client khác.
+- Response có ETag (các trang catalog) được nén một lần rồi giữ bản nén
+  trong LRUCache theo (hash nội dung, encoding), giới hạn theo số phần tử và
+  tổng số byte; các lần sau cùng nội dung trả lại bản đã nén.
+- StreamingResponse (export catalog...) được nén từng chunk, flush sau mỗi
+  chunk để client vẫn nhận dữ liệu dần dần.
+- Số byte trước/sau khi nén được đếm trong compression_stats.
+"""
+import gzip
+import hashlib
+import os
+import threading
+import zlib
+from app.cache import LRUCache
+
+try:
+    import brotli
+except ImportError:  # brotli là tùy chọn, không có thì chỉ dùng gzip
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+)
+
+
+class CompressionStats:
+    """Bộ đếm dùng chung cho mọi instance middleware"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses = 0
+        self.streamed = 0
+        self.cache_hits = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def record(self, bytes_in, bytes_out, streamed=False, cache_hit=False):
+        with self._lock:
+            self.responses += 1
+            self.streamed += int(streamed)
+            self.cache_hits += int(cache_hit)
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+    def stats(self):
+        with self._lock:
+            return {
+                "responses": self.responses,
+                "streamed": self.streamed,
+                "cache_hits": self.cache_hits,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "bytes_saved": self.bytes_in - self.bytes_out,
+            }
+
+
+# Usage: from app.compression import compression_stats
+compression_stats = CompressionStats()
+
+
+def choose_encoding(accept_encoding: str):
+    """Chọn encoding tốt nhất client chấp nhận (br > gzip), None nếu không có"""
+    accepted = {}
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name] = quality
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    for encoding in candidates:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=min(level, 11))
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+class _StreamCompressor:
+    """Nén từng chunk của response streaming"""
+
+    def __init__(self, encoding: str, level: int):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=min(level, 11))
+        else:
+            # wbits 16+ để ghi header/trailer gzip
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        self.encoding = encoding
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def _header(headers, name: bytes):
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _with_vary(headers):
+    """Thêm Accept-Encoding vào header Vary (giữ các giá trị Vary sẵn có)"""
+    vary = _header(headers, b"vary")
+    if vary is None:
+        return list(headers) + [(b"vary", b"Accept-Encoding")]
+    if "accept-encoding" in vary.lower() or vary.strip() == "*":
+        return list(headers)
+    headers = [(k, v) for k, v in headers if k.lower() != b"vary"]
+    headers.append((b"vary", f"{vary}, Accept-Encoding".encode("latin-1")))
+    return headers
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware nén response.
+    Usage: app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    """
+
+    def __init__(self, app, minimum_size=None, level=None, cache_entries=None, cache_bytes=None):
+        self.app = app
+        self.minimum_size = int(minimum_size if minimum_size is not None
+                                else os.getenv('COMPRESSION_MIN_SIZE', 1024))
+        self.level = int(level if level is not None else os.getenv('COMPRESSION_LEVEL', 6))
+        entries = int(cache_entries if cache_entries is not None
+                      else os.getenv('COMPRESSION_CACHE_ENTRIES', 1000))
+        max_bytes = int(cache_bytes if cache_bytes is not None
+                        else os.getenv('COMPRESSION_CACHE_BYTES', 32 * 1024 * 1024))
+        # Bản nén theo (hash nội dung, encoding): không bao giờ lệch với body vừa render
+        self.cache = LRUCache(max_entries=entries, ttl=0, max_bytes=max_bytes) \
+            if entries > 0 and max_bytes > 0 else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = dict(scope.get("headers") or [])
+        # encoding None: client không nhận bản nén, vẫn đi qua responder để có Vary
+        encoding = choose_encoding(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start_message = None
+        self.compressor = None
+        self.passthrough = False
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def _should_compress(self, headers) -> bool:
+        if _header(headers, b"content-encoding"):
+            return False
+        content_type = _header(headers, b"content-type") or ""
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def _compressed_headers(self, body_length=None):
+        headers = [
+            (key, value) for key, value in self.start_message["headers"]
+            if key.lower() not in (b"content-length", b"content-encoding", b"etag")
+        ]
+        etag = _header(self.start_message["headers"], b"etag")
+        if etag:
+            # Bản nén không giống từng byte bản gốc nên ETag chuyển sang dạng yếu
+            headers.append((b"etag", (etag if etag.startswith("W/") else "W/" + etag).encode("latin-1")))
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        headers = _with_vary(headers)
+        if body_length is not None:
+            headers.append((b"content-length", str(body_length).encode("latin-1")))
+        return headers
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            headers = message.get("headers") or []
+            if message.get("status", 200) < 200 or message.get("status") in (204, 304) \
+                    or not self._should_compress(headers):
+                self.passthrough = True
+                await self._send(message)
+            elif self.encoding is None:
+                self.passthrough = True
+                await self._send(self._uncompressed_start())
+            return
+
+        if self.passthrough or message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None and not more_body:
+            await self._send_whole(body)
+            return
+
+        # Response streaming: nén từng chunk
+        if self.compressor is None:
+            self.compressor = _StreamCompressor(self.encoding, self.middleware.level)
+            await self._send({**self.start_message, "headers": self._compressed_headers()})
+        self.bytes_in += len(body)
+        data = self.compressor.chunk(body) if body else b""
+        if not more_body:
+            data += self.compressor.finish()
+        self.bytes_out += len(data)
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+        if not more_body:
+            compression_stats.record(self.bytes_in, self.bytes_out, streamed=True)
+
+    def _uncompressed_start(self):
+        """Start message của bản không nén, có Vary: Accept-Encoding"""
+        return {**self.start_message, "headers": _with_vary(self.start_message.get("headers") or [])}
+
+    async def _send_whole(self, body: bytes):
+        if len(body) < self.middleware.minimum_size:
+            await self._send(self._uncompressed_start())
+            await self._send({"type": "http.response.body", "body": body})
+            return
+
+        cache = self.middleware.cache
+        status = self.start_message.get("status", 200)
+        etag = _header(self.start_message["headers"], b"etag")
+        key = None
+        if cache is not None and etag and status == 200:
+            # Khóa theo chính body vừa render, không theo ETag: hai body khác
+            # nhau có cùng ETag (dữ liệu đổi mà phiên bản chưa kịp tăng) vẫn
+            # nhận đúng bản nén của mình. Hash rẻ hơn nhiều so với nén lại.
+            key = f"{hashlib.sha1(body).hexdigest()}|{self.encoding}"
+
+        compressed = cache.get(key) if key else None
+        cache_hit = compressed is not None
+        if compressed is None:
+            compressed = compress(body, self.encoding, self.middleware.level)
+            if key:
+                cache.set(key, compressed)
+
+        if len(compressed) >= len(body):
+            # Nén không lợi hơn thì gửi bản gốc
+            await self._send(self._uncompressed_start())
+            await self._send({"type": "http.response.body", "body": body})
+            return
+
+        compression_stats.record(len(body), len(compressed), cache_hit=cache_hit)
+        await self._send({**self.start_message, "headers": self._compressed_headers(len(compressed))})
+        await self._send({"type": "http.response.body", "body": compressed})
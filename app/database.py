@@ -1,86 +1,511 @@
 import os
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import pymysql
 from dotenv import load_dotenv
+from app.query_stats import record_query
 
 # Load biến môi trường từ file .env
 load_dotenv()
 
+# Kích thước tối đa (byte) của một câu INSERT nhiều dòng do Transaction.insert_many
+# tự ghép, nhỏ hơn max_allowed_packet của server
+MAX_INSERT_BYTES = int(os.getenv('DB_MAX_INSERT_BYTES', 512 * 1024))
+
+
+class InstrumentedDictCursor(pymysql.cursors.DictCursor):
+    """DictCursor ghi thời gian mỗi câu lệnh vào thống kê SQL của request (app.query_stats)"""
+
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            record_query(query, started)
+
+
+class InstrumentedSSDictCursor(pymysql.cursors.SSDictCursor):
+    """SSDictCursor có đo thời gian (chỉ tính lúc gửi câu lệnh, không tính đọc dần kết quả)"""
+
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            record_query(query, started)
+
+
+# Mã lỗi client MySQL khi kết nối đã mất: CR_SERVER_GONE_ERROR, CR_SERVER_LOST,
+# CR_SERVER_LOST_EXTENDED
+CONNECTION_LOST_ERRORS = (2006, 2013, 2055)
+
+
+def is_connection_lost(error):
+    """Lỗi cho biết kết nối không dùng lại được nữa"""
+    if isinstance(error, pymysql.err.InterfaceError):
+        return True
+    return (isinstance(error, pymysql.err.OperationalError)
+            and bool(error.args) and error.args[0] in CONNECTION_LOST_ERRORS)
+
+
+class PoolTimeoutError(Exception):
+    """Không lấy được kết nối từ pool trong thời gian cho phép"""
+
+
+class ConnectionPool:
+    """
+    Pool kết nối MySQL có giới hạn, an toàn khi dùng từ nhiều thread.
+
+    - min_size: số kết nối được mở sẵn ở lần dùng đầu tiên
+    - max_size: số kết nối tối đa (đang dùng + đang rảnh)
+    - timeout: số giây tối đa chờ khi pool đã hết kết nối
+    - recycle: kết nối rảnh quá số giây này sẽ bị đóng và mở lại
+    - ping_after: chỉ ping kết nối đã rảnh quá số giây này trước khi dùng lại;
+      kết nối vừa trả về pool được dùng ngay, nếu đã chết thì lỗi của câu
+      lệnh đầu tiên làm nó bị loại khỏi pool (Database.connection)
+    """
+
+    def __init__(self, connect_kwargs, min_size=1, max_size=10, timeout=10.0, recycle=3600, ping_after=30):
+        self.connect_kwargs = connect_kwargs
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self._idle = []  # [(connection, thời điểm trả về pool)]
+        self._size = 0
+        self._in_use = 0
+        self._condition = threading.Condition(threading.Lock())
+        self._started = False
+        # Thống kê để điều chỉnh kích thước pool khi chạy tải
+        self._waits = 0
+        self._wait_time = 0.0
+        self._created = 0
+        self._discarded = 0
+        self._pings = 0
+
+    def _create_connection(self):
+        connection = pymysql.connect(**self.connect_kwargs)
+        with self._condition:
+            self._created += 1
+        return connection
+
+    def _start(self):
+        """Mở sẵn min_size kết nối ở lần dùng đầu tiên"""
+        with self._condition:
+            if self._started:
+                return
+            self._started = True
+            missing = max(self.min_size - self._size, 0)
+            self._size += missing
+        opened = []
+        try:
+            for _ in range(missing):
+                opened.append((self._create_connection(), time.monotonic()))
+        finally:
+            with self._condition:
+                self._size -= missing - len(opened)
+                self._idle.extend(opened)
+                self._condition.notify_all()
+
+    def _is_usable(self, connection, released_at):
+        """Kiểm tra kết nối rảnh trước khi dùng lại (recycle + ping nếu rảnh lâu)"""
+        idle_for = time.monotonic() - released_at
+        if self.recycle and idle_for > self.recycle:
+            return False
+        if idle_for <= self.ping_after:
+            return True
+        with self._condition:
+            self._pings += 1
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _close_quietly(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Lấy một kết nối từ pool, chờ tối đa `timeout` giây nếu pool đã đầy"""
+        if not self._started:
+            self._start()
+        deadline = None
+        waited_since = None
+        while True:
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    if waited_since is None:
+                        waited_since = time.monotonic()
+                        deadline = waited_since + self.timeout
+                        self._waits += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._wait_time += time.monotonic() - waited_since
+                        raise PoolTimeoutError(
+                            f"Hết thời gian chờ kết nối database ({self.timeout}s)"
+                        )
+                    self._condition.wait(remaining)
+                if waited_since is not None:
+                    self._wait_time += time.monotonic() - waited_since
+                    waited_since = None
+                if self._idle:
+                    # LIFO: dùng lại kết nối vừa trả để các kết nối cũ được recycle
+                    connection, released_at = self._idle.pop()
+                    self._in_use += 1
+                else:
+                    connection, released_at = None, None
+                    self._size += 1
+                    self._in_use += 1
+
+            if connection is None:
+                try:
+                    return self._create_connection()
+                except Exception:
+                    with self._condition:
+                        self._size -= 1
+                        self._in_use -= 1
+                        self._condition.notify()
+                    raise
+
+            if self._is_usable(connection, released_at):
+                return connection
+
+            # Kết nối đã chết hoặc quá cũ: bỏ đi và thử lại
+            self._close_quietly(connection)
+            with self._condition:
+                self._size -= 1
+                self._in_use -= 1
+                self._discarded += 1
+                self._condition.notify()
+
+    def release(self, connection, discard=False):
+        """Trả kết nối về pool; discard=True để đóng hẳn kết nối lỗi"""
+        if discard:
+            self._close_quietly(connection)
+        with self._condition:
+            self._in_use -= 1
+            if discard:
+                self._size -= 1
+                self._discarded += 1
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def close(self):
+        """Đóng toàn bộ kết nối đang rảnh"""
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._started = False
+        for connection, _ in idle:
+            self._close_quietly(connection)
+
+    def stats(self):
+        """Thống kê pool: số kết nối đang dùng, rảnh, số lần phải chờ và tổng thời gian chờ"""
+        with self._condition:
+            return {
+                "size": self._size,
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waits": self._waits,
+                "wait_time": round(self._wait_time, 6),
+                "created": self._created,
+                "discarded": self._discarded,
+                "pings": self._pings,
+            }
+
+
+class Transaction:
+    """Chạy nhiều câu lệnh trên cùng một kết nối, commit một lần khi kết thúc"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = connection.cursor()
+        self.callbacks = []
+        self._id_step = None
+
+    def on_commit(self, func, *args):
+        """Hẹn gọi func(*args) sau khi transaction commit thành công (vd: xóa cache)"""
+        self.callbacks.append((func, args))
+
+    def execute(self, query, params=None):
+        """Thực thi câu lệnh, trả về số dòng bị ảnh hưởng"""
+        return self.cursor.execute(query, params or ())
+
+    def insert(self, query, params=None):
+        """Thực thi câu INSERT, trả về id (AUTO_INCREMENT) của dòng vừa tạo"""
+        self.cursor.execute(query, params or ())
+        return self.cursor.lastrowid
+
+    def execute_many(self, query, seq_of_params):
+        """
+        Thực thi một câu lệnh với nhiều bộ tham số. Với INSERT ... VALUES,
+        pymysql gộp thành một câu INSERT nhiều dòng.
+        Trả về số dòng bị ảnh hưởng
+        """
+        return self.cursor.executemany(query, list(seq_of_params))
+
+    def insert_many(self, query, seq_of_params, max_bytes=None):
+        """
+        Thêm nhiều dòng bằng INSERT ... VALUES nhiều dòng, trả về list id
+        (AUTO_INCREMENT) theo đúng thứ tự các dòng.
+
+        Các dòng được tự ghép thành từng câu INSERT không quá max_bytes
+        (mặc định DB_MAX_INSERT_BYTES). Id của mỗi câu lấy từ lastrowid của
+        chính câu đó (id dòng đầu), các dòng sau cách nhau
+        auto_increment_increment. Không dựa vào executemany vì pymysql tự chia
+        câu quá dài mà chỉ giữ lastrowid của câu cuối.
+        """
+        match = pymysql.cursors.RE_INSERT_VALUES.match(query)
+        if not match:
+            raise ValueError("insert_many needs an INSERT ... VALUES (...) query")
+        prefix, values, postfix = match.group(1, 2, 3)
+        max_bytes = max_bytes or MAX_INSERT_BYTES
+        if self._id_step is None:
+            row = self.fetch_one("SELECT @@auto_increment_increment AS step")
+            self._id_step = int(row['step'])
+
+        ids = []
+        batch, size = [], 0
+
+        def flush():
+            count = self.cursor.execute(prefix + ",".join(batch) + postfix)
+            if count != len(batch):
+                raise RuntimeError(f"Expected {len(batch)} inserted rows, got {count}")
+            first_id = self.cursor.lastrowid
+            ids.extend(first_id + index * self._id_step for index in range(len(batch)))
+
+        for params in seq_of_params:
+            row = self.cursor.mogrify(values, params)
+            row_size = len(row.encode("utf-8")) + 1
+            if batch and size + row_size > max_bytes:
+                flush()
+                batch, size = [], 0
+            batch.append(row)
+            size += row_size
+        if batch:
+            flush()
+        return ids
+
+    @property
+    def lastrowid(self):
+        return self.cursor.lastrowid
+
+    def fetch_all(self, query, params=None):
+        self.cursor.execute(query, params or ())
+        return self.cursor.fetchall()
+
+    def fetch_one(self, query, params=None):
+        self.cursor.execute(query, params or ())
+        return self.cursor.fetchone()
+
+    def close(self):
+        self.cursor.close()
+
+
 class Database:
     def __init__(self):
         self.host = os.getenv('DB_HOST')
         self.user = os.getenv('DB_USER')
         self.password = os.getenv('DB_PASSWORD')
         self.db = os.getenv('DB_NAME')
-        self.connection = None
-        self.cursor = None
+        self.pool = ConnectionPool(
+            {
+                "host": self.host,
+                "user": self.user,
+                "password": self.password,
+                "db": self.db,
+                "charset": 'utf8mb4',
+                "cursorclass": InstrumentedDictCursor,
+                # Tránh giữ snapshot cũ khi kết nối được dùng lại từ pool
+                "autocommit": True,
+            },
+            min_size=int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+            max_size=int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            timeout=float(os.getenv('DB_POOL_TIMEOUT', 10)),
+            recycle=float(os.getenv('DB_POOL_RECYCLE', 3600)),
+            ping_after=float(os.getenv('DB_POOL_PING_AFTER', 30)),
+        )
+        # Executor riêng cho các route async: số thread bằng số kết nối tối đa
+        # để thread không phải xếp hàng chờ pool
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('DB_EXECUTOR_WORKERS', self.pool.max_size)),
+            thread_name_prefix='db'
+        )
+        self.call_timeout = float(os.getenv('DB_CALL_TIMEOUT', 30))
 
-    def connect(self):
-        """Thiết lập kết nối với database"""
+    @contextmanager
+    def connection(self):
+        """Mượn một kết nối từ pool trong phạm vi khối with"""
         try:
-            if not self.connection:
-                self.connection = pymysql.connect(
-                    host=self.host,
-                    user=self.user,
-                    password=self.password,
-                    db=self.db,
-                    charset='utf8mb4',
-                    cursorclass=pymysql.cursors.DictCursor
-                )
-                self.cursor = self.connection.cursor()
-                print("Kết nối database thành công!")
+            connection = self.pool.acquire()
         except Exception as e:
             print(f"Lỗi kết nối database: {e}")
             raise
+        discard = False
+        try:
+            yield connection
+        except Exception as e:
+            # Server đã đóng kết nối (rảnh quá wait_timeout, restart...): bỏ kết nối
+            discard = is_connection_lost(e)
+            try:
+                connection.rollback()
+            except Exception:
+                # Không rollback được nghĩa là kết nối đã hỏng
+                discard = True
+            raise
+        finally:
+            self.pool.release(connection, discard=discard)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Mở transaction trên một kết nối từ pool.
+        Commit khi khối with kết thúc bình thường, rollback nếu có exception.
+
+        Usage:
+            with db.transaction() as tx:
+                tx.execute(...)
+        """
+        with self.connection() as connection:
+            connection.begin()
+            tx = Transaction(connection)
+            try:
+                yield tx
+                connection.commit()
+            finally:
+                tx.close()
+        for func, args in tx.callbacks:
+            func(*args)
 
     def disconnect(self):
-        """Đóng kết nối database"""
-        if self.connection:
-            self.cursor.close()
-            self.connection.close()
-            self.connection = None
-            self.cursor = None
-            print("Đã đóng kết nối database!")
+        """Đóng các kết nối database đang rảnh trong pool"""
+        self.pool.close()
+
+    def pool_stats(self):
+        """Thống kê pool kết nối"""
+        return self.pool.stats()
+
+    async def run(self, func, *args, timeout=None, **kwargs):
+        """
+        Chạy một hàm truy vấn blocking (vd: Product.get_by_id) trong executor
+        để không chặn event loop của uvicorn.
+
+        timeout: số giây tối đa chờ kết quả (mặc định DB_CALL_TIMEOUT).
+        Hết thời gian sẽ raise asyncio.TimeoutError; truy vấn đang chạy vẫn
+        hoàn tất trong thread của nó rồi trả kết nối về pool.
+        """
+        loop = asyncio.get_running_loop()
+        # Giữ contextvars của request khi chạy trong thread khác
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, func, *args, **kwargs)
+        return await asyncio.wait_for(
+            loop.run_in_executor(self.executor, call),
+            timeout if timeout is not None else self.call_timeout
+        )
 
     def execute_query(self, query, params=None):
         """Thực thi câu truy vấn SQL"""
         try:
-            self.connect()
-            self.cursor.execute(query, params or ())
-            self.connection.commit()
-            return True
+            with self.connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(query, params or ())
+                connection.commit()
+                return True
         except Exception as e:
-            self.connection.rollback()
             print(f"Lỗi thực thi truy vấn: {e}")
             raise
-        finally:
-            self.disconnect()
+
+    def execute(self, query, params=None):
+        """Thực thi câu UPDATE/DELETE, trả về số dòng bị thay đổi"""
+        try:
+            with self.connection() as connection:
+                with connection.cursor() as cursor:
+                    return cursor.execute(query, params or ())
+        except Exception as e:
+            print(f"Lỗi thực thi truy vấn: {e}")
+            raise
+
+    def insert(self, query, params=None):
+        """Thực thi câu INSERT, trả về id của dòng vừa tạo"""
+        try:
+            with self.connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(query, params or ())
+                    return cursor.lastrowid
+        except Exception as e:
+            print(f"Lỗi thực thi truy vấn: {e}")
+            raise
+
+    def execute_many(self, query, seq_of_params):
+        """Thực thi một câu lệnh với nhiều bộ tham số trong một transaction"""
+        with self.transaction() as tx:
+            return tx.execute_many(query, seq_of_params)
 
     def fetch_all(self, query, params=None):
         """Lấy tất cả kết quả từ câu truy vấn SELECT"""
         try:
-            self.connect()
-            self.cursor.execute(query, params or ())
-            return self.cursor.fetchall()
+            with self.connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(query, params or ())
+                    return cursor.fetchall()
         except Exception as e:
             print(f"Lỗi truy vấn dữ liệu: {e}")
             raise
+
+    def stream(self, query, params=None, chunk_size=1000):
+        """
+        Generator đọc kết quả SELECT bằng server-side cursor (SSDictCursor),
+        trả về từng list tối đa chunk_size dòng. Không nạp toàn bộ kết quả
+        vào bộ nhớ; kết nối chỉ bị giữ trong lúc generator còn chạy.
+        """
+        try:
+            connection = self.pool.acquire()
+        except Exception as e:
+            print(f"Lỗi kết nối database: {e}")
+            raise
+        exhausted = False
+        cursor = None
+        try:
+            cursor = connection.cursor(InstrumentedSSDictCursor)
+            cursor.execute(query, params or ())
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    exhausted = True
+                    break
+                yield rows
         finally:
-            self.disconnect()
+            if exhausted:
+                cursor.close()
+                self.pool.release(connection)
+            else:
+                # Dừng giữa chừng (lỗi, client ngắt kết nối): phần kết quả còn lại
+                # vẫn nằm trên kết nối, đóng hẳn thay vì đọc hết cho bỏ đi
+                self.pool.release(connection, discard=True)
 
     def fetch_one(self, query, params=None):
         """Lấy một kết quả từ câu truy vấn SELECT"""
         try:
-            self.connect()
-            self.cursor.execute(query, params or ())
-            return self.cursor.fetchone()
+            with self.connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(query, params or ())
+                    return cursor.fetchone()
         except Exception as e:
             print(f"Lỗi truy vấn dữ liệu: {e}")
             raise
-        finally:
-            self.disconnect()
 
 
 # Module-level instance for easy imports from other modules
 # Usage: from app.database import db
 db = Database()
-
@@ -0,0 +1,54 @@
+from typing import Optional
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError
+from app.security import verify_access_token_cached
+
+# auto_error=False: các route review vẫn nhận access_token trong body (cách cũ)
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def principal_from_token(token: str) -> dict:
+    """Xác thực token và trả về principal {id, role, name}"""
+    try:
+        payload = verify_access_token_cached(token)
+        return {
+            "id": int(payload.get("sub")),
+            "role": payload.get("role"),
+            "name": payload.get("name"),
+        }
+    except (JWTError, TypeError, ValueError) as e:
+        raise _unauthorized(f"Could not validate credentials: {str(e)}")
+
+
+def get_optional_principal(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
+) -> Optional[dict]:
+    """Principal từ header Authorization: Bearer <token>, None nếu không có header"""
+    if credentials is None:
+        return None
+    return principal_from_token(credentials.credentials)
+
+
+def get_current_principal(principal: Optional[dict] = Depends(get_optional_principal)) -> dict:
+    """Principal bắt buộc từ header Authorization: Bearer <token>"""
+    if principal is None:
+        raise _unauthorized("Not authenticated")
+    return principal
+
+
+def resolve_principal(principal: Optional[dict], body_token: Optional[str] = None) -> dict:
+    """Ưu tiên principal từ header, nếu không có thì dùng access_token trong body"""
+    if principal is not None:
+        return principal
+    if not body_token:
+        raise _unauthorized("Not authenticated")
+    return principal_from_token(body_token)
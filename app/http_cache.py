@@ -0,0 +1,67 @@
+"""
+ETag / GET có điều kiện cho các endpoint catalog.
+
+ETag được tính từ đường dẫn + query string của request và phiên bản của
+các scope dữ liệu liên quan (app.cache.versions, bảng DataVersion): một câu
+SELECT theo khóa chính thay cho các truy vấn của route. Khi If-None-Match
+khớp, route trả 304 ngay trước khi truy vấn dữ liệu. Các phiên bản này cũng
+được ghi vào app.cache.version_snapshot để cache đọc trong process không
+trả body cũ hơn ETag.
+"""
+import hashlib
+import os
+from fastapi import Request, Response
+from app.cache import version_snapshot, versions
+from app.database import db
+
+# Đổi ETAG_SALT khi định dạng response thay đổi (deploy) để client không giữ
+# bản cũ có cùng phiên bản dữ liệu
+ETAG_SALT = os.getenv('ETAG_SALT', '')
+
+# Chính sách Cache-Control theo route, đổi được qua biến môi trường.
+# Mặc định "no-cache": client/CDN được lưu nhưng phải hỏi lại bằng ETag.
+CACHE_CONTROL = {
+    "products": os.getenv('CACHE_CONTROL_PRODUCTS', 'public, no-cache'),
+    "product": os.getenv('CACHE_CONTROL_PRODUCT', 'public, no-cache'),
+    "variants": os.getenv('CACHE_CONTROL_VARIANTS', 'public, no-cache'),
+    "reviews": os.getenv('CACHE_CONTROL_REVIEWS', 'public, no-cache'),
+}
+
+
+def make_etag(request: Request, scope_versions: dict) -> str:
+    """ETag mạnh cho request hiện tại theo phiên bản của các scope ({scope: version})"""
+    stamp = ":".join(
+        [ETAG_SALT, request.url.path, request.url.query]
+        + [f"{scope}={version}" for scope, version in sorted(scope_versions.items())]
+    )
+    return '"' + hashlib.sha1(stamp.encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    """So khớp If-None-Match (so sánh yếu theo RFC 9110, hỗ trợ danh sách và *)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+async def check_etag(request: Request, response: Response, route: str, *scopes):
+    """
+    Gắn ETag và Cache-Control cho response của route.
+    Trả về (headers, Response 304 nếu client đã có bản mới nhất, ngược lại None)
+    """
+    scope_versions = await db.run(versions.get_many, scopes)
+    # Cache đọc của model so với cùng phiên bản này (xem ReadThroughCache)
+    version_snapshot.set(scope_versions)
+    headers = {"ETag": make_etag(request, scope_versions), "Cache-Control": CACHE_CONTROL[route]}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return headers, Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return headers, None
@@ -0,0 +1,383 @@
+"""
+Metrics dạng Prometheus text cho GET /metrics.
+
+- Độ trễ request theo route (histogram), số request theo status, số request
+  đang xử lý: MetricsMiddleware.
+- Độ trễ SQL theo loại câu lệnh ("SELECT Products", "UPDATE ProductVariant"...):
+  lắng nghe app.query_stats.
+- Pool kết nối, hàng đợi bcrypt, các cache: đọc stats() lúc scrape.
+
+Ghi metric không dùng lock: mỗi thread (event loop, các thread của db
+executor) cộng vào bản riêng của nó, lúc scrape mới gộp lại.
+
+Chạy nhiều worker (uvicorn --workers / gunicorn): đặt METRICS_MULTIPROC_DIR
+là một thư mục dùng chung. Mỗi worker ghi snapshot của mình vào
+<dir>/<pid>.json mỗi METRICS_FLUSH_INTERVAL giây; /metrics ở bất kỳ worker
+nào cũng gộp snapshot của mọi worker còn sống.
+"""
+import bisect
+import json
+import os
+import re
+import threading
+import time
+from app import query_stats
+
+MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR')
+FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+# Snapshot không được cập nhật quá lâu coi như worker đã chết
+STALE_AFTER = float(os.getenv('METRICS_STALE_AFTER', 60))
+
+# Gauge mô tả bản sao dữ liệu dùng chung mà mỗi worker giữ riêng (chỉ mục
+# catalog): gộp bằng max thay vì cộng, nếu không sẽ lớn gấp N lần số worker
+MAX_MERGED = {"catalog_index_products", "catalog_index_dirty"}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _label_key(labels: dict) -> str:
+    return json.dumps(sorted(labels.items()))
+
+
+class _Sharded:
+    """Mỗi thread ghi vào dict riêng; collect() gộp các dict lại"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+
+    def _series(self):
+        series = getattr(self._local, "series", None)
+        if series is None:
+            series = self._local.series = {}
+            self._shards.append(series)
+        return series
+
+
+class Counter(_Sharded):
+    type = "counter"
+
+    def __init__(self, name, help):
+        super().__init__()
+        self.name = name
+        self.help = help
+
+    def inc(self, labels: dict, value=1):
+        series = self._series()
+        key = _label_key(labels)
+        series[key] = series.get(key, 0) + value
+
+    def collect(self):
+        merged = {}
+        for shard in list(self._shards):
+            for key, value in dict(shard).items():
+                merged[key] = merged.get(key, 0) + value
+        return merged
+
+
+class Histogram(_Sharded):
+    type = "histogram"
+
+    def __init__(self, name, help, buckets):
+        super().__init__()
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels: dict, value):
+        series = self._series()
+        key = _label_key(labels)
+        entry = series.get(key)
+        if entry is None:
+            # số lần rơi vào từng bucket (không cộng dồn), bucket +Inf, sum, count
+            entry = series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-2] += value
+        entry[-1] += 1
+
+    def collect(self):
+        merged = {}
+        for shard in list(self._shards):
+            for key, entry in dict(shard).items():
+                entry = list(entry)
+                if key in merged:
+                    merged[key] = [a + b for a, b in zip(merged[key], entry)]
+                else:
+                    merged[key] = entry
+        return merged
+
+
+http_requests = Counter("http_requests_total", "HTTP requests by route and status")
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency by route", LATENCY_BUCKETS)
+db_latency = Histogram("db_query_duration_seconds", "SQL statement latency by statement", DB_BUCKETS)
+_in_flight = [0]
+
+_STATEMENT_TABLE = {
+    "UPDATE": re.compile(r"^UPDATE\s+`?(\w+)", re.IGNORECASE),
+    "INSERT": re.compile(r"\bINTO\s+`?(\w+)", re.IGNORECASE),
+    "REPLACE": re.compile(r"\bINTO\s+`?(\w+)", re.IGNORECASE),
+}
+_FROM_TABLE = re.compile(r"\bFROM\s+`?(\w+)", re.IGNORECASE)
+_statement_names = {}
+
+
+def statement_name(sql: str) -> str:
+    """Tên ngắn của câu lệnh: động từ + bảng chính (vd: "SELECT Products")"""
+    name = _statement_names.get(sql)
+    if name is None:
+        verb = sql.split(None, 1)[0].upper() if sql.strip() else ""
+        match = _STATEMENT_TABLE.get(verb, _FROM_TABLE).search(sql)
+        name = f"{verb} {match.group(1)}" if match else verb
+        if len(_statement_names) < 5000:
+            _statement_names[sql] = name
+    return name
+
+
+def observe_query(sql, duration):
+    db_latency.observe({"statement": statement_name(sql)}, duration)
+
+
+query_stats.listeners.append(observe_query)
+
+
+def _gauge_samples():
+    """Các giá trị đọc lúc scrape: (tên, kiểu, mô tả, labels, giá trị)"""
+    from app.database import db
+    from app.cache import cache
+    from app.security import password_hasher, token_cache
+    from app.compression import compression_stats
+    from app.models.purchase_eligibility import PurchaseEligibility
+    from app.services.search import search_index
+    from app.services.facets import facet_index
+
+    samples = [("http_requests_in_flight", "gauge", "HTTP requests being served", {}, _in_flight[0])]
+
+    pool = db.pool_stats()
+    samples += [
+        ("db_pool_connections", "gauge", "Connections in the pool by state", {"state": "in_use"}, pool["in_use"]),
+        ("db_pool_connections", "gauge", "Connections in the pool by state", {"state": "idle"}, pool["idle"]),
+        ("db_pool_max_connections", "gauge", "Pool size limit", {}, pool["max_size"]),
+        ("db_pool_waits_total", "counter", "Acquires that had to wait for a connection", {}, pool["waits"]),
+        ("db_pool_wait_seconds_total", "counter", "Time spent waiting for a connection", {}, pool["wait_time"]),
+        ("db_pool_discarded_total", "counter", "Connections closed as broken or stale", {}, pool["discarded"]),
+        ("db_pool_pings_total", "counter", "Pings of connections idle longer than DB_POOL_PING_AFTER", {}, pool["pings"]),
+    ]
+
+    hasher = password_hasher.stats()
+    samples += [
+        ("password_hash_pending", "gauge", "bcrypt jobs queued or running", {}, hasher["pending"]),
+        ("password_hash_queue_size", "gauge", "bcrypt queue limit", {}, hasher["queue_size"]),
+        ("password_hash_rejected_total", "counter", "bcrypt jobs rejected because the queue was full", {}, hasher["rejected"]),
+    ]
+
+    for name, stats in (("catalog", cache.stats()), ("token", token_cache.stats()),
+                        ("eligibility", PurchaseEligibility.stats())):
+        labels = {"cache": name}
+        samples += [
+            ("cache_hits_total", "counter", "Cache hits", labels, stats.get("hits", 0)),
+            ("cache_misses_total", "counter", "Cache misses", labels, stats.get("misses", 0)),
+            ("cache_entries", "gauge", "Entries in cache", labels, stats.get("entries", 0)),
+        ]
+
+    compression = compression_stats.stats()
+    samples += [
+        ("compression_responses_total", "counter", "Compressed responses", {}, compression["responses"]),
+        ("compression_cache_hits_total", "counter", "Compressed bodies served from cache", {}, compression["cache_hits"]),
+        ("compression_bytes_in_total", "counter", "Response bytes before compression", {}, compression["bytes_in"]),
+        ("compression_bytes_out_total", "counter", "Response bytes after compression", {}, compression["bytes_out"]),
+    ]
+
+    for name, index in (("search", search_index), ("facet", facet_index)):
+        stats = index.stats()
+        labels = {"index": name}
+        samples += [
+            ("catalog_index_products", "gauge", "Products in the in-memory catalog index", labels, stats["products"]),
+            ("catalog_index_dirty", "gauge", "Products waiting to be refreshed in the index", labels, stats["dirty"]),
+        ]
+    return samples
+
+
+def snapshot():
+    """Toàn bộ metric của worker hiện tại dạng dict (ghi được ra JSON)"""
+    metrics = {}
+    for metric in (http_requests, http_latency, db_latency):
+        metrics[metric.name] = {
+            "type": metric.type,
+            "help": metric.help,
+            "buckets": list(getattr(metric, "buckets", ())),
+            "samples": metric.collect(),
+        }
+    for name, kind, help, labels, value in _gauge_samples():
+        entry = metrics.setdefault(name, {"type": kind, "help": help, "buckets": [], "samples": {}})
+        entry["samples"][_label_key(labels)] = value
+    return metrics
+
+
+def merge(snapshots):
+    """Cộng các snapshot của nhiều worker (metric trong MAX_MERGED lấy max)"""
+    merged = {}
+    for metrics in snapshots:
+        for name, entry in metrics.items():
+            target = merged.setdefault(name, {**entry, "samples": {}})
+            for key, value in entry["samples"].items():
+                if key not in target["samples"]:
+                    target["samples"][key] = value
+                elif name in MAX_MERGED:
+                    target["samples"][key] = max(target["samples"][key], value)
+                elif isinstance(value, list):
+                    target["samples"][key] = [a + b for a, b in zip(target["samples"][key], value)]
+                else:
+                    target["samples"][key] += value
+    return merged
+
+
+def _format_labels(key, extra=None):
+    pairs = json.loads(key) + (extra or [])
+    if not pairs:
+        return ""
+    body = ",".join(
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in pairs
+    )
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(metrics) -> str:
+    """Chuyển metric sang Prometheus text format (0.0.4)"""
+    lines = []
+    for name in sorted(metrics):
+        entry = metrics[name]
+        lines.append(f"# HELP {name} {entry['help']}")
+        lines.append(f"# TYPE {name} {entry['type']}")
+        for key, value in sorted(entry["samples"].items()):
+            if entry["type"] == "histogram":
+                cumulative = 0
+                for bound, count in zip(entry["buckets"] + ["+Inf"], value[:-2]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key, [['le', bound]])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(value[-2])}")
+                lines.append(f"{name}_count{_format_labels(key)} {value[-1]}")
+            else:
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+
+    # Tỉ lệ hit tính sau khi gộp, không cộng được giữa các worker
+    hits = metrics.get("cache_hits_total", {}).get("samples", {})
+    misses = metrics.get("cache_misses_total", {}).get("samples", {})
+    if hits:
+        lines.append("# HELP cache_hit_ratio Cache hits / lookups")
+        lines.append("# TYPE cache_hit_ratio gauge")
+        for key in sorted(hits):
+            lookups = hits[key] + misses.get(key, 0)
+            ratio = hits[key] / lookups if lookups else 0.0
+            lines.append(f"cache_hit_ratio{_format_labels(key)} {round(ratio, 4)}")
+    return "\n".join(lines) + "\n"
+
+
+# --- Nhiều worker ---
+
+def _snapshot_path(pid=None):
+    return os.path.join(MULTIPROC_DIR, f"{pid or os.getpid()}.json")
+
+
+def write_snapshot():
+    """Ghi snapshot của worker này (ghi file tạm rồi đổi tên để không đọc phải file dở)"""
+    path = _snapshot_path()
+    temp = f"{path}.tmp"
+    with open(temp, "w", encoding="utf-8") as file:
+        json.dump(snapshot(), file)
+    os.replace(temp, path)
+
+
+def collect_all():
+    """Metric của worker hiện tại, hoặc của mọi worker khi có METRICS_MULTIPROC_DIR"""
+    if not MULTIPROC_DIR:
+        return snapshot()
+    write_snapshot()
+    snapshots = []
+    now = time.time()
+    for filename in os.listdir(MULTIPROC_DIR):
+        if not filename.endswith(".json"):
+            continue
+        path = os.path.join(MULTIPROC_DIR, filename)
+        try:
+            if now - os.path.getmtime(path) > STALE_AFTER:
+                continue
+            with open(path, encoding="utf-8") as file:
+                snapshots.append(json.load(file))
+        except (OSError, ValueError):
+            # Worker vừa thoát hoặc đang ghi dở
+            continue
+    return merge(snapshots)
+
+
+class _Flusher:
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not MULTIPROC_DIR or self._thread is not None:
+            return
+        os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+        def run():
+            while not self._stop.wait(FLUSH_INTERVAL):
+                try:
+                    write_snapshot()
+                except Exception as e:
+                    print(f"Lỗi ghi metrics: {e}")
+
+        self._thread = threading.Thread(target=run, name="metrics-flush", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread = None
+        try:
+            os.remove(_snapshot_path())
+        except OSError:
+            pass
+
+
+# Usage: metrics_flusher.start() lúc startup, metrics_flusher.shutdown() lúc shutdown
+metrics_flusher = _Flusher()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware đo độ trễ và đếm request theo route template
+    (vd: /products/{product_id}), không theo URL cụ thể.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        _in_flight[0] += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _in_flight[0] -= 1
+            route = scope.get("route")
+            labels = {"method": scope["method"], "route": getattr(route, "path", "<unmatched>")}
+            http_latency.observe(labels, time.perf_counter() - started)
+            http_requests.inc({**labels, "status": str(status[0])})
@@ -5,83 +5,148 @@ class Cart:
         self.user_id = user_id
         self.productvariant_id = productvariant_id
         self.quantity = quantity
-        self._calculate_total_price()
 
-    def _calculate_total_price(self):
-        query = """
-        SELECT price FROM ProductVariant WHERE id = %s
-        """
-        result = db.fetch_one(query, (self.productvariant_id,))
-        self.total_price = result['price'] * self.quantity if result else 0
+    # Thêm dòng hoặc cộng dồn số lượng trong một câu lệnh: giá được đọc từ
+    # ProductVariant ngay trong câu INSERT ... SELECT, dòng trùng
+    # (user_id, productvariant_id) được cập nhật nhờ khóa unique
+    # (migrations/004_cart_unique_line.sql). Variant không tồn tại -> 0 dòng.
+    # MySQL gán lần lượt từ trái sang phải nên total_price dùng quantity mới.
+    UPSERT_QUERY = """
+    INSERT INTO Cart (user_id, productvariant_id, quantity, total_price)
+    SELECT %s, pv.id, %s, pv.price * %s
+    FROM ProductVariant pv
+    WHERE pv.id = %s
+    ON DUPLICATE KEY UPDATE
+        quantity = {quantity},
+        total_price = pv.price * Cart.quantity
+    """
 
-    def save(self):
-        # Kiểm tra xem sản phẩm đã có trong giỏ hàng chưa
-        existing = self.get_item(self.user_id, self.productvariant_id)
-        if existing:
-            return self.update_quantity(
-                existing['id'], 
-                existing['quantity'] + self.quantity
-            )
+    # Cách cập nhật quantity khi dòng đã có: cộng dồn hoặc ghi đè
+    MODES = {
+        'add': "Cart.quantity + VALUES(quantity)",
+        'set': "VALUES(quantity)",
+    }
 
-        query = """
-        INSERT INTO Cart (user_id, productvariant_id, quantity, total_price)
-        VALUES (%s, %s, %s, %s)
+    def save(self, mode='add'):
         """
-        return db.execute_query(query, (
+        Thêm variant vào giỏ (mode='add' cộng dồn, 'set' ghi đè số lượng).
+        Trả về False nếu variant không tồn tại
+        """
+        query = Cart.UPSERT_QUERY.format(quantity=Cart.MODES[mode])
+        affected = db.execute(query, (
             self.user_id,
-            self.productvariant_id,
             self.quantity,
-            self.total_price
+            self.quantity,
+            self.productvariant_id
         ))
+        if affected:
+            return True
+        # 0 dòng: variant không tồn tại, hoặc 'set' đúng số lượng đang có
+        # (MySQL không đếm dòng không đổi khi thiếu CLIENT.FOUND_ROWS)
+        return db.fetch_one(
+            "SELECT 1 AS found FROM ProductVariant WHERE id = %s", (self.productvariant_id,)
+        ) is not None
 
     @staticmethod
-    def get_user_cart(user_id):
+    def save_many(user_id, items, mode='add'):
+        """
+        Thêm / cập nhật nhiều dòng bằng một câu INSERT ... SELECT.
+        items: list (productvariant_id, quantity); variant lặp lại được cộng dồn.
+        Variant không tồn tại bị bỏ qua. Trả về số dòng bị ảnh hưởng theo MySQL
+        """
+        quantities = {}
+        for productvariant_id, quantity in items:
+            quantities[productvariant_id] = quantities.get(productvariant_id, 0) + quantity
+        if not quantities:
+            return 0
+        lines = " UNION ALL ".join(["SELECT %s AS variant_id, %s AS quantity"] * len(quantities))
+        query = f"""
+        INSERT INTO Cart (user_id, productvariant_id, quantity, total_price)
+        SELECT %s, pv.id, q.quantity, pv.price * q.quantity
+        FROM ({lines}) q
+        JOIN ProductVariant pv ON pv.id = q.variant_id
+        ON DUPLICATE KEY UPDATE
+            quantity = {Cart.MODES[mode]},
+            total_price = pv.price * Cart.quantity
+        """
+        params = [user_id]
+        for productvariant_id, quantity in quantities.items():
+            params.extend((productvariant_id, quantity))
+        return db.execute(query, tuple(params))
+
+    @staticmethod
+    def get_cart(user_id):
+        """
+        Nội dung giỏ hàng kèm tổng tiền bằng một câu truy vấn.
+        Thành tiền tính theo giá hiện tại của variant.
+        Trả về {items, total, item_count}
+        """
         query = """
-        SELECT c.*, 
-               pv.color, pv.size, pv.price,
-               p.name as product_name
+        SELECT c.id,
+               c.productvariant_id,
+               c.quantity,
+               pv.price,
+               pv.price * c.quantity AS total_price,
+               pv.color, pv.size,
+               pv.amount AS stock,
+               p.id AS product_id,
+               p.name AS product_name,
+               SUM(pv.price * c.quantity) OVER () AS cart_total,
+               SUM(c.quantity) OVER () AS item_count
         FROM Cart c
         JOIN ProductVariant pv ON c.productvariant_id = pv.id
-        JOIN products p ON pv.product_id = p.id
+        JOIN Products p ON pv.product_id = p.id
         WHERE c.user_id = %s
+        ORDER BY c.id
         """
-        return db.fetch_all(query, (user_id,))
+        items = db.fetch_all(query, (user_id,))
+        total = items[0]['cart_total'] if items else 0
+        item_count = items[0]['item_count'] if items else 0
+        for item in items:
+            del item['cart_total'], item['item_count']
+        return {"items": items, "total": total, "item_count": int(item_count)}
+
+    @staticmethod
+    def get_user_cart(user_id):
+        return Cart.get_cart(user_id)["items"]
 
     @staticmethod
     def get_item(user_id, productvariant_id):
         query = """
-        SELECT * FROM Cart 
+        SELECT * FROM Cart
         WHERE user_id = %s AND productvariant_id = %s
         """
         return db.fetch_one(query, (user_id, productvariant_id))
 
-    def update_quantity(self, cart_id, quantity):
-        self.quantity = quantity
-        self._calculate_total_price()
-        
-        query = """
-        UPDATE Cart 
-        SET quantity = %s, total_price = %s 
-        WHERE id = %s
-        """
-        return db.execute_query(query, (quantity, self.total_price, cart_id))
-
     @staticmethod
     def remove_item(cart_id):
         query = """DELETE FROM Cart WHERE id = %s"""
         return db.execute_query(query, (cart_id,))
 
     @staticmethod
-    def clear_cart(user_id):
+    def remove_variants(user_id, *productvariant_ids):
+        """Xóa các variant khỏi giỏ của user, trả về số dòng đã xóa"""
+        if not productvariant_ids:
+            return 0
+        placeholders = ", ".join(["%s"] * len(productvariant_ids))
+        query = f"""
+        DELETE FROM Cart
+        WHERE user_id = %s AND productvariant_id IN ({placeholders})
+        """
+        return db.execute(query, (user_id, *productvariant_ids))
+
+    @staticmethod
+    def clear_cart(user_id, tx=None):
         query = """DELETE FROM Cart WHERE user_id = %s"""
-        return db.execute_query(query, (user_id,))
+        return (tx or db).execute(query, (user_id,))
 
     @staticmethod
     def get_cart_total(user_id):
         query = """
-        SELECT SUM(total_price) as cart_total 
-        FROM Cart 
-        WHERE user_id = %s
+        SELECT SUM(pv.price * c.quantity) as cart_total
+        FROM Cart c
+        JOIN ProductVariant pv ON c.productvariant_id = pv.id
+        WHERE c.user_id = %s
         """
         result = db.fetch_one(query, (user_id,))
-        return result['cart_total'] if result else 0
\ No newline at end of file
+        return result['cart_total'] if result else 0
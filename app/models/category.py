@@ -5,16 +5,16 @@ class Category:
         self.name = name
     def save(self):
         query = """
-        INSERT INTO categories (name)
+        INSERT INTO Categories (name)
         VALUES (%s)
         """     
         return db.execute_query(query,(self.name,))
     @staticmethod
     def get_category_by_id(id):
-        query = """SELECT * FROM categories WHERE id = %s"""
+        query = """SELECT * FROM Categories WHERE id = %s"""
         return db.fetch_one(query, (id,))
     
     @staticmethod
     def get_all():
-        query = """SELECT * FROM categories"""
+        query = """SELECT * FROM Categories"""
         return db.fetch_all(query)
\ No newline at end of file
@@ -1,39 +1,59 @@
 from app.database import db
+from app.models.purchase_eligibility import PurchaseEligibility
 from datetime import datetime
 
 class Order:
-    def __init__(self, user_id, total_amount, status='pending'):
-        self.user_id = user_id
+    def __init__(self, customer_id, total_amount, payment_id=None, status='pending'):
+        self.customer_id = customer_id
         self.total_amount = total_amount
+        self.payment_id = payment_id
         self.status = status
-        self.created_at = datetime.now()
+        self.date = datetime.now()
 
-    def save(self):
+    def save(self, tx=None):
+        """Lưu đơn hàng, trả về id vừa tạo. tx: chạy trong transaction có sẵn"""
         query = """
-        INSERT INTO orders (user_id, total_amount, status, created_at)
-        VALUES (%s, %s, %s, %s)
+        INSERT INTO Orders (customer_id, payment_id, total_amount, status, date)
+        VALUES (%s, %s, %s, %s, %s)
         """
-        return db.execute_query(query, (
-            self.user_id,
+        return (tx or db).insert(query, (
+            self.customer_id,
+            self.payment_id,
             self.total_amount,
             self.status,
-            self.created_at
+            self.date
         ))
 
     @staticmethod
     def get_by_id(order_id):
-        query = """SELECT * FROM orders WHERE id = %s"""
+        query = """SELECT * FROM Orders WHERE id = %s"""
         return db.fetch_one(query, (order_id,))
 
     @staticmethod
-    def get_user_orders(user_id):
-        query = """SELECT * FROM orders WHERE user_id = %s ORDER BY created_at DESC"""
-        return db.fetch_all(query, (user_id,))
+    def get_user_orders(customer_id):
+        query = """SELECT * FROM Orders WHERE customer_id = %s ORDER BY date DESC"""
+        return db.fetch_all(query, (customer_id,))
 
-    def update_status(self, order_id, new_status):
+    @staticmethod
+    def update_status(order_id, new_status):
+        """
+        Đổi trạng thái đơn, trả về False nếu không có đơn.
+        Khi đơn chuyển sang 'received', các variant của đơn được ghi vào
+        PurchaseEligibility trong cùng transaction; khi đơn rời 'received'
+        (vd: bị hủy) các quyền không còn đơn nhận hàng nào khác bị thu hồi
+        """
         query = """
-        UPDATE orders 
-        SET status = %s, updated_at = NOW()
+        UPDATE Orders 
+        SET status = %s
         WHERE id = %s
         """
-        return db.execute_query(query, (new_status, order_id))
\ No newline at end of file
+        with db.transaction() as tx:
+            order = tx.fetch_one("SELECT id, status FROM Orders WHERE id = %s FOR UPDATE", (order_id,))
+            if not order:
+                return False
+            tx.execute(query, (new_status, order_id))
+            if new_status == 'received' and order['status'] != 'received':
+                PurchaseEligibility.grant_for_order(tx, order_id)
+            elif order['status'] == 'received' and new_status != 'received':
+                PurchaseEligibility.revoke_for_order(tx, order_id)
+        return True
@@ -1,32 +1,48 @@
 from app.database import db
 
 class OrderDetail:
-    def __init__(self, order_id, product_id, quantity, price):
+    def __init__(self, order_id, variant_id, quantity, price):
         self.order_id = order_id
-        self.product_id = product_id
+        self.variant_id = variant_id
         self.quantity = quantity
         self.price = price
-        self.subtotal = quantity * price
 
-    def save(self):
+    def save(self, tx=None):
         query = """
-        INSERT INTO order_details (order_id, product_id, quantity, price, subtotal)
-        VALUES (%s, %s, %s, %s, %s)
+        INSERT INTO OrderDetail (order_id, variant_id, quantity, price)
+        VALUES (%s, %s, %s, %s)
         """
-        return db.execute_query(query, (
+        return (tx or db).insert(query, (
             self.order_id,
-            self.product_id,
+            self.variant_id,
             self.quantity,
-            self.price,
-            self.subtotal
+            self.price
         ))
 
+    @staticmethod
+    def save_many(tx, order_id, lines):
+        """
+        Thêm mọi dòng của đơn bằng một câu INSERT nhiều dòng.
+        lines: list dict (variant_id, quantity, price). Trả về số dòng đã thêm
+        """
+        if not lines:
+            return 0
+        query = """
+        INSERT INTO OrderDetail (order_id, variant_id, quantity, price)
+        VALUES (%s, %s, %s, %s)
+        """
+        return tx.execute_many(query, [
+            (order_id, line['variant_id'], line['quantity'], line['price'])
+            for line in lines
+        ])
+
     @staticmethod
     def get_order_items(order_id):
         query = """
-        SELECT od.*, p.name as product_name, p.image_url
-        FROM order_details od
-        JOIN products p ON od.product_id = p.id
+        SELECT od.*, pv.color, pv.size, p.id as product_id, p.name as product_name
+        FROM OrderDetail od
+        JOIN ProductVariant pv ON od.variant_id = pv.id
+        JOIN Products p ON pv.product_id = p.id
         WHERE od.order_id = %s
         """
         return db.fetch_all(query, (order_id,))
@@ -34,8 +50,9 @@ class OrderDetail:
     @staticmethod
     def get_product_sales(product_id):
         query = """
-        SELECT SUM(quantity) as total_sold, SUM(subtotal) as total_revenue
-        FROM order_details
-        WHERE product_id = %s
+        SELECT SUM(od.quantity) as total_sold, SUM(od.quantity * od.price) as total_revenue
+        FROM OrderDetail od
+        JOIN ProductVariant pv ON od.variant_id = pv.id
+        WHERE pv.product_id = %s
         """
-        return db.fetch_one(query, (product_id,))
\ No newline at end of file
+        return db.fetch_one(query, (product_id,))
@@ -7,12 +7,13 @@ class Payment:
         self.status = status
         self.payment_date = None
 
-    def save(self):
+    def save(self, tx=None):
+        """Lưu thanh toán, trả về id vừa tạo. tx: chạy trong transaction có sẵn"""
         query = """
         INSERT INTO Payment (payment_method, status, payment_date)
         VALUES (%s, %s, %s)
         """
-        return db.execute_query(query, (
+        return (tx or db).insert(query, (
             self.payment_method,
             self.status,
             self.payment_date
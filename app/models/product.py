@@ -1,4 +1,8 @@
 from app.database import db
+from app.cache import cache, versions
+from app.models.product_variant import ProductVariant
+from app.services.search import search_index
+from app.services.facets import facet_index
 from datetime import datetime
 
 class Product:
@@ -8,23 +12,67 @@ class Product:
         self.category_id = category_id
         self.status = status
         self.artisan_description =artisan_description
-    def save(self):
+    def save(self, tx=None):
+        """Lưu sản phẩm, trả về id vừa tạo. tx: chạy trong transaction có sẵn"""
         query = """
         INSERT INTO Products (name, description, category_id, status, artisan_description)
         VALUES (%s, %s, %s, %s, %s)
         """
-        return db.execute_query(query, (
+        return (tx or db).insert(query, (
             self.name, 
             self.description, 
             self.category_id,
             self.status,
             self.artisan_description
         ))
-    
+
     @staticmethod
-    def get_all(skip=0, limit=10):
+    def save_many(tx, products):
+        """
+        Thêm nhiều sản phẩm bằng INSERT nhiều dòng (tx.insert_many).
+        products: list Product. Trả về list id theo đúng thứ tự
+        """
+        if not products:
+            return []
         query = """
-        SELECT 
+        INSERT INTO Products (name, description, category_id, status, artisan_description)
+        VALUES (%s, %s, %s, %s, %s)
+        """
+        product_ids = tx.insert_many(query, [
+            (p.name, p.description, p.category_id, p.status, p.artisan_description)
+            for p in products
+        ])
+        tx.on_commit(Product.invalidate_cache, *product_ids)
+        return product_ids
+
+    def create_with_variants(self, variants):
+        """
+        Tạo sản phẩm và tất cả variant trong một transaction trên một kết nối:
+        một INSERT cho sản phẩm và một INSERT nhiều dòng cho các variant.
+        variants: list dict (color, size, price, amount)
+        Trả về (product_id, category, variants kèm id)
+
+        Raises ValueError nếu category không tồn tại.
+        """
+        with db.transaction() as tx:
+            category = tx.fetch_one(
+                "SELECT id, name FROM Categories WHERE id = %s", (self.category_id,)
+            )
+            if not category:
+                raise ValueError("Category not found")
+            product_id = self.save(tx)
+            created_variants = ProductVariant.save_many(tx, product_id, variants)
+        Product.invalidate_cache(product_id)
+        return product_id, category, created_variants
+    
+    # Các bộ lọc danh sách sản phẩm: tên filter -> điều kiện SQL (một tham số).
+    # Mỗi điều kiện đều có index tương ứng (migrations/002_products_filter_indexes.sql)
+    FILTERS = {
+        'category_id': "p.category_id = %s",
+        'status': "p.status = %s",
+    }
+
+    LIST_COLUMNS = """
             p.id,
             p.name,
             p.description,
@@ -32,22 +80,95 @@ class Product:
             p.status,
             p.artisan_description,
             c.name as category_name,
-            c.id as category_id
+            c.id as category_id,
+            COALESCE(rs.review_count, 0) as rating_count,
+            rs.rating_sum / NULLIF(rs.review_count, 0) as average_rating
+    """
+
+    @staticmethod
+    def build_where(filters=None, after_id=None):
+        """
+        Ghép các filter thành một mệnh đề WHERE có tham số.
+        Filter có giá trị None được bỏ qua. Trả về (where_sql, params)
+        """
+        conditions = []
+        params = []
+        for name, value in (filters or {}).items():
+            if value is None:
+                continue
+            if name not in Product.FILTERS:
+                raise ValueError(f"Unknown product filter: {name}")
+            conditions.append(Product.FILTERS[name])
+            params.append(value)
+        if after_id is not None:
+            conditions.append("p.id > %s")
+            params.append(after_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, params
+
+    @staticmethod
+    def find(filters=None, skip=0, limit=10, after_id=None):
+        """
+        Lấy một trang sản phẩm theo bộ lọc, sắp xếp theo id.
+        after_id: phân trang keyset (bỏ qua skip)
+        """
+        where, params = Product.build_where(filters, after_id)
+        query = f"""
+        SELECT {Product.LIST_COLUMNS}
         FROM Products p
         LEFT JOIN Categories c ON p.category_id = c.id
-        LIMIT %s OFFSET %s
+        LEFT JOIN ProductRatingStats rs ON rs.product_id = p.id
+        {where}
+        ORDER BY p.id
+        LIMIT %s
         """
-        return db.fetch_all(query, (limit, skip))
-        
+        params.append(limit)
+        if after_id is None:
+            query += " OFFSET %s"
+            params.append(skip)
+        return db.fetch_all(query, tuple(params))
+
     @staticmethod
-    def count_all():
-        query = """
+    def get_by_ids(product_ids):
+        """Lấy các sản phẩm (cùng cột với find) theo list id, giữ đúng thứ tự của list"""
+        if not product_ids:
+            return []
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        query = f"""
+        SELECT {Product.LIST_COLUMNS}
+        FROM Products p
+        LEFT JOIN Categories c ON p.category_id = c.id
+        LEFT JOIN ProductRatingStats rs ON rs.product_id = p.id
+        WHERE p.id IN ({placeholders})
+        """
+        rows = {row['id']: row for row in db.fetch_all(query, tuple(product_ids))}
+        return [rows[product_id] for product_id in product_ids if product_id in rows]
+
+    @staticmethod
+    def count(filters=None):
+        """Đếm số sản phẩm khớp bộ lọc (cùng điều kiện WHERE với find)"""
+        where, params = Product.build_where(filters)
+        query = f"""
         SELECT COUNT(*) as total
-        FROM Products
+        FROM Products p
+        {where}
         """
-        result = db.fetch_one(query)
+        result = db.fetch_one(query, tuple(params))
         return result['total'] if result else 0
 
+    @staticmethod
+    def get_all(skip=0, limit=10):
+        return Product.find(skip=skip, limit=limit)
+
+    @staticmethod
+    def get_all_after(after_id, limit=10):
+        """Phân trang keyset: lấy `limit` sản phẩm có id > after_id"""
+        return Product.find(limit=limit, after_id=after_id)
+
+    @staticmethod
+    def count_all():
+        return Product.count()
+
     @staticmethod
     def get_by_id(product_id):
         query = """
@@ -63,39 +184,57 @@ class Product:
             JSON_OBJECT(
                 'id', c.id,
                 'name', c.name
-            ) AS category
+            ) AS category,
+            COALESCE(rs.review_count, 0) AS rating_count,
+            rs.rating_sum / NULLIF(rs.review_count, 0) AS average_rating
         FROM Products p
         LEFT JOIN Categories c ON p.category_id = c.id
+        LEFT JOIN ProductRatingStats rs ON rs.product_id = p.id
         WHERE p.id = %s;
         """
-        return db.fetch_one(query, (product_id,))
-        
+        product = cache.get_or_load(
+            f"product:{product_id}",
+            lambda: db.fetch_one(query, (product_id,)),
+            scopes=(f"product:{product_id}", "ratings")
+        )
+        # Trả bản sao để route có thể sửa dict mà không làm bẩn cache
+        return dict(product) if product else product
+
     @staticmethod
-    def get_by_category(category_id, skip=0, limit=10):
+    def update_status(product_id, status):
+        """Đổi trạng thái sản phẩm, trả về False nếu không có sản phẩm"""
         query = """
-        SELECT 
-            p.id,
-            p.name,
-            p.description,
-            p.category_id,
-            p.status,
-            p.artisan_description,
-            c.name as category_name,
-            c.id as category_id
-        FROM Products p
-        LEFT JOIN Categories c ON p.category_id = c.id
-        WHERE p.category_id = %s
-        ORDER BY p.id
-        LIMIT %s OFFSET %s
+        UPDATE Products
+        SET status = %s
+        WHERE id = %s
         """
-        return db.fetch_all(query, (category_id, limit, skip))
+        if db.execute(query, (status, product_id)):
+            Product.invalidate_cache(product_id)
+            return True
+        # 0 dòng: không có sản phẩm, hoặc trạng thái không đổi (không cần xóa cache)
+        return db.fetch_one("SELECT 1 AS found FROM Products WHERE id = %s", (product_id,)) is not None
+
+    @staticmethod
+    def invalidate_cache(*product_ids):
+        """
+        Xóa sản phẩm và danh sách variant của nó khỏi cache đọc, đổi ETag liên quan,
+        đánh dấu cho chỉ mục tìm kiếm / facet nạp lại
+        """
+        cache.invalidate(*(f"product:{pid}" for pid in product_ids),
+                         *(f"variants:{pid}" for pid in product_ids))
+        versions.bump("catalog", *(f"product:{pid}" for pid in product_ids))
+        search_index.mark_dirty(*product_ids)
+        facet_index.mark_dirty(*product_ids)
         
+    @staticmethod
+    def get_by_category(category_id, skip=0, limit=10):
+        return Product.find({'category_id': category_id}, skip=skip, limit=limit)
+
+    @staticmethod
+    def get_by_category_after(category_id, after_id, limit=10):
+        """Phân trang keyset theo category: lấy `limit` sản phẩm có id > after_id"""
+        return Product.find({'category_id': category_id}, limit=limit, after_id=after_id)
+
     @staticmethod
     def count_by_category(category_id):
-        query = """
-        SELECT COUNT(*) as total
-        FROM Products
-        WHERE category_id = %s
-        """
-        result = db.fetch_one(query, (category_id,))
-        return result['total'] if result else 0
+        return Product.count({'category_id': category_id})
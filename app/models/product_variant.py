@@ -1,4 +1,16 @@
 from app.database import db
+from app.cache import cache, versions
+from app.services.facets import facet_index
+
+
+class InsufficientStockError(ValueError):
+    """Không đủ tồn kho (hoặc variant không tồn tại) khi giữ hàng"""
+
+    def __init__(self, variant_id, quantity):
+        super().__init__(f"Insufficient stock for variant {variant_id}")
+        self.variant_id = variant_id
+        self.quantity = quantity
+
 
 class ProductVariant:
     def __init__(self, product_id, color, size, price, amount):
@@ -8,18 +20,69 @@ class ProductVariant:
         self.price = price
         self.amount = amount
 
-    def save(self):
+    def save(self, tx=None):
+        """Lưu variant, trả về id vừa tạo. tx: chạy trong transaction có sẵn"""
         query = """
         INSERT INTO ProductVariant (product_id, color, size, price, amount)
         VALUES (%s, %s, %s, %s, %s)
         """
-        return db.execute_query(query, (
+        variant_id = (tx or db).insert(query, (
             self.product_id,
             self.color,
             self.size,
             self.price,
             self.amount
         ))
+        if tx:
+            tx.on_commit(ProductVariant.invalidate_products, self.product_id)
+        else:
+            ProductVariant.invalidate_products(self.product_id)
+        return variant_id
+
+    @staticmethod
+    def save_many(tx, product_id, variants):
+        """
+        Thêm nhiều variant của một sản phẩm bằng INSERT nhiều dòng (tx.insert_many).
+        variants: list dict (color, size, price, amount)
+        Trả về list variant kèm id và product_id
+        """
+        if not variants:
+            return []
+        query = """
+        INSERT INTO ProductVariant (product_id, color, size, price, amount)
+        VALUES (%s, %s, %s, %s, %s)
+        """
+        variant_ids = tx.insert_many(query, [
+            (product_id, v['color'], v.get('size'), v['price'], v['amount'])
+            for v in variants
+        ])
+        tx.on_commit(ProductVariant.invalidate_products, product_id)
+        return [
+            {**v, 'id': variant_id, 'product_id': product_id}
+            for variant_id, v in zip(variant_ids, variants)
+        ]
+
+    @staticmethod
+    def save_for_products(tx, variants_by_product):
+        """
+        Thêm variant của nhiều sản phẩm bằng một câu INSERT nhiều dòng.
+        variants_by_product: dict {product_id: [variant dict]}
+        Trả về số variant đã thêm
+        """
+        rows = [
+            (product_id, v['color'], v.get('size'), v['price'], v['amount'])
+            for product_id, variants in variants_by_product.items()
+            for v in variants
+        ]
+        if not rows:
+            return 0
+        query = """
+        INSERT INTO ProductVariant (product_id, color, size, price, amount)
+        VALUES (%s, %s, %s, %s, %s)
+        """
+        tx.execute_many(query, rows)
+        tx.on_commit(ProductVariant.invalidate_products, *variants_by_product)
+        return len(rows)
 
     @staticmethod
     def get_by_id(variant_id):
@@ -33,31 +96,145 @@ class ProductVariant:
 
     @staticmethod
     def get_by_product(product_id, variant_id = None, get_one = False):
+        query = """
+        SELECT * FROM ProductVariant
+        WHERE product_id = %s
+        """
+        variants = cache.get_or_load(
+            f"variants:{product_id}",
+            lambda: db.fetch_all(query, (product_id,)),
+            scopes=(f"product:{product_id}",)
+        ) or []
         if get_one:
-             query = """
-                    SELECT * FROM ProductVariant 
-                    WHERE product_id = %s and id = %s
-                    LIMIT 1;
-                    """
-             return db.fetch_one(query,(product_id,variant_id))
-        else:
-            query = """
-            SELECT * FROM ProductVariant
-            WHERE product_id = %s
-            """
-            return db.fetch_all(query, (product_id,))
-    def update_stock(self, variant_id, amount):
-        query = """
-        UPDATE ProductVariant 
-        SET amount = amount + %s 
+            for variant in variants:
+                if variant['id'] == variant_id:
+                    return dict(variant)
+            return None
+        # Trả bản sao để route có thể sửa dict mà không làm bẩn cache
+        return [dict(variant) for variant in variants]
+
+    @staticmethod
+    def get_by_products(product_ids):
+        """
+        Lấy variants của nhiều sản phẩm bằng một câu truy vấn IN (...)
+        Trả về dict {product_id: [variants]}, sản phẩm không có variant -> []
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+        grouped = {product_id: [] for product_id in product_ids}
+        if not product_ids:
+            return grouped
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        query = f"""
+        SELECT * FROM ProductVariant
+        WHERE product_id IN ({placeholders})
+        ORDER BY product_id, id
+        """
+        for variant in db.fetch_all(query, tuple(product_ids)):
+            grouped.setdefault(variant['product_id'], []).append(variant)
+        return grouped
+
+    @staticmethod
+    def update_stock(variant_id, amount):
+        """Cộng amount vào tồn kho, trả về số dòng bị thay đổi (0: không có variant)"""
+        query = """
+        UPDATE ProductVariant
+        SET amount = amount + %s,
+            product_id = LAST_INSERT_ID(product_id)
         WHERE id = %s
         """
-        return db.execute_query(query, (amount, variant_id))
+        product_id = db.insert(query, (amount, variant_id))
+        if product_id:
+            ProductVariant.invalidate_products(product_id)
+        return 1 if product_id else 0
+
+    # Trừ tồn kho có điều kiện: kiểm tra và trừ trong cùng một câu UPDATE
+    # (khóa dòng của InnoDB), nên hai người mua đồng thời không thể cùng
+    # vượt qua kiểm tra rồi bán quá số lượng.
+    # product_id = LAST_INSERT_ID(product_id) không đổi dữ liệu, chỉ để MySQL
+    # trả product_id của dòng vừa sửa qua lastrowid (0 nếu không có dòng nào),
+    # không cần SELECT thêm để biết phải xóa cache của sản phẩm nào
+    DECREMENT_QUERY = """
+    UPDATE ProductVariant
+    SET amount = amount - %s,
+        product_id = LAST_INSERT_ID(product_id)
+    WHERE id = %s AND amount >= %s
+    """
+
+    @staticmethod
+    def decrement_stock(variant_id, quantity, tx=None):
+        """
+        Trừ quantity (> 0) khỏi tồn kho nếu còn đủ.
+        Trả về True nếu đã trừ, False nếu không đủ hàng hoặc variant không tồn tại
+        """
+        if quantity <= 0:
+            raise ValueError("Quantity must be positive")
+        product_id = (tx or db).insert(ProductVariant.DECREMENT_QUERY, (quantity, variant_id, quantity))
+        if product_id:
+            if tx:
+                tx.on_commit(ProductVariant.invalidate_products, product_id)
+            else:
+                ProductVariant.invalidate_products(product_id)
+        return bool(product_id)
 
-    def update_price(self, variant_id, price):
+    @staticmethod
+    def reserve_many(tx, items):
+        """
+        Giữ hàng cho nhiều variant trong transaction tx: trừ tồn kho từng
+        variant theo thứ tự id tăng dần (mọi transaction khóa dòng cùng thứ tự
+        nên không deadlock lẫn nhau).
+        items: dict {variant_id: quantity} hoặc list (variant_id, quantity);
+        variant lặp lại được cộng dồn.
+
+        Raises InsufficientStockError ở variant đầu tiên không đủ hàng;
+        exception làm transaction rollback nên không variant nào bị trừ.
+        """
+        quantities = {}
+        for variant_id, quantity in (items.items() if isinstance(items, dict) else items):
+            quantities[variant_id] = quantities.get(variant_id, 0) + quantity
+        for variant_id in sorted(quantities):
+            quantity = quantities[variant_id]
+            if not ProductVariant.decrement_stock(variant_id, quantity, tx):
+                raise InsufficientStockError(variant_id, quantity)
+        return quantities
+
+    @staticmethod
+    def reserve_cart(tx, user_id):
+        """
+        Trừ tồn kho cho mọi dòng trong giỏ của user bằng một câu UPDATE JOIN
+        (chỉ các variant còn đủ hàng). Trả về số variant đã trừ; nhỏ hơn số
+        dòng trong giỏ nghĩa là có variant thiếu hàng và tx phải rollback
+        """
         query = """
-        UPDATE ProductVariant 
-        SET price = %s 
+        UPDATE ProductVariant pv
+        JOIN Cart c ON c.productvariant_id = pv.id
+        SET pv.amount = pv.amount - c.quantity
+        WHERE c.user_id = %s AND pv.amount >= c.quantity
+        """
+        return tx.execute(query, (user_id,))
+
+    @staticmethod
+    def reserve(items):
+        """reserve_many trong transaction riêng"""
+        with db.transaction() as tx:
+            return ProductVariant.reserve_many(tx, items)
+
+    @staticmethod
+    def update_price(variant_id, price):
+        query = """
+        UPDATE ProductVariant
+        SET price = %s,
+            product_id = LAST_INSERT_ID(product_id)
         WHERE id = %s
         """
-        return db.execute_query(query, (price, variant_id))
\ No newline at end of file
+        product_id = db.insert(query, (price, variant_id))
+        if product_id:
+            ProductVariant.invalidate_products(product_id)
+        return bool(product_id)
+
+    @staticmethod
+    def invalidate_products(*product_ids):
+        """Xóa danh sách variant của các sản phẩm khỏi cache đọc, đổi ETag và facet liên quan"""
+        cache.invalidate(*(f"variants:{product_id}" for product_id in product_ids))
+        versions.bump("catalog", *(f"product:{product_id}" for product_id in product_ids))
+        facet_index.mark_dirty(*product_ids)
+
@@ -0,0 +1,97 @@
+import os
+from app.database import db
+from app.cache import LRUCache
+
+# Chỉ cache kết quả "đã mua" (kết quả "chưa mua" đổi ngay khi đơn chuyển sang
+# received). Quyền có thể mất khi đơn rời received (vd: received -> cancelled)
+# hoặc sau rebuild-eligibility: process ghi tự xóa khóa của mình, các worker
+# khác thấy thay đổi sau tối đa ELIGIBILITY_CACHE_TTL giây
+_eligible = LRUCache(
+    max_entries=int(os.getenv('ELIGIBILITY_CACHE_SIZE', 50000)),
+    ttl=float(os.getenv('ELIGIBILITY_CACHE_TTL', 300)),
+)
+
+
+class PurchaseEligibility:
+    """
+    Bảng PurchaseEligibility (customer_id, variant_id): khách đã mua và nhận
+    variant. Kiểm tra quyền review là một lần tra khóa chính thay cho EXISTS
+    JOIN trên Orders / OrderDetail.
+    """
+
+    @staticmethod
+    def grant_for_order(tx, order_id):
+        """Thêm mọi variant của đơn cho khách đặt đơn (gọi khi đơn chuyển sang received)"""
+        query = """
+        INSERT IGNORE INTO PurchaseEligibility (customer_id, variant_id)
+        SELECT o.customer_id, od.variant_id
+        FROM Orders o
+        JOIN OrderDetail od ON o.id = od.order_id
+        WHERE o.id = %s
+        """
+        return tx.execute(query, (order_id,))
+
+    @staticmethod
+    def revoke_for_order(tx, order_id):
+        """
+        Xóa các cặp (khách, variant) của đơn không còn đơn 'received' nào khác
+        chứng minh (gọi khi đơn rời received, sau khi đã đổi trạng thái trong tx).
+        Khóa cache bị xóa sau khi tx commit
+        """
+        pairs = tx.fetch_all("""
+        SELECT o.customer_id, od.variant_id
+        FROM Orders o
+        JOIN OrderDetail od ON o.id = od.order_id
+        WHERE o.id = %s
+        """, (order_id,))
+        query = """
+        DELETE pe FROM PurchaseEligibility pe
+        JOIN Orders o ON o.id = %s AND pe.customer_id = o.customer_id
+        JOIN OrderDetail od ON od.order_id = o.id AND pe.variant_id = od.variant_id
+        WHERE NOT EXISTS (
+            SELECT 1
+            FROM Orders o2
+            JOIN OrderDetail od2 ON o2.id = od2.order_id
+            WHERE o2.customer_id = pe.customer_id
+                AND od2.variant_id = pe.variant_id
+                AND o2.status = 'received'
+                AND o2.id <> %s
+        )
+        """
+        count = tx.execute(query, (order_id, order_id))
+        if pairs:
+            tx.on_commit(_eligible.delete, *((p['customer_id'], p['variant_id']) for p in pairs))
+        return count
+
+    @staticmethod
+    def is_eligible(customer_id, variant_id):
+        key = (customer_id, variant_id)
+        if _eligible.get(key):
+            return True
+        query = """
+        SELECT 1 AS eligible FROM PurchaseEligibility
+        WHERE customer_id = %s AND variant_id = %s
+        """
+        if db.fetch_one(query, key):
+            _eligible.set(key, True)
+            return True
+        return False
+
+    @staticmethod
+    def rebuild():
+        """Tính lại toàn bộ bảng từ lịch sử đơn hàng đã nhận"""
+        with db.transaction() as tx:
+            tx.execute("DELETE FROM PurchaseEligibility")
+            count = tx.execute("""
+            INSERT INTO PurchaseEligibility (customer_id, variant_id)
+            SELECT DISTINCT o.customer_id, od.variant_id
+            FROM Orders o
+            JOIN OrderDetail od ON o.id = od.order_id
+            WHERE o.status = 'received'
+            """)
+        _eligible.clear()
+        return count
+
+    @staticmethod
+    def stats():
+        return _eligible.stats()
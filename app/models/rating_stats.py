@@ -0,0 +1,107 @@
+from app.database import db
+from app.cache import versions
+
+STAR_COLUMNS = ['star_1', 'star_2', 'star_3', 'star_4', 'star_5']
+
+
+class RatingStats:
+    """
+    Thống kê rating lưu sẵn theo variant và theo sản phẩm
+    (số review, tổng điểm, số review mỗi mức sao).
+    Được cập nhật trong cùng transaction với Review.save / update / delete.
+    """
+
+    @staticmethod
+    def _star_column(rating):
+        rating = int(rating)
+        if rating < 1 or rating > 5:
+            raise ValueError(f"Invalid rating: {rating}")
+        return f"star_{rating}"
+
+    @staticmethod
+    def apply(tx, variant_id, rating, delta):
+        """
+        Cộng (delta=1) hoặc trừ (delta=-1) một review có `rating` sao
+        vào thống kê của variant và sản phẩm chứa nó.
+        Khi trừ, dòng thống kê chưa có thì bỏ qua và các số đếm không xuống
+        dưới 0 (thống kê chưa được tính cho review cũ: chạy rebuild-ratings).
+        Trả về product_id của variant (None nếu variant không tồn tại)
+        """
+        star = RatingStats._star_column(rating)
+        row = tx.fetch_one("SELECT product_id FROM ProductVariant WHERE id = %s", (variant_id,))
+        if not row:
+            return None
+        for table, key, key_id in (("VariantRatingStats", "variant_id", variant_id),
+                                   ("ProductRatingStats", "product_id", row['product_id'])):
+            if delta > 0:
+                tx.execute(f"""
+                INSERT INTO {table} ({key}, review_count, rating_sum, {star})
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    review_count = review_count + VALUES(review_count),
+                    rating_sum = rating_sum + VALUES(rating_sum),
+                    {star} = {star} + VALUES({star})
+                """, (key_id, delta, delta * int(rating), delta))
+            else:
+                tx.execute(f"""
+                UPDATE {table}
+                SET review_count = GREATEST(review_count - %s, 0),
+                    rating_sum = GREATEST(rating_sum - %s, 0),
+                    {star} = GREATEST({star} - %s, 0)
+                WHERE {key} = %s
+                """, (-delta, -delta * int(rating), -delta, key_id))
+        return row['product_id']
+
+    @staticmethod
+    def get_for_variant(variant_id):
+        query = """
+        SELECT * FROM VariantRatingStats WHERE variant_id = %s
+        """
+        return RatingStats.format(db.fetch_one(query, (variant_id,)))
+
+    @staticmethod
+    def get_for_product(product_id):
+        query = """
+        SELECT * FROM ProductRatingStats WHERE product_id = %s
+        """
+        return RatingStats.format(db.fetch_one(query, (product_id,)))
+
+    @staticmethod
+    def format(row):
+        """Chuyển dòng thống kê thành {count, average, histogram}"""
+        if not row or not row['review_count']:
+            return {"count": 0, "average": None, "histogram": {str(i): 0 for i in range(1, 6)}}
+        return {
+            "count": row['review_count'],
+            "average": round(row['rating_sum'] / row['review_count'], 2),
+            "histogram": {str(i): row[f"star_{i}"] for i in range(1, 6)},
+        }
+
+    @staticmethod
+    def rebuild():
+        """Tính lại toàn bộ thống kê từ bảng Reviews"""
+        histogram = ",\n            ".join(
+            f"SUM(r.rating = {i})" for i in range(1, 6)
+        )
+        columns = ", ".join(STAR_COLUMNS)
+        with db.transaction() as tx:
+            tx.execute("DELETE FROM VariantRatingStats")
+            tx.execute("DELETE FROM ProductRatingStats")
+            variants = tx.execute(f"""
+            INSERT INTO VariantRatingStats (variant_id, review_count, rating_sum, {columns})
+            SELECT r.variant_id, COUNT(*), SUM(r.rating),
+            {histogram}
+            FROM Reviews r
+            GROUP BY r.variant_id
+            """)
+            products = tx.execute(f"""
+            INSERT INTO ProductRatingStats (product_id, review_count, rating_sum, {columns})
+            SELECT pv.product_id, COUNT(*), SUM(r.rating),
+            {histogram}
+            FROM Reviews r
+            JOIN ProductVariant pv ON r.variant_id = pv.id
+            GROUP BY pv.product_id
+            """)
+        # Rating của mọi sản phẩm có thể đã đổi: danh sách và chi tiết sản phẩm
+        versions.bump("catalog", "ratings")
+        return {"variants": variants, "products": products}
@@ -1,4 +1,8 @@
 from app.database import db
+from app.cache import versions
+from app.models.product import Product
+from app.models.rating_stats import RatingStats
+from app.models.purchase_eligibility import PurchaseEligibility
 from datetime import datetime
 from typing import Optional
 
@@ -16,32 +20,27 @@ class Review:
         return dt.isoformat() if dt else None
     @staticmethod
     def check_user_buy_item(customer_id: int, variant_id: int) -> bool:
-        # Original query for validation
-        query = """
-        SELECT EXISTS (
-            SELECT 1
-            FROM Orders o
-            INNER JOIN OrderDetail od ON o.id = od.order_id
-            WHERE 
-                o.customer_id = %s
-                AND od.variant_id = %s
-                AND o.status = 'received'
-        ) as has_bought
-        """
-        result = db.fetch_one(query, (customer_id, variant_id))
-        return bool(result['has_bought']) if result else False
+        # Tra bảng PurchaseEligibility (khách đã nhận hàng có variant này)
+        return PurchaseEligibility.is_eligible(customer_id, variant_id)
     def save(self):
         query = """
         INSERT INTO Reviews (customer_id, variant_id, rating, content, date)
         VALUES (%s, %s, %s, %s, %s)
         """
-        return db.execute_query(query, (
-            self.customer_id,
-            self.variant_id,
-            self.rating,
-            self.content,
-            self.date
-        ))
+        # Lưu review và cập nhật thống kê rating trong cùng một transaction
+        with db.transaction() as tx:
+            tx.execute(query, (
+                self.customer_id,
+                self.variant_id,
+                self.rating,
+                self.content,
+                self.date
+            ))
+            product_id = RatingStats.apply(tx, self.variant_id, self.rating, 1)
+        versions.bump("reviews")
+        if product_id:
+            Product.invalidate_cache(product_id)
+        return True
 
     @staticmethod
     def get_by_id(review_id):
@@ -59,28 +58,121 @@ class Review:
         return result
 
     @staticmethod
-    def get_by_product_variant(variant_id):
+    def get_by_product_variant(variant_id, skip=0, limit=None):
         query = """
         SELECT r.*, c.name as customer_name
         FROM Reviews r
         JOIN Customers c ON r.customer_id = c.id
         WHERE r.variant_id = %s
-        ORDER BY r.date DESC
+        ORDER BY r.date DESC, r.id DESC
         """
-        results = db.fetch_all(query, (variant_id,))
+        params = [variant_id]
+        if limit is not None:
+            query += " LIMIT %s OFFSET %s"
+            params.extend([limit, skip])
+        results = db.fetch_all(query, tuple(params))
         for r in results:
             if 'date' in r and isinstance(r['date'], datetime):
                 r['date'] = r['date'].isoformat()
         return results
 
     @staticmethod
-    def get_average_rating(variant_id):
+    def get_by_product_variant_before(variant_id, before_date, before_id, limit=10):
+        """
+        Phân trang keyset: lấy `limit` review cũ hơn (before_date, before_id)
+        Chi phí không phụ thuộc trang thứ mấy nhờ index (variant_id, date, id)
+        """
+        query = """
+        SELECT r.*, c.name as customer_name
+        FROM Reviews r
+        JOIN Customers c ON r.customer_id = c.id
+        WHERE r.variant_id = %s
+            AND (r.date < %s OR (r.date = %s AND r.id < %s))
+        ORDER BY r.date DESC, r.id DESC
+        LIMIT %s
+        """
+        results = db.fetch_all(query, (variant_id, before_date, before_date, before_id, limit))
+        for r in results:
+            if 'date' in r and isinstance(r['date'], datetime):
+                r['date'] = r['date'].isoformat()
+        return results
+
+    @staticmethod
+    def get_page_by_product(product_id, skip=0, limit=10):
+        """
+        Lấy một trang review của tất cả variant thuộc sản phẩm, mới nhất trước.
+        Sắp xếp, LIMIT và đếm tổng đều làm trong database (deferred join trên
+        index (variant_id, date, id)), chỉ các dòng của trang được đọc đầy đủ.
+        Trả về (items, total)
+        """
+        query = """
+        SELECT r.*, c.name as customer_name, page.total_count
+        FROM (
+            SELECT r2.id, COUNT(*) OVER() as total_count
+            FROM Reviews r2
+            JOIN ProductVariant pv ON r2.variant_id = pv.id
+            WHERE pv.product_id = %s
+            ORDER BY r2.date DESC, r2.id DESC
+            LIMIT %s OFFSET %s
+        ) page
+        JOIN Reviews r ON r.id = page.id
+        JOIN Customers c ON r.customer_id = c.id
+        ORDER BY r.date DESC, r.id DESC
+        """
+        results = db.fetch_all(query, (product_id, limit, skip))
+        if results:
+            total = results[0]['total_count']
+        elif skip:
+            # Trang vượt quá số review: vẫn cần tổng để client phân trang
+            total = Review.count_by_product(product_id)
+        else:
+            total = 0
+        for r in results:
+            r.pop('total_count', None)
+            if 'date' in r and isinstance(r['date'], datetime):
+                r['date'] = r['date'].isoformat()
+        return results, total
+
+    @staticmethod
+    def get_page_by_product_before(product_id, before_date, before_id, limit=10):
+        """Phân trang keyset cho review của sản phẩm: lấy `limit` review cũ hơn (before_date, before_id)"""
         query = """
-        SELECT AVG(rating) as average_rating
-        FROM Reviews
-        WHERE variant_id = %s
+        SELECT r.*, c.name as customer_name
+        FROM (
+            SELECT r2.id
+            FROM Reviews r2
+            JOIN ProductVariant pv ON r2.variant_id = pv.id
+            WHERE pv.product_id = %s
+                AND (r2.date < %s OR (r2.date = %s AND r2.id < %s))
+            ORDER BY r2.date DESC, r2.id DESC
+            LIMIT %s
+        ) page
+        JOIN Reviews r ON r.id = page.id
+        JOIN Customers c ON r.customer_id = c.id
+        ORDER BY r.date DESC, r.id DESC
         """
-        return db.fetch_one(query, (variant_id,))
+        results = db.fetch_all(query, (product_id, before_date, before_date, before_id, limit))
+        for r in results:
+            if 'date' in r and isinstance(r['date'], datetime):
+                r['date'] = r['date'].isoformat()
+        return results
+
+    @staticmethod
+    def count_by_product(product_id):
+        query = """
+        SELECT COUNT(*) as total
+        FROM Reviews r
+        JOIN ProductVariant pv ON r.variant_id = pv.id
+        WHERE pv.product_id = %s
+        """
+        result = db.fetch_one(query, (product_id,))
+        return result['total'] if result else 0
+
+    @staticmethod
+    def get_average_rating(variant_id):
+        # Đọc từ thống kê lưu sẵn thay vì AVG(rating) trên toàn bộ Reviews
+        stats = RatingStats.get_for_variant(variant_id)
+        return {"average_rating": stats['average']}
 
     @staticmethod
     def update(review_id, rating=None, content=None):
@@ -101,14 +193,41 @@ class Review:
         query = f"""
         UPDATE Reviews SET {', '.join(updates)} WHERE id = %s
         """
-        return db.execute_query(query, tuple(params))
+        with db.transaction() as tx:
+            existing = tx.fetch_one(
+                "SELECT variant_id, rating FROM Reviews WHERE id = %s FOR UPDATE",
+                (review_id,)
+            )
+            if not existing:
+                return False
+            tx.execute(query, tuple(params))
+            product_id = None
+            if rating is not None and rating != existing['rating']:
+                RatingStats.apply(tx, existing['variant_id'], existing['rating'], -1)
+                product_id = RatingStats.apply(tx, existing['variant_id'], rating, 1)
+        versions.bump("reviews")
+        if product_id:
+            Product.invalidate_cache(product_id)
+        return True
 
     @staticmethod
     def delete(review_id):
         query = """
         DELETE FROM Reviews WHERE id = %s
         """
-        return db.execute_query(query, (review_id,))
+        with db.transaction() as tx:
+            existing = tx.fetch_one(
+                "SELECT variant_id, rating FROM Reviews WHERE id = %s FOR UPDATE",
+                (review_id,)
+            )
+            if not existing:
+                return False
+            tx.execute(query, (review_id,))
+            product_id = RatingStats.apply(tx, existing['variant_id'], existing['rating'], -1)
+        versions.bump("reviews")
+        if product_id:
+            Product.invalidate_cache(product_id)
+        return True
 
     @staticmethod
     def count_by_variant(variant_id):
@@ -6,12 +6,13 @@ class Shipment:
         self.carrier = carrier
         self.status = status
 
-    def save(self):
+    def save(self, tx=None):
+        """Lưu vận đơn, trả về id vừa tạo. tx: chạy trong transaction có sẵn"""
         query = """
         INSERT INTO Shipment (order_id, carrier, status)
         VALUES (%s, %s, %s)
         """
-        return db.execute_query(query, (
+        return (tx or db).insert(query, (
             self.order_id,
             self.carrier,
             self.status
@@ -22,7 +23,7 @@ class Shipment:
         query = """
         SELECT s.*, o.date as order_date 
         FROM Shipment s
-        JOIN orders o ON s.order_id = o.id
+        JOIN Orders o ON s.order_id = o.id
         WHERE s.id = %s
         """
         return db.fetch_one(query, (shipment_id,))
@@ -45,7 +46,7 @@ class Shipment:
         query = """
         SELECT s.*, o.date as order_date 
         FROM Shipment s
-        JOIN orders o ON s.order_id = o.id
+        JOIN Orders o ON s.order_id = o.id
         WHERE s.status = %s
         """
         return db.fetch_all(query, (status,))
\ No newline at end of file
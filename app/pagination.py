@@ -0,0 +1,34 @@
+import base64
+import json
+
+
+def encode_cursor(*values) -> str:
+    """
+    Mã hóa vị trí cuối trang (vd: (date, id)) thành cursor dạng chuỗi.
+    Client chỉ cần gửi lại nguyên chuỗi này, không cần hiểu nội dung.
+    """
+    raw = json.dumps(list(values), separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """
+    Giải mã cursor thành list `size` giá trị.
+    Raises ValueError nếu cursor không hợp lệ.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def next_cursor(items, limit, *keys):
+    """Cursor của trang kế tiếp, None nếu đây là trang cuối"""
+    if len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor(*(last[key] for key in keys))
@@ -0,0 +1,164 @@
+"""
+Thống kê SQL theo request.
+
+Mọi câu lệnh đi qua app.database (DictCursor của pool, Transaction,
+db.stream) được đo thời gian và ghi vào QueryStats của request hiện tại
+(contextvars, đi theo cả db.run sang thread của executor).
+
+- QueryStatsMiddleware tạo QueryStats cho mỗi request. Với DB_DEBUG=1,
+  response có header X-DB-Queries / X-DB-Time-Ms và mỗi request in một
+  dòng log kèm câu chậm nhất.
+- Câu SQL được chuẩn hóa (bỏ giá trị, gộp IN (...) / VALUES nhiều dòng) nên
+  cùng một câu chạy trong vòng lặp (N+1) được đếm chung; chạy quá
+  DB_N_PLUS_ONE_THRESHOLD lần trong một request sẽ in cảnh báo.
+- app.testing.query_budget dùng cùng cơ chế để test fail khi endpoint
+  vượt số câu truy vấn cho phép.
+"""
+import contextvars
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+DB_DEBUG = os.getenv('DB_DEBUG', '0') == '1'
+N_PLUS_ONE_THRESHOLD = int(os.getenv('DB_N_PLUS_ONE_THRESHOLD', 10))
+SLOWEST_KEPT = 5
+
+_current = contextvars.ContextVar('db_query_stats', default=None)
+
+# Các hàm nhận (sql đã chuẩn hóa, số giây) cho mọi câu lệnh, kể cả ngoài request
+listeners = []
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:%s|\?)\s*,)*\s*(?:%s|\?)\s*\)", re.IGNORECASE)
+_VALUES_ROWS = re.compile(r"(\((?:\s*(?:%s|\?)\s*,)*\s*(?:%s|\?)\s*\))(?:\s*,\s*\((?:\s*(?:%s|\?)\s*,)*\s*(?:%s|\?)\s*\))+")
+_UNION_ROWS = re.compile(r"(SELECT (?:\? AS \w+, )*\? AS \w+)(?: UNION ALL SELECT (?:\? AS \w+, )*\? AS \w+)+", re.IGNORECASE)
+
+
+def normalize_sql(query) -> str:
+    """Chuẩn hóa câu SQL để gom nhóm: bỏ giá trị cụ thể, gộp danh sách tham số"""
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    sql = _WHITESPACE.sub(" ", query).strip().rstrip(";")
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _VALUES_ROWS.sub(r"\1, ...", sql)
+    sql = _UNION_ROWS.sub(r"\1 UNION ALL ...", sql)
+    return sql
+
+
+class QueryStats:
+    """Số câu lệnh, tổng thời gian và các câu chậm nhất của một phạm vi (request, test...)"""
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.count = 0
+        self.total_time = 0.0
+        self.statements = {}   # sql chuẩn hóa -> [số lần, tổng giây]
+        self.slowest = []      # [(giây, sql)] giảm dần, tối đa SLOWEST_KEPT
+        self._lock = threading.Lock()
+
+    def record(self, sql, duration):
+        with self._lock:
+            self.count += 1
+            self.total_time += duration
+            entry = self.statements.setdefault(sql, [0, 0.0])
+            entry[0] += 1
+            entry[1] += duration
+            if len(self.slowest) < SLOWEST_KEPT or duration > self.slowest[-1][0]:
+                self.slowest.append((duration, sql))
+                self.slowest.sort(key=lambda item: item[0], reverse=True)
+                del self.slowest[SLOWEST_KEPT:]
+        if self.parent is not None:
+            self.parent.record(sql, duration)
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """Các câu chạy từ threshold lần trở lên (dấu hiệu N+1)"""
+        with self._lock:
+            return {sql: entry[0] for sql, entry in self.statements.items() if entry[0] >= threshold}
+
+    def summary(self) -> str:
+        with self._lock:
+            lines = [f"{self.count} queries, {self.total_time * 1000:.1f} ms"]
+            for sql, (count, total) in sorted(self.statements.items(), key=lambda item: -item[1][0]):
+                lines.append(f"  {count:>4}x {total * 1000:8.1f} ms  {sql}")
+            return "\n".join(lines)
+
+
+def current_stats():
+    """QueryStats của request hiện tại, None nếu ngoài request"""
+    return _current.get()
+
+
+def record_query(query, started):
+    """Ghi một câu lệnh đã chạy từ thời điểm started (time.perf_counter())"""
+    stats = _current.get()
+    if stats is None and not listeners:
+        return
+    duration = time.perf_counter() - started
+    sql = normalize_sql(query)
+    if stats is not None:
+        stats.record(sql, duration)
+    for listener in listeners:
+        listener(sql, duration)
+
+
+@contextmanager
+def track_queries():
+    """
+    Gom thống kê SQL của khối with (và mọi request lồng bên trong).
+    Usage:
+        with track_queries() as stats:
+            ...
+        print(stats.count)
+    """
+    stats = QueryStats(parent=_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware tạo QueryStats cho mỗi request.
+    Usage: app.add_middleware(QueryStatsMiddleware)
+    """
+
+    def __init__(self, app, debug=None):
+        self.app = app
+        self.debug = DB_DEBUG if debug is None else debug
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+            async def send_with_stats(message):
+                if message["type"] == "http.response.start" and self.debug:
+                    headers = list(message.get("headers") or [])
+                    headers.append((b"x-db-queries", str(stats.count).encode("latin-1")))
+                    headers.append((b"x-db-time-ms", f"{stats.total_time * 1000:.1f}".encode("latin-1")))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_stats)
+            finally:
+                self._report(scope, stats)
+
+    def _report(self, scope, stats):
+        repeated = stats.repeated()
+        for sql, count in repeated.items():
+            print(f"Cảnh báo N+1: {scope['method']} {scope['path']} chạy {count} lần: {sql}")
+        if self.debug and stats.count:
+            slowest = stats.slowest[0] if stats.slowest else (0.0, "")
+            print(f"SQL {scope['method']} {scope['path']}: {stats.count} queries, "
+                  f"{stats.total_time * 1000:.1f} ms, chậm nhất {slowest[0] * 1000:.1f} ms: {slowest[1]}")
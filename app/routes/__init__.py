@@ -2,4 +2,7 @@ from app.routes.products import router as products_router
 from app.routes.reviews import router as reviews_router
 from app.routes.signup import router as signup_router
 from app.routes.login import router as login_router
-__all__ = ['products_router', 'reviews_router','signup_router','login_router']
\ No newline at end of file
+from app.routes.cart import router as cart_router
+from app.routes.orders import router as orders_router
+from app.routes.metrics import router as metrics_router
+__all__ = ['products_router', 'reviews_router','signup_router','login_router','cart_router','orders_router','metrics_router']
\ No newline at end of file
@@ -0,0 +1,124 @@
+from fastapi import APIRouter, Depends, HTTPException, Path
+from app.schemas import *
+from app.models.cart import Cart
+from app.database import db
+from app.dependencies import get_current_principal
+
+router = APIRouter(
+    prefix="/cart",
+    tags=["cart"]
+)
+
+
+def _customer_id(principal: dict) -> int:
+    """Chỉ khách hàng mới có giỏ hàng"""
+    if principal.get("role") != "customer":
+        raise HTTPException(status_code=403, detail="Only customers have a cart")
+    return principal["id"]
+
+
+@router.get("/", response_model=CartResponse)
+async def get_cart(principal: dict = Depends(get_current_principal)):
+    """Lấy giỏ hàng kèm tổng tiền"""
+    try:
+        return await db.run(Cart.get_cart, _customer_id(principal))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/items", response_model=CartResponse)
+async def add_cart_item(
+    item: CartItemCreate,
+    principal: dict = Depends(get_current_principal)
+):
+    """Thêm variant vào giỏ (cộng dồn nếu đã có)"""
+    try:
+        customer_id = _customer_id(principal)
+        added = await db.run(Cart(customer_id, item.variant_id, item.quantity).save)
+        if not added:
+            raise HTTPException(status_code=404, detail="Variant not found")
+        return await db.run(Cart.get_cart, customer_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.put("/items/{variant_id}", response_model=CartResponse)
+async def update_cart_item(
+    item: CartItemUpdate,
+    variant_id: int = Path(..., description="Variant id in the cart"),
+    principal: dict = Depends(get_current_principal)
+):
+    """Đặt số lượng của một variant trong giỏ (0 để xóa)"""
+    try:
+        customer_id = _customer_id(principal)
+        if item.quantity == 0:
+            await db.run(Cart.remove_variants, customer_id, variant_id)
+        elif not await db.run(Cart(customer_id, variant_id, item.quantity).save, 'set'):
+            raise HTTPException(status_code=404, detail="Variant not found")
+        return await db.run(Cart.get_cart, customer_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/items/batch", response_model=CartResponse)
+async def update_cart_items(
+    data: CartBatchUpdate,
+    principal: dict = Depends(get_current_principal)
+):
+    """
+    Thêm / cập nhật nhiều dòng trong một câu lệnh.
+    Variant không tồn tại được trả về trong missing_variant_ids
+    """
+    try:
+        customer_id = _customer_id(principal)
+        removed = [i.variant_id for i in data.items if i.quantity == 0 and data.mode == CartBatchMode.set]
+        lines = [(i.variant_id, i.quantity) for i in data.items if i.quantity > 0]
+        if removed:
+            await db.run(Cart.remove_variants, customer_id, *removed)
+        if lines:
+            await db.run(Cart.save_many, customer_id, lines, data.mode.value)
+        cart = await db.run(Cart.get_cart, customer_id)
+        in_cart = {item['productvariant_id'] for item in cart['items']}
+        cart['missing_variant_ids'] = sorted({
+            variant_id for variant_id, _ in lines if variant_id not in in_cart
+        })
+        return cart
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/items/{variant_id}", response_model=CartResponse)
+async def remove_cart_item(
+    variant_id: int = Path(..., description="Variant id in the cart"),
+    principal: dict = Depends(get_current_principal)
+):
+    """Xóa một variant khỏi giỏ"""
+    try:
+        customer_id = _customer_id(principal)
+        if not await db.run(Cart.remove_variants, customer_id, variant_id):
+            raise HTTPException(status_code=404, detail="Item not in cart")
+        return await db.run(Cart.get_cart, customer_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/")
+async def clear_cart(principal: dict = Depends(get_current_principal)):
+    """Xóa toàn bộ giỏ hàng"""
+    try:
+        removed = await db.run(Cart.clear_cart, _customer_id(principal))
+        return {"message": "Cart cleared", "removed": removed}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -3,6 +3,7 @@ from app.schemas import LoginRequest, Token
 from app.models.customer import Customer
 from app.models.employee import Employee
 from app.security import *
+from app.database import db
 router = APIRouter(
     prefix="/login",
     tags=["login"]
@@ -15,11 +16,11 @@ async def login_for_access_token(login_request: LoginRequest):
     user = None
     hashed_password = None
     if login_request.role == 'customer':
-        user = Customer.get_by_username(login_request.username)
+        user = await db.run(Customer.get_by_username, login_request.username)
         if user:
             hashed_password = user.get('password')
     elif login_request.role == 'employee':
-        user = Employee.get_by_username(login_request.username)
+        user = await db.run(Employee.get_by_username, login_request.username)
         if user:
             hashed_password = user.get('password')
     else:
@@ -28,7 +29,18 @@ async def login_for_access_token(login_request: LoginRequest):
             detail="Vai trò không hợp lệ."
         )
 
-    if not user or not hashed_password or not verify_password(login_request.password, hashed_password):
+    try:
+        password_ok = bool(user and hashed_password) and await verify_password_async(
+            login_request.password, hashed_password
+        )
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Hệ thống đang bận, vui lòng thử lại sau",
+            headers={"Retry-After": "1"},
+        )
+
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Tên đăng nhập hoặc mật khẩu không chính xác",
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+from app.metrics import collect_all, render
+from app.database import db
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Metric dạng Prometheus text (gộp mọi worker khi có METRICS_MULTIPROC_DIR)"""
+    try:
+        text = render(await db.run(collect_all))
+        return PlainTextResponse(text, media_type="text/plain; version=0.0.4; charset=utf-8")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, HTTPException, Path
+from app.schemas import *
+from app.database import db
+from app.dependencies import get_current_principal
+from app.models.order import Order
+from app.models.product_variant import InsufficientStockError
+from app.services.checkout import EmptyCartError, checkout
+
+router = APIRouter(
+    prefix="/orders",
+    tags=["orders"]
+)
+
+
+@router.post("/checkout", response_model=CheckoutResponse)
+async def checkout_cart(
+    data: CheckoutRequest = CheckoutRequest(),
+    principal: dict = Depends(get_current_principal)
+):
+    """Đặt hàng toàn bộ giỏ hàng trong một transaction"""
+    try:
+        if principal.get("role") != "customer":
+            raise HTTPException(status_code=403, detail="Only customers can check out")
+        return await db.run(checkout, principal["id"], data.payment_method, data.carrier)
+    except EmptyCartError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except InsufficientStockError as e:
+        detail = str(e) if e.variant_id is not None else "Insufficient stock"
+        raise HTTPException(status_code=409, detail=detail)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.put("/{order_id}/status")
+async def update_order_status(
+    data: OrderStatusUpdate,
+    order_id: int = Path(..., description="The ID of the order"),
+    principal: dict = Depends(get_current_principal)
+):
+    """Cập nhật trạng thái đơn hàng (nhân viên)"""
+    try:
+        if principal.get("role") != "employee":
+            raise HTTPException(status_code=403, detail="Only employees can update orders")
+        if not await db.run(Order.update_status, order_id, data.status.value):
+            raise HTTPException(status_code=404, detail="Order not found")
+        return {"message": "Order status updated successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,9 +1,21 @@
-from fastapi import APIRouter, HTTPException, Query, Path
+from fastapi import APIRouter, HTTPException, Query, Path, Request, Response
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from app.schemas import *
+import io
 import json
+import os
+import tempfile
 from app.models.product import Product
 from app.models.product_variant import ProductVariant
+from app.database import db
+from app.pagination import decode_cursor, next_cursor
+from app.serialization import render
+from app.http_cache import check_etag
+from app.services.catalog_import import import_catalog
+from app.services.catalog_export import MEDIA_TYPES, export_catalog
+from app.services.search import search_index
+from app.services.facets import facet_index
 
 router = APIRouter(
     prefix="/products",
@@ -11,97 +23,221 @@ router = APIRouter(
 )
 
 
+def _decode_product_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Lấy id sản phẩm cuối trang trước từ cursor, None nếu không dùng cursor"""
+    if not cursor:
+        return None
+    try:
+        after_id = decode_cursor(cursor, 1)[0]
+        return int(after_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 
 @router.get("/", response_model=PaginatedProductList)
 async def get_products(
+    request: Request,
+    response: Response,
     category_id: Optional[int] = Query(None, description="Filter products by category"),
     status: Optional[str] = Query(None, description="Filter products by status"),
     include_variants: bool = Query(False, description="Include product variants in response"),
     skip: int = Query(0, ge=0, description="Skip records"),
-    limit: int = Query(10, ge=1, le=100, description="Limit records per page")
+    limit: int = Query(10, ge=1, le=100, description="Limit records per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from next_cursor (keyset pagination, skip is ignored)")
 ):
     """Lấy danh sách sản phẩm với các tùy chọn lọc và phân trang"""
     try:
+        headers, not_modified = await check_etag(request, response, "products", "catalog")
+        if not_modified:
+            return not_modified
         if status and status.lower() not in ["in stock", "out of stock"]:
             raise HTTPException(status_code=400, detail="Invalid status value")
+        after_id = _decode_product_cursor(cursor)
 
-        # Get products based on category
-        if category_id:
-            products = Product.get_by_category(category_id, skip, limit)
-            total = Product.count_by_category(category_id)
-        else:
-            products = Product.get_all(skip, limit)
-            total = Product.count_all()
-
-        # Filter by status if specified
-        if status:
-            products = [p for p in products if p['status'].lower() == status.lower()]
-            if category_id:
-                total = len(products)  # Recount after filtering
+        # Lọc theo category và status trong cùng một câu truy vấn, total đếm
+        # bằng cùng điều kiện WHERE nên luôn khớp với các trang
+        filters = {'category_id': category_id, 'status': status}
+        products = await db.run(Product.find, filters, skip, limit, after_id)
+        total = await db.run(Product.count, filters)
 
         # Include variants if requested
         if include_variants:
+            variants_by_product = await db.run(
+                ProductVariant.get_by_products, [product['id'] for product in products]
+            )
             for product in products:
-                variants = ProductVariant.get_by_product(product['id'])
-                product['variants'] = variants or []
+                product['variants'] = variants_by_product.get(product['id'], [])
 
-        return {
+        return render(PaginatedProductList, {
             "items": products,
             "total": total,
             "skip": skip,
-            "limit": limit
-        }
+            "limit": limit,
+            "next_cursor": next_cursor(products, limit, 'id')
+        }, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/category/{category_id}", response_model=PaginatedProductList)
 async def get_products_by_category(
+    request: Request,
+    response: Response,
     category_id: int = Path(..., description="The ID of the category to filter by"),
     include_variants: bool = Query(False, description="Include product variants in response"),
     skip: int = Query(0, ge=0, description="Skip records"),
-    limit: int = Query(10, ge=1, le=100, description="Limit records per page")
+    limit: int = Query(10, ge=1, le=100, description="Limit records per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from next_cursor (keyset pagination, skip is ignored)")
 ):
     """Lấy danh sách sản phẩm theo category"""
     try:
-        products = Product.get_by_category(category_id, skip, limit)
-        if not products:
-            return {
-                "items": [],
-                "total": 0,
-                "skip": skip,
-                "limit": limit
-            }
+        headers, not_modified = await check_etag(request, response, "products", "catalog")
+        if not_modified:
+            return not_modified
+        after_id = _decode_product_cursor(cursor)
+        if after_id is not None:
+            products = await db.run(Product.get_by_category_after, category_id, after_id, limit)
+        else:
+            products = await db.run(Product.get_by_category, category_id, skip, limit)
+        # Trang rỗng (skip vượt quá, hết cursor) vẫn trả total thật và cùng header
+        total = await db.run(Product.count_by_category, category_id)
+
+        if include_variants:
+            variants_by_product = await db.run(
+                ProductVariant.get_by_products, [product['id'] for product in products]
+            )
+            for product in products:
+                product['variants'] = variants_by_product.get(product['id'], [])
+
+        return render(PaginatedProductList, {
+            "items": products,
+            "total": total,
+            "skip": skip,
+            "limit": limit,
+            "next_cursor": next_cursor(products, limit, 'id')
+        }, headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/search", response_model=ProductSearchResults)
+async def search_products(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="Search text (diacritics optional)"),
+    category_id: Optional[int] = Query(None, description="Filter products by category"),
+    status: Optional[str] = Query(None, description="Filter products by status"),
+    skip: int = Query(0, ge=0, description="Skip records"),
+    limit: int = Query(10, ge=1, le=100, description="Limit records per page")
+):
+    """Tìm kiếm sản phẩm theo tên và mô tả (BM25, không phân biệt dấu)"""
+    try:
+        if not search_index.ready:
+            raise HTTPException(status_code=503, detail="Search index is not ready")
+        if status and status.lower() not in ["in stock", "out of stock"]:
+            raise HTTPException(status_code=400, detail="Invalid status value")
+        headers, not_modified = await check_etag(request, response, "products", "catalog")
+        if not_modified:
+            return not_modified
+
+        hits, total = await db.run(search_index.search, q, category_id, status, skip, limit)
+        products = await db.run(Product.get_by_ids, [product_id for product_id, _ in hits])
+        scores = dict(hits)
+        for product in products:
+            product['score'] = scores[product['id']]
+
+        return render(ProductSearchResults, {
+            "items": products,
+            "total": total,
+            "skip": skip,
+            "limit": limit,
+            "query": q
+        }, headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/facets", response_model=FacetedProductList)
+async def get_products_by_facets(
+    request: Request,
+    response: Response,
+    color: Optional[List[str]] = Query(None, description="Variant colors (any of)"),
+    size: Optional[List[str]] = Query(None, description="Size buckets, e.g. 10-20 (any of)"),
+    price: Optional[List[str]] = Query(None, description="Price buckets, e.g. 100000-200000 (any of)"),
+    category_id: Optional[List[int]] = Query(None, description="Categories (any of)"),
+    include_variants: bool = Query(False, description="Include product variants in response"),
+    skip: int = Query(0, ge=0, description="Skip records"),
+    limit: int = Query(10, ge=1, le=100, description="Limit records per page")
+):
+    """Lọc sản phẩm theo màu, nhóm size, khoảng giá, kèm số lượng cho từng giá trị facet"""
+    try:
+        if not facet_index.ready:
+            raise HTTPException(status_code=503, detail="Facet index is not ready")
+        headers, not_modified = await check_etag(request, response, "products", "catalog")
+        if not_modified:
+            return not_modified
 
-        total = Product.count_by_category(category_id)
+        product_ids, total, counts = await db.run(facet_index.query, {
+            "color": color,
+            "size": size,
+            "price": price,
+            "category": category_id,
+        }, skip, limit)
+        products = await db.run(Product.get_by_ids, product_ids)
 
         if include_variants:
+            variants_by_product = await db.run(
+                ProductVariant.get_by_products, [product['id'] for product in products]
+            )
             for product in products:
-                variants = ProductVariant.get_by_product(product['id'])
-                product['variants'] = variants or []
+                product['variants'] = variants_by_product.get(product['id'], [])
 
-        return {
+        return render(FacetedProductList, {
             "items": products,
             "total": total,
             "skip": skip,
-            "limit": limit
-        }
+            "limit": limit,
+            "facets": counts
+        }, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/export")
+async def export_products(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Export format: ndjson or csv"),
+    chunk_size: int = Query(1000, ge=100, le=10000, description="Rows fetched and flushed per chunk")
+):
+    """Xuất toàn bộ catalog dạng stream (sản phẩm, variant, tên category)"""
+    return StreamingResponse(
+        export_catalog(format, chunk_size),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="catalog.{format}"'}
+    )
+
 @router.get("/{product_id}", response_model=ProductResponse)
 async def get_product(
+    request: Request,
+    response: Response,
     product_id: int = Path(..., description="The ID of the product to get"),
     include_variants: bool = Query(True, description="Include product variants in response")
 ):
     """Lấy thông tin chi tiết một sản phẩm và các biến thể của nó"""
     try:
-        product = Product.get_by_id(product_id)
+        _, not_modified = await check_etag(request, response, "product", f"product:{product_id}", "ratings")
+        if not_modified:
+            return not_modified
+        product = await db.run(Product.get_by_id, product_id)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
 
         # Lấy thông tin variants nếu được yêu cầu
         if include_variants:
-            variants = ProductVariant.get_by_product(product_id)
+            variants = await db.run(ProductVariant.get_by_product, product_id)
             product['variants'] = variants or []
 
         # Parse category JSON returned by MySQL JSON_OBJECT (may come as string)
@@ -113,6 +249,8 @@ async def get_product(
                 pass
 
         return product
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -128,26 +266,48 @@ async def create_product(product: ProductCreate):
             status=product.status,
             artisan_description=product.artisan_description
         )
-        product_id = new_product.save()
-
-        # Tạo các biến thể
-        variants = []
-        for variant in product.variants:
-            new_variant = ProductVariant(
-                product_id=product_id,
-                color=variant.color,
-                size=variant.size,
-                price=variant.price,
-                amount=variant.amount
-            )
-            variant_id = new_variant.save()
-            variants.append({**variant.dict(), 'id': variant_id, 'product_id': product_id})
+        # Sản phẩm và các biến thể được tạo trong một transaction
+        product_id, category, variants = await db.run(
+            new_product.create_with_variants,
+            [variant.model_dump() for variant in product.variants]
+        )
 
-        # Lấy thông tin sản phẩm vừa tạo
-        created_product = Product.get_by_id(product_id)
-        created_product['variants'] = variants
+        # Dựng response từ dữ liệu vừa ghi, không cần đọc lại sản phẩm
+        return {
+            "id": product_id,
+            "name": product.name,
+            "description": product.description,
+            "category_id": product.category_id,
+            "status": product.status,
+            "artisan_description": product.artisan_description,
+            "category": category,
+            "variants": variants
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return created_product
+@router.post("/import", response_model=CatalogImportReport)
+async def import_products(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Body format: ndjson or csv"),
+    chunk_size: int = Query(500, ge=1, le=5000, description="Products per INSERT transaction")
+):
+    """
+    Nhập nhiều sản phẩm từ body CSV/NDJSON (xem app/services/catalog_import.py).
+    Body được ghi tạm ra file (giữ tối đa 1MB trong RAM) rồi đọc từng dòng.
+    """
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as spool:
+            async for chunk in request.stream():
+                spool.write(chunk)
+            spool.seek(0)
+            lines = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+            return await db.run(
+                import_catalog, lines, format, chunk_size,
+                timeout=float(os.getenv('CATALOG_IMPORT_TIMEOUT', 3600))
+            )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -161,44 +321,58 @@ async def update_product_status(
         if status not in ["In stock", "out of stock"]:
             raise HTTPException(status_code=400, detail="Invalid status")
         
-        success = Product.update_status(product_id, status)
+        success = await db.run(Product.update_status, product_id, status)
         if not success:
             raise HTTPException(status_code=404, detail="Product not found")
             
         return {"message": f"Product status updated to {status}"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{product_id}/variants", response_model=List[ProductVariantResponse])
 async def get_product_variants(
+    request: Request,
+    response: Response,
     product_id: int = Path(..., description="The ID of the product to get variants for")
 ):
     """Lấy danh sách các biến thể của một sản phẩm"""
     try:
+        _, not_modified = await check_etag(request, response, "variants", f"product:{product_id}")
+        if not_modified:
+            return not_modified
         # Kiểm tra sản phẩm tồn tại
-        product = Product.get_by_id(product_id)
+        product = await db.run(Product.get_by_id, product_id)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
 
-        variants = ProductVariant.get_by_product(product_id, variant_id = None, get_one= False)
+        variants = await db.run(ProductVariant.get_by_product, product_id, variant_id=None, get_one=False)
         if not variants:
             return []  # Trả về list rỗng thay vì báo lỗi
             
         return variants
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 # Lấy endpoint lấy một biến thể của sản phẩm
 @router.get("/{product_id}/variants/{variant_id}", response_model=ProductVariantResponse)
 async def get_product_variant_one(
+    request: Request,
+    response: Response,
     product_id: int = Path(..., description="The ID of the product"),
     variant_id: int = Path(..., description="The ID of the variant")
 ):
     try:
-        product = Product.get_by_id(product_id)
+        _, not_modified = await check_etag(request, response, "variants", f"product:{product_id}")
+        if not_modified:
+            return not_modified
+        product = await db.run(Product.get_by_id, product_id)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
 
-        variant = ProductVariant.get_by_product(product_id=product_id, variant_id=variant_id, get_one=True)
+        variant = await db.run(ProductVariant.get_by_product, product_id=product_id, variant_id=variant_id, get_one=True)
         if not variant:
             raise HTTPException(status_code=404, detail="Variant not found")
 
@@ -215,16 +389,22 @@ async def update_variant_stock(
 ):
     """Cập nhật số lượng tồn kho của variant"""
     try:
-        variant = ProductVariant.get_by_id(variant_id)
+        if amount == 0:
+            raise HTTPException(status_code=400, detail="Amount must not be zero")
+        if amount > 0:
+            success = await db.run(ProductVariant.update_stock, variant_id, amount)
+        else:
+            # Kiểm tra đủ hàng và trừ trong cùng một câu UPDATE
+            success = await db.run(ProductVariant.decrement_stock, variant_id, -amount)
+        if success:
+            return {"message": "Stock updated successfully"}
+
+        # Chỉ đọc lại khi thất bại để phân biệt 404 và thiếu hàng
+        variant = await db.run(ProductVariant.get_by_id, variant_id)
         if not variant:
             raise HTTPException(status_code=404, detail="Variant not found")
-            
-        new_amount = variant['amount'] + amount
-        if new_amount < 0:
-            raise HTTPException(status_code=400, detail="Insufficient stock")
-            
-        success = ProductVariant().update_stock(variant_id, amount)
-        if success:
-            return {"message": f"Stock updated successfully. New amount: {new_amount}"}
+        raise HTTPException(status_code=400, detail="Insufficient stock")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,33 +1,46 @@
-from fastapi import APIRouter, HTTPException, Path, Query
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, Response
 from app.schemas import *
 from app.models.review import Review
 from app.models.product import Product
 from app.models.product_variant import ProductVariant
-from app.security import verify_access_token
-from jose import JWTError
+from app.database import db
+from app.dependencies import get_optional_principal, resolve_principal
+from app.pagination import decode_cursor, next_cursor
+from app.serialization import render
+from app.http_cache import check_etag
+from typing import Optional
 router = APIRouter(
     tags=["reviews"]
 )
 
 
+def _decode_review_cursor(cursor: Optional[str]):
+    """Lấy (date, id) của review cuối trang trước từ cursor, None nếu không dùng cursor"""
+    if not cursor:
+        return None
+    try:
+        before_date, before_id = decode_cursor(cursor, 2)
+        return str(before_date), int(before_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 
 @router.post("/variants/{variant_id}/reviews", response_model=ReviewResponse)
 async def create_review_for_variant(
     variant_id: int = Path(..., description="Variant id to review"),
-    review: ReviewCreate = None
+    review: ReviewCreate = None,
+    principal: Optional[dict] = Depends(get_optional_principal)
 ):
     """Create a review for a specific product variant"""
     try:
-        payload = verify_access_token(review.access_token)
-        # Lấy thông tin customer và chuyển về số
-        customer_id = int(payload.get("sub"))
+        customer_id = resolve_principal(principal, review.access_token)["id"]
         # Ensure variant exists
-        variant = ProductVariant.get_by_id(variant_id)
+        variant = await db.run(ProductVariant.get_by_id, variant_id)
         if not variant:
             raise HTTPException(status_code=404, detail="Variant not found")
             
         # Check if user has bought the item
-        if not Review.check_user_buy_item(customer_id, variant_id):
+        if not await db.run(Review.check_user_buy_item, customer_id, variant_id):
             raise HTTPException(
                 status_code=403,
                 detail="You can only review items you have purchased and received"
@@ -38,46 +51,55 @@ async def create_review_for_variant(
             rating=review.rating,
             content=review.content
         )
-        success = new_review.save()
+        success = await db.run(new_review.save)
         if not success:
             raise HTTPException(status_code=500, detail="Failed to save review")
 
         # Fetch the most recent review for this variant
-        reviews = Review.get_by_product_variant(variant_id)
+        reviews = await db.run(Review.get_by_product_variant, variant_id, limit=1)
         created = reviews[0] if reviews else None
         if not created:
             raise HTTPException(status_code=500, detail="Review created but cannot be retrieved")
 
         return created
-    except JWTError as e:
-        raise HTTPException(
-            status_code=401,
-            detail=f"Could not validate credentials: {str(e)}",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/variants/{variant_id}/reviews", response_model=PaginatedReviewList)
 async def list_reviews_for_variant(
+    request: Request,
+    response: Response,
     variant_id: int = Path(..., description="Variant id"),
     skip: int = Query(0, ge=0),
-    limit: int = Query(10, ge=1, le=100)
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor from next_cursor (keyset pagination, skip is ignored)")
 ):
     """List reviews for a variant (paginated)"""
     try:
-        variant = ProductVariant.get_by_id(variant_id)
+        headers, not_modified = await check_etag(request, response, "reviews", "reviews")
+        if not_modified:
+            return not_modified
+        before = _decode_review_cursor(cursor)
+        variant = await db.run(ProductVariant.get_by_id, variant_id)
         if not variant:
             raise HTTPException(status_code=404, detail="Variant not found")
 
-        reviews = Review.get_by_product_variant(variant_id)
-        total = Review.count_by_variant(variant_id)
-
-        # Apply pagination in-memory (the model already supports LIMIT but we keep safety)
-        sliced = reviews[skip: skip + limit]
-
-        return {"items": sliced, "total": total, "skip": skip, "limit": limit}
+        if before:
+            reviews = await db.run(Review.get_by_product_variant_before, variant_id, *before, limit)
+        else:
+            reviews = await db.run(Review.get_by_product_variant, variant_id, skip, limit)
+        total = await db.run(Review.count_by_variant, variant_id)
+
+        return render(PaginatedReviewList, {
+            "items": reviews,
+            "total": total,
+            "skip": skip,
+            "limit": limit,
+            "next_cursor": next_cursor(reviews, limit, 'date', 'id')
+        }, headers=headers)
     except HTTPException:
         raise
     except Exception as e:
@@ -86,31 +108,35 @@ async def list_reviews_for_variant(
 
 @router.get("/products/{product_id}/reviews", response_model=PaginatedReviewList)
 async def list_reviews_for_product(
+    request: Request,
+    response: Response,
     product_id: int = Path(..., description="Product id"),
     skip: int = Query(0, ge=0),
-    limit: int = Query(10, ge=1, le=200)
+    limit: int = Query(10, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Cursor from next_cursor (keyset pagination, skip is ignored)")
 ):
     """List reviews for all variants of a product (aggregated)"""
     try:
-        product = Product.get_by_id(product_id)
+        headers, not_modified = await check_etag(request, response, "reviews", "reviews")
+        if not_modified:
+            return not_modified
+        before = _decode_review_cursor(cursor)
+        product = await db.run(Product.get_by_id, product_id)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
 
-        variants = ProductVariant.get_by_product(product_id) or []
-        all_reviews = []
-        for v in variants:
-            rv = Review.get_by_product_variant(v['id']) or []
-            all_reviews.extend(rv)
-
-        # sort reviews by date desc if date exists
-        try:
-            all_reviews.sort(key=lambda x: x.get('date', ''), reverse=True)
-        except Exception:
-            pass
-
-        total = len(all_reviews)
-        sliced = all_reviews[skip: skip + limit]
-        return {"items": sliced, "total": total, "skip": skip, "limit": limit}
+        if before:
+            items = await db.run(Review.get_page_by_product_before, product_id, *before, limit)
+            total = await db.run(Review.count_by_product, product_id)
+        else:
+            items, total = await db.run(Review.get_page_by_product, product_id, skip, limit)
+        return render(PaginatedReviewList, {
+            "items": items,
+            "total": total,
+            "skip": skip,
+            "limit": limit,
+            "next_cursor": next_cursor(items, limit, 'date', 'id')
+        }, headers=headers)
     except HTTPException:
         raise
     except Exception as e:
@@ -121,7 +147,7 @@ async def list_reviews_for_product(
 async def get_review(review_id: int = Path(..., description="Review id")):
     """Get a single review by id"""
     try:
-        r = Review.get_by_id(review_id)
+        r = await db.run(Review.get_by_id, review_id)
         if not r:
             raise HTTPException(status_code=404, detail="Review not found")
         return r
@@ -132,15 +158,18 @@ async def get_review(review_id: int = Path(..., description="Review id")):
 
 
 @router.put("/reviews/{review_id}", response_model=ReviewResponse)
-async def update_review(review_id: int = Path(..., description="Review id"), data: ReviewUpdate = None):
+async def update_review(
+    review_id: int = Path(..., description="Review id"),
+    data: ReviewUpdate = None,
+    principal: Optional[dict] = Depends(get_optional_principal)
+):
     """Update rating or content of a review"""
     try:
-        # Xác thực token
-        payload = verify_access_token(data.access_token)
-        customer_id = int(payload.get("sub"))
+        # Xác thực token (header Bearer hoặc access_token trong body)
+        customer_id = resolve_principal(principal, data.access_token)["id"]
 
         # Kiểm tra review tồn tại
-        existing = Review.get_by_id(review_id)
+        existing = await db.run(Review.get_by_id, review_id)
         if not existing:
             raise HTTPException(status_code=404, detail="Review not found")
 
@@ -152,18 +181,12 @@ async def update_review(review_id: int = Path(..., description="Review id"), dat
             )
 
         # Cập nhật review
-        success = Review.update(review_id, rating=data.rating, content=data.content)
+        success = await db.run(Review.update, review_id, rating=data.rating, content=data.content)
         if not success:
             raise HTTPException(status_code=500, detail="Failed to update review")
 
-        updated = Review.get_by_id(review_id)
+        updated = await db.run(Review.get_by_id, review_id)
         return updated
-    except JWTError as e:
-        raise HTTPException(
-            status_code=401,
-            detail=f"Could not validate credentials: {str(e)}",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
     except HTTPException:
         raise
     except Exception as e:
@@ -173,16 +196,16 @@ async def update_review(review_id: int = Path(..., description="Review id"), dat
 @router.delete("/reviews/{review_id}")
 async def delete_review(
     review_id: int = Path(..., description="Review id"),
-    data: ReviewDelete = None
+    data: ReviewDelete = None,
+    principal: Optional[dict] = Depends(get_optional_principal)
 ):
     """Delete a review"""
     try:
-        # Xác thực token
-        payload = verify_access_token(data.access_token)
-        customer_id = int(payload.get("sub"))
+        # Xác thực token (header Bearer hoặc access_token trong body)
+        customer_id = resolve_principal(principal, data.access_token if data else None)["id"]
 
         # Kiểm tra review tồn tại
-        existing = Review.get_by_id(review_id)
+        existing = await db.run(Review.get_by_id, review_id)
         if not existing:
             raise HTTPException(status_code=404, detail="Review not found")
 
@@ -194,17 +217,11 @@ async def delete_review(
             )
 
         # Xóa review
-        success = Review.delete(review_id)
+        success = await db.run(Review.delete, review_id)
         if not success:
             raise HTTPException(status_code=500, detail="Failed to delete review")
 
         return {"message": "Review deleted"}
-    except JWTError as e:
-        raise HTTPException(
-            status_code=401,
-            detail=f"Could not validate credentials: {str(e)}",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
     except HTTPException:
         raise
     except Exception as e:
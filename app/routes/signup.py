@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException
 from app.schemas import CustomerCreate, CustomerCreateResponse
 from app.models.customer import Customer
-from app.security import hash_password
+from app.security import hash_password_async, PasswordHasherBusy
+from app.database import db
 
 router = APIRouter(
     prefix="/register",
@@ -12,7 +13,7 @@ router = APIRouter(
 async def signup(customer: CustomerCreate):
     """Thực hiện chức năng đăng ký cho người dùng"""
     # Kiểm tra email đã tồn tại chưa
-    existing_user = Customer.get_by_email(customer.email)
+    existing_user = await db.run(Customer.get_by_email, customer.email)
     if existing_user:
         raise HTTPException(
             status_code=400,
@@ -21,7 +22,7 @@ async def signup(customer: CustomerCreate):
 
     try:
         # Hash mật khẩu trước khi lưu
-        customer_password_hashed = hash_password(customer.password)
+        customer_password_hashed = await hash_password_async(customer.password)
         
         # Tạo customer mới
         new_customer = Customer(
@@ -34,13 +35,19 @@ async def signup(customer: CustomerCreate):
         )
         
         # Lưu vào database
-        new_customer.save()
+        await db.run(new_customer.save)
         
         return CustomerCreateResponse(
             message="Đăng ký thành công",
             email=customer.email,
             fullname=customer.name
         )
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Hệ thống đang bận, vui lòng thử lại sau",
+            headers={"Retry-After": "1"},
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
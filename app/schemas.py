@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr, ValidationError
-from typing import List, Optional
+from typing import Dict, List, Optional
 from enum import Enum
 import re
 from datetime import datetime
@@ -36,6 +36,8 @@ class ProductResponse(BaseModel):
     artisan_description: str
     category: Optional[CategoryBase] = None
     variants: Optional[List[ProductVariantResponse]] = None
+    rating_count: int = 0
+    average_rating: Optional[float] = None
 
 class ProductListItem(BaseModel):
     id: int
@@ -46,12 +48,47 @@ class ProductListItem(BaseModel):
     artisan_description: str
     category_name: Optional[str] = None
     variants: Optional[List[ProductVariantResponse]] = None
+    rating_count: int = 0
+    average_rating: Optional[float] = None
 
 class PaginatedProductList(BaseModel):
     items: List[ProductListItem]
     total: int
     skip: int
     limit: int
+    next_cursor: Optional[str] = None
+
+class ProductSearchHit(ProductListItem):
+    score: float
+
+class ProductSearchResults(BaseModel):
+    items: List[ProductSearchHit]
+    total: int
+    skip: int
+    limit: int
+    query: str
+
+class FacetCounts(BaseModel):
+    category: Dict[str, int]
+    color: Dict[str, int]
+    size: Dict[str, int]
+    price: Dict[str, int]
+
+class FacetedProductList(BaseModel):
+    items: List[ProductListItem]
+    total: int
+    skip: int
+    limit: int
+    facets: FacetCounts
+
+class CatalogImportError(BaseModel):
+    row: int
+    error: str
+
+class CatalogImportReport(BaseModel):
+    created: int
+    failed: int
+    errors: List[CatalogImportError]
 PHONE_REGEX = r'^0[0-9]{9}$'
 # Pydantic schemas user sign up
 class CustomerCreate(BaseModel):
@@ -84,7 +121,8 @@ class Token(BaseModel):
     token_type: str
 # Pydantic schemas review
 class ReviewCreate(BaseModel):
-    access_token: str
+    # Nên gửi token qua header Authorization: Bearer; trường này giữ cho client cũ
+    access_token: Optional[str] = None
     rating: int = Field(..., ge=1, le=5)
     content: Optional[str] = None
 
@@ -105,15 +143,86 @@ class ReviewResponse(BaseModel):
         }
 
 class ReviewUpdate(BaseModel):
-    access_token: str
+    # Nên gửi token qua header Authorization: Bearer; trường này giữ cho client cũ
+    access_token: Optional[str] = None
     rating: Optional[int] = Field(None, ge=1, le=5)
     content: Optional[str] = None
 
 class ReviewDelete(BaseModel):
-    access_token: str
+    # Nên gửi token qua header Authorization: Bearer; trường này giữ cho client cũ
+    access_token: Optional[str] = None
 
 class PaginatedReviewList(BaseModel):
     items: List[ReviewResponse]
     total: int
     skip: int
-    limit: int
\ No newline at end of file
+    limit: int
+    next_cursor: Optional[str] = None
+# Pydantic schemas cart
+class CartItemCreate(BaseModel):
+    variant_id: int
+    quantity: int = Field(1, ge=1)
+
+class CartItemUpdate(BaseModel):
+    # 0 để xóa dòng khỏi giỏ
+    quantity: int = Field(..., ge=0)
+
+class CartBatchMode(str, Enum):
+    add = 'add'
+    set = 'set'
+
+class CartBatchItem(BaseModel):
+    variant_id: int
+    quantity: int = Field(..., ge=0)
+
+class CartBatchUpdate(BaseModel):
+    items: List[CartBatchItem] = Field(..., min_length=1, max_length=200)
+    # add: cộng dồn số lượng; set: ghi đè (0 để xóa dòng)
+    mode: CartBatchMode = CartBatchMode.add
+
+class CartItemResponse(BaseModel):
+    id: int
+    productvariant_id: int
+    product_id: int
+    product_name: str
+    color: Optional[str] = None
+    size: Optional[int] = None
+    price: float
+    quantity: int
+    total_price: float
+    stock: int
+
+class CartResponse(BaseModel):
+    items: List[CartItemResponse]
+    total: float
+    item_count: int
+    missing_variant_ids: List[int] = []
+
+# Pydantic schemas order
+class OrderStatusEnum(str, Enum):
+    pending = 'pending'
+    confirmed = 'confirmed'
+    shipping = 'shipping'
+    received = 'received'
+    cancelled = 'cancelled'
+
+class OrderStatusUpdate(BaseModel):
+    status: OrderStatusEnum
+
+class CheckoutRequest(BaseModel):
+    payment_method: str = 'COD'
+    carrier: str = 'GHTK'
+
+class OrderLine(BaseModel):
+    variant_id: int
+    quantity: int
+    price: float
+
+class CheckoutResponse(BaseModel):
+    order_id: int
+    payment_id: int
+    shipment_id: int
+    status: str
+    date: datetime
+    total: float
+    items: List[OrderLine]
@@ -2,6 +2,13 @@ from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
 from jose import JWSError, jwt
 from dotenv import load_dotenv
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+import asyncio
+import hashlib
+import threading
+import time
+import multiprocessing
 import os
 load_dotenv()
 # Khởi tạo CryptContext với thuật toán bcrypt.
@@ -49,6 +56,76 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     # băm plain_password và so sánh hai chuỗi băm.
     return pwd_context.verify(plain_password, hashed_password)
 
+class PasswordHasherBusy(Exception):
+    """Hàng đợi băm mật khẩu đã đầy, client nên thử lại sau"""
+
+
+class PasswordHasher:
+    """
+    Chạy bcrypt trong pool process riêng để không chặn event loop và tận dụng
+    tất cả CPU. Số việc đang chờ bị giới hạn bởi queue_size: khi đầy sẽ raise
+    PasswordHasherBusy thay vì xếp hàng vô hạn.
+    """
+
+    def __init__(self, workers, queue_size):
+        self.workers = max(workers, 1)
+        self.queue_size = max(queue_size, 1)
+        self.pending = 0
+        self.rejected = 0
+        self._executor = None
+
+    def start(self):
+        if self._executor is None:
+            # spawn: không fork process đang có các thread của pool database
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, func, *args):
+        # pending chỉ được sửa trong event loop nên không cần khóa
+        if self.pending >= self.queue_size:
+            self.rejected += 1
+            raise PasswordHasherBusy("Password hashing queue is full")
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.start(), func, *args)
+        finally:
+            self.pending -= 1
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "pending": self.pending,
+            "rejected": self.rejected,
+        }
+
+
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+password_hasher = PasswordHasher(
+    workers=PASSWORD_HASH_WORKERS,
+    queue_size=int(os.getenv('PASSWORD_HASH_QUEUE_SIZE', PASSWORD_HASH_WORKERS * 16))
+)
+
+
+async def hash_password_async(password: str) -> str:
+    """hash_password chạy trong pool process, dùng trong các route async"""
+    return await password_hasher.run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password chạy trong pool process, dùng trong các route async"""
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+
 def verify_access_token(token: str):
     """
     Xác thực JWT Access Token.
@@ -73,4 +150,67 @@ def verify_access_token(token: str):
         
     except JWSError as e:
         # Xử lý các lỗi như token không hợp lệ, đã hết hạn, v.v.
-        raise e
\ No newline at end of file
+        raise e
+
+
+class TokenCache:
+    """
+    Cache payload của các token đã xác thực, key là sha256 của token.
+    Mỗi payload chỉ được dùng đến thời điểm `exp` của chính token đó,
+    giới hạn max_entries phần tử (bỏ phần tử cũ nhất khi đầy).
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max(max_entries, 1)
+        self._data = OrderedDict()  # digest -> (exp, payload)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token: str):
+        digest = self._digest(token)
+        with self._lock:
+            entry = self._data.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            exp, payload = entry
+            if exp <= time.time():
+                del self._data[digest]
+                self.misses += 1
+                return None
+            self._data.move_to_end(digest)
+            self.hits += 1
+            return payload
+
+    def set(self, token: str, payload: dict):
+        exp = payload.get("exp")
+        if exp is None:
+            return
+        with self._lock:
+            self._data[self._digest(token)] = (float(exp), payload)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+token_cache = TokenCache(int(os.getenv('TOKEN_CACHE_SIZE', 10000)))
+
+
+def verify_access_token_cached(token: str):
+    """
+    Như verify_access_token nhưng dùng lại payload đã giải mã của token
+    còn hạn, chỉ chạy jwt.decode khi token chưa có trong cache.
+    """
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = verify_access_token(token)
+        token_cache.set(token, payload)
+    return payload
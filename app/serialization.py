@@ -0,0 +1,99 @@
+"""
+Đường tắt serialize cho các response danh sách lớn (opt-in bằng FAST_RESPONSES=1).
+
+Mặc định FastAPI validate từng dict qua response_model rồi encode bằng json.
+Với dữ liệu lấy thẳng từ database (tin cậy được), đường tắt chỉ chọn đúng
+các field của schema bằng hàm projector biên dịch sẵn cho mỗi model, rồi
+encode bằng orjson (nếu đã cài) và trả về Response trực tiếp, nên FastAPI
+không validate lại.
+"""
+import json
+import os
+import types
+from datetime import date, datetime
+from decimal import Decimal
+from typing import List, Union, get_args, get_origin
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson là tùy chọn, không có thì dùng json chuẩn
+    orjson = None
+
+FAST_RESPONSES = os.getenv('FAST_RESPONSES', '0') == '1'
+
+_projectors = {}
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encode bằng orjson khi có, fallback json chuẩn"""
+
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, default=_default)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def _nested_projector(annotation):
+    """Projector cho field là model con, list model con hoặc Optional của chúng"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return compile_projector(annotation)
+    origin = get_origin(annotation)
+    if origin in (list, List):
+        inner = _nested_projector(get_args(annotation)[0])
+        if inner is not None:
+            return lambda items: None if items is None else [inner(item) for item in items]
+        return None
+    if origin in (Union, types.UnionType):
+        for arg in get_args(annotation):
+            if arg is not type(None):
+                inner = _nested_projector(arg)
+                if inner is not None:
+                    return lambda value: None if value is None else inner(value)
+    return None
+
+
+def compile_projector(model):
+    """
+    Sinh hàm chuyển một dict (dòng database) thành dict chỉ gồm các field
+    của `model`, field thiếu lấy giá trị mặc định. Kết quả được cache theo model.
+    """
+    projector = _projectors.get(model)
+    if projector is not None:
+        return projector
+    fields = []
+    for name, field in model.model_fields.items():
+        default = None if field.is_required() else field.get_default(call_default_factory=True)
+        fields.append((name, default, _nested_projector(field.annotation)))
+
+    def project(row):
+        if isinstance(row, BaseModel):
+            row = row.__dict__
+        result = {}
+        for name, default, nested in fields:
+            value = row.get(name, default)
+            result[name] = nested(value) if nested is not None and value is not None else value
+        return result
+
+    _projectors[model] = project
+    return project
+
+
+def render(model, content, fast=None, headers=None):
+    """
+    Trả `content` cho route có response_model=model.
+    Đường tắt: projector + FastJSONResponse (kèm headers); ngược lại trả
+    content để FastAPI validate.
+    """
+    if fast if fast is not None else FAST_RESPONSES:
+        return FastJSONResponse(compile_projector(model)(content), headers=headers)
+    return content
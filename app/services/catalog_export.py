@@ -0,0 +1,107 @@
+"""
+Xuất toàn bộ catalog (sản phẩm, variant, tên category) cho đối tác và
+bộ đánh chỉ mục tìm kiếm.
+
+Dữ liệu được đọc bằng server-side cursor (db.stream) và trả về từng khối
+văn bản, mỗi khối ứng với một chunk dòng từ database, nên bộ nhớ dùng
+không phụ thuộc kích thước catalog.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+from app.database import db
+
+EXPORT_QUERY = """
+SELECT
+    p.id,
+    p.name,
+    p.description,
+    p.category_id,
+    p.status,
+    p.artisan_description,
+    c.name as category_name,
+    v.id as variant_id,
+    v.color,
+    v.size,
+    v.price,
+    v.amount
+FROM Products p
+LEFT JOIN Categories c ON p.category_id = c.id
+LEFT JOIN ProductVariant v ON v.product_id = p.id
+ORDER BY p.id, v.id
+"""
+
+PRODUCT_COLUMNS = ("id", "name", "description", "category_id", "status", "artisan_description", "category_name")
+VARIANT_COLUMNS = ("variant_id", "color", "size", "price", "amount")
+CSV_COLUMNS = PRODUCT_COLUMNS + VARIANT_COLUMNS
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def iter_products(chunks):
+    """
+    Gom các dòng (đã sắp theo p.id) thành từng sản phẩm kèm list variants.
+    Sinh ra một list sản phẩm cho mỗi chunk dòng; sản phẩm nằm vắt qua hai
+    chunk được giữ lại đến chunk sau.
+    """
+    current = None
+    for rows in chunks:
+        finished = []
+        for row in rows:
+            if current is None or current["id"] != row["id"]:
+                if current is not None:
+                    finished.append(current)
+                current = {column: row[column] for column in PRODUCT_COLUMNS}
+                current["variants"] = []
+            if row["variant_id"] is not None:
+                current["variants"].append({
+                    "id": row["variant_id"],
+                    "color": row["color"],
+                    "size": row["size"],
+                    "price": row["price"],
+                    "amount": row["amount"],
+                })
+        if finished:
+            yield finished
+    if current is not None:
+        yield [current]
+
+
+def export_ndjson(chunk_size=1000):
+    """Sinh các khối NDJSON, mỗi dòng là một sản phẩm kèm variants"""
+    for products in iter_products(db.stream(EXPORT_QUERY, chunk_size=chunk_size)):
+        yield "".join(
+            json.dumps(product, ensure_ascii=False, default=_json_default) + "\n"
+            for product in products
+        )
+
+
+def export_csv(chunk_size=1000):
+    """Sinh các khối CSV, mỗi dòng là một variant (sản phẩm không có variant: cột variant để trống)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for rows in db.stream(EXPORT_QUERY, chunk_size=chunk_size):
+        for row in rows:
+            writer.writerow([row[column] for column in CSV_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_catalog(format="ndjson", chunk_size=1000):
+    if format == "csv":
+        return export_csv(chunk_size)
+    return export_ndjson(chunk_size)
@@ -0,0 +1,179 @@
+"""
+Nhập catalog số lượng lớn từ file CSV hoặc NDJSON.
+
+- NDJSON: mỗi dòng là một object JSON theo schema ProductCreate (có variants).
+- CSV: mỗi dòng là một variant, có header gồm các cột
+  product_ref, name, description, category_id, status, artisan_description,
+  color, size, price, amount.
+  Các dòng liên tiếp có cùng product_ref (hoặc cùng name nếu không có cột
+  product_ref) là các variant của cùng một sản phẩm.
+
+File được đọc tuần tự từng dòng, sản phẩm hợp lệ được gom thành chunk và
+ghi bằng INSERT nhiều dòng trong một transaction cho mỗi chunk, nên bộ nhớ
+dùng không phụ thuộc kích thước file. Dòng lỗi được ghi vào báo cáo và
+không làm dừng cả lần nhập.
+"""
+import csv
+import json
+from pydantic import ValidationError
+from app.database import db
+from app.models.category import Category
+from app.models.product import Product
+from app.models.product_variant import ProductVariant
+from app.schemas import ProductCreate, ProductVariantBase
+
+FORMATS = ("ndjson", "csv")
+PRODUCT_FIELDS = ("name", "description", "category_id", "status", "artisan_description")
+VARIANT_FIELDS = ("color", "size", "price", "amount")
+
+
+def _error_message(error):
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}"
+            for item in error.errors()
+        )
+    return str(error)
+
+
+def _blank_to_none(value):
+    return None if value is None or value.strip() == "" else value.strip()
+
+
+def iter_ndjson(lines):
+    """Sinh (số dòng, ProductCreate hoặc exception) từ các dòng NDJSON"""
+    for row_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield row_number, ProductCreate.model_validate(json.loads(line))
+        except (ValueError, ValidationError) as e:
+            yield row_number, e
+
+
+def iter_csv(lines):
+    """Sinh (số dòng đầu tiên của sản phẩm, ProductCreate hoặc exception) từ các dòng CSV"""
+    reader = csv.DictReader(lines)
+    current_key = None
+    current_row = None
+    current_fields = None
+    current_variants = []
+    current_error = None
+
+    def finish():
+        if current_error is not None:
+            return current_row, current_error
+        try:
+            return current_row, ProductCreate.model_validate({**current_fields, "variants": current_variants})
+        except ValidationError as e:
+            return current_row, e
+
+    # Dòng 1 là header nên dòng dữ liệu bắt đầu từ 2
+    for row_number, row in enumerate(reader, start=2):
+        key = _blank_to_none(row.get("product_ref")) or _blank_to_none(row.get("name"))
+        if key != current_key or current_fields is None:
+            if current_fields is not None:
+                yield finish()
+            current_key = key
+            current_row = row_number
+            current_fields = {
+                field: _blank_to_none(row.get(field))
+                for field in PRODUCT_FIELDS
+                if _blank_to_none(row.get(field)) is not None
+            }
+            current_variants = []
+            current_error = None
+        try:
+            variant = ProductVariantBase.model_validate({
+                field: _blank_to_none(row.get(field)) for field in VARIANT_FIELDS
+            })
+            current_variants.append(variant.model_dump())
+        except ValidationError as e:
+            if current_error is None:
+                current_error = ValueError(f"row {row_number}: {_error_message(e)}")
+    if current_fields is not None:
+        yield finish()
+
+
+class CatalogImporter:
+    """
+    Ghi các sản phẩm đã validate theo chunk.
+    max_errors: số lỗi tối đa giữ lại trong báo cáo (vẫn đếm tất cả lỗi)
+    """
+
+    def __init__(self, chunk_size=500, max_errors=1000):
+        self.chunk_size = max(chunk_size, 1)
+        self.max_errors = max_errors
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self._chunk = []
+        self._category_ids = None
+
+    def _record_error(self, row, error):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "error": _error_message(error)})
+
+    def _valid_category(self, category_id):
+        if self._category_ids is None:
+            self._category_ids = {c['id'] for c in Category.get_all()}
+        return category_id in self._category_ids
+
+    def _flush(self):
+        chunk, self._chunk = self._chunk, []
+        if not chunk:
+            return
+        products = [
+            Product(
+                name=p.name,
+                description=p.description,
+                category_id=p.category_id,
+                status=p.status,
+                artisan_description=p.artisan_description
+            )
+            for _, p in chunk
+        ]
+        try:
+            with db.transaction() as tx:
+                product_ids = Product.save_many(tx, products)
+                ProductVariant.save_for_products(tx, {
+                    product_id: [v.model_dump() for v in p.variants]
+                    for product_id, (_, p) in zip(product_ids, chunk)
+                })
+            self.created += len(chunk)
+        except Exception:
+            # Một sản phẩm lỗi làm hỏng cả chunk: ghi lại từng sản phẩm để tách dòng lỗi
+            for product, (row, p) in zip(products, chunk):
+                try:
+                    product.create_with_variants([v.model_dump() for v in p.variants])
+                    self.created += 1
+                except Exception as e:
+                    self._record_error(row, e)
+
+    def add(self, row, item):
+        """Nhận một kết quả từ iter_ndjson / iter_csv"""
+        if isinstance(item, Exception):
+            self._record_error(row, item)
+            return
+        if not self._valid_category(item.category_id):
+            self._record_error(row, ValueError(f"Category {item.category_id} not found"))
+            return
+        self._chunk.append((row, item))
+        if len(self._chunk) >= self.chunk_size:
+            self._flush()
+
+    def run(self, lines, format="ndjson"):
+        """Nhập toàn bộ các dòng, trả về báo cáo {created, failed, errors}"""
+        if format not in FORMATS:
+            raise ValueError(f"Unsupported format: {format}")
+        records = iter_csv(lines) if format == "csv" else iter_ndjson(lines)
+        for row, item in records:
+            self.add(row, item)
+        self._flush()
+        return {"created": self.created, "failed": self.failed, "errors": self.errors}
+
+
+def import_catalog(lines, format="ndjson", chunk_size=500):
+    """Nhập catalog từ một iterable các dòng văn bản (file đã mở, ...)"""
+    return CatalogImporter(chunk_size=chunk_size).run(lines, format)
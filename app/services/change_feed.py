@@ -0,0 +1,62 @@
+"""
+Theo dõi sản phẩm thay đổi ở mọi process qua bảng DataVersion.
+
+Mỗi lần ghi catalog tăng phiên bản scope "product:<id>" (app.cache.versions)
+và cột changed_at của dòng đó. Chỉ mục trong bộ nhớ (search, facet) gọi
+ChangeFeed.poll() trước khi truy vấn: tối đa mỗi INDEX_POLL_SECONDS giây
+một câu SELECT trên index changed_at, trả về id các sản phẩm đã đổi kể cả
+do worker khác hay lệnh CLI ghi.
+"""
+import os
+import threading
+import time
+from datetime import timedelta
+from app.database import db
+
+INDEX_POLL_SECONDS = float(os.getenv('INDEX_POLL_SECONDS', 5))
+
+# Đọc lùi lại một khoảng để không sót dòng có changed_at sớm hơn nhưng
+# commit muộn hơn lần đọc trước; nạp lại một sản phẩm hai lần là vô hại
+POLL_OVERLAP = timedelta(seconds=float(os.getenv('INDEX_POLL_OVERLAP_SECONDS', 2)))
+
+PRODUCT_SCOPE = "product:"
+
+
+class ChangeFeed:
+    def __init__(self, interval=None):
+        self.interval = INDEX_POLL_SECONDS if interval is None else interval
+        self._lock = threading.Lock()
+        self._since = None          # mốc changed_at (giờ của database) đã đọc tới
+        self._next_poll = 0.0
+
+    def start(self):
+        """Đặt mốc bằng giờ hiện tại của database (gọi trước khi dựng chỉ mục)"""
+        row = db.fetch_one("SELECT NOW(6) AS now")
+        with self._lock:
+            self._since = row['now']
+            self._next_poll = time.monotonic() + self.interval
+
+    def poll(self, force=False):
+        """Trả về list id sản phẩm đã đổi từ lần đọc trước (rỗng nếu chưa đến lượt)"""
+        with self._lock:
+            if self._since is None or (not force and time.monotonic() < self._next_poll):
+                return []
+            self._next_poll = time.monotonic() + self.interval
+            since = self._since
+        try:
+            rows = db.fetch_all(
+                "SELECT scope, changed_at FROM DataVersion WHERE changed_at > %s",
+                (since - POLL_OVERLAP,)
+            )
+        except Exception:
+            with self._lock:
+                self._next_poll = 0.0  # đọc lại ở lần truy vấn kế tiếp
+            raise
+        product_ids = []
+        for row in rows:
+            since = max(since, row['changed_at'])
+            if row['scope'].startswith(PRODUCT_SCOPE):
+                product_ids.append(int(row['scope'][len(PRODUCT_SCOPE):]))
+        with self._lock:
+            self._since = max(self._since, since)
+        return product_ids
@@ -0,0 +1,101 @@
+"""
+Đặt hàng: chuyển giỏ hàng của khách thành đơn hàng trong một transaction.
+
+Các bước trên cùng một kết nối, commit một lần:
+1. Đọc giỏ kèm giá và tồn kho, khóa các dòng variant (SELECT ... FOR UPDATE)
+2. Trừ tồn kho cho cả giỏ bằng một câu UPDATE JOIN
+3. Tạo Payment, Orders, toàn bộ OrderDetail (một INSERT nhiều dòng), Shipment
+4. Xóa giỏ hàng
+
+Lỗi ở bất kỳ bước nào làm rollback toàn bộ, không để lại đơn hàng dở dang
+hay tồn kho đã trừ. Khi InnoDB báo deadlock / hết thời gian chờ khóa, cả
+transaction được chạy lại (CHECKOUT_RETRIES lần).
+"""
+import os
+import pymysql
+from app.database import db
+from app.models.order import Order
+from app.models.order_detail import OrderDetail
+from app.models.payment import Payment
+from app.models.shipment import Shipment
+from app.models.cart import Cart
+from app.models.product_variant import InsufficientStockError, ProductVariant
+
+CHECKOUT_RETRIES = int(os.getenv('CHECKOUT_RETRIES', 2))
+
+# Mã lỗi MySQL có thể chạy lại: deadlock, hết thời gian chờ khóa
+RETRYABLE_ERRORS = (1213, 1205)
+
+CART_LINES_QUERY = """
+SELECT c.productvariant_id AS variant_id,
+       c.quantity,
+       pv.price,
+       pv.amount,
+       pv.product_id
+FROM Cart c
+JOIN ProductVariant pv ON c.productvariant_id = pv.id
+WHERE c.user_id = %s
+ORDER BY c.productvariant_id
+FOR UPDATE
+"""
+
+
+class EmptyCartError(ValueError):
+    """Giỏ hàng trống, không có gì để đặt"""
+
+
+def _place_order(customer_id, payment_method, carrier):
+    with db.transaction() as tx:
+        lines = tx.fetch_all(CART_LINES_QUERY, (customer_id,))
+        if not lines:
+            raise EmptyCartError("Cart is empty")
+        for line in lines:
+            if line['amount'] < line['quantity']:
+                raise InsufficientStockError(line['variant_id'], line['quantity'])
+        # Các dòng variant đã bị khóa ở trên nên câu UPDATE phải trừ đủ mọi dòng
+        if ProductVariant.reserve_cart(tx, customer_id) != len(lines):
+            raise InsufficientStockError(None, None)
+
+        total = sum(line['price'] * line['quantity'] for line in lines)
+        payment_id = Payment(payment_method=payment_method).save(tx)
+        order = Order(customer_id, total, payment_id=payment_id)
+        order_id = order.save(tx)
+        OrderDetail.save_many(tx, order_id, lines)
+        shipment_id = Shipment(order_id, carrier=carrier).save(tx)
+        Cart.clear_cart(customer_id, tx)
+        tx.on_commit(
+            ProductVariant.invalidate_products,
+            *dict.fromkeys(line['product_id'] for line in lines)
+        )
+
+    return {
+        "order_id": order_id,
+        "payment_id": payment_id,
+        "shipment_id": shipment_id,
+        "status": order.status,
+        "date": order.date,
+        "total": total,
+        "items": [
+            {"variant_id": line['variant_id'], "quantity": line['quantity'], "price": line['price']}
+            for line in lines
+        ],
+    }
+
+
+def checkout(customer_id, payment_method='COD', carrier='GHTK'):
+    """
+    Đặt hàng toàn bộ giỏ của khách.
+    Trả về {order_id, payment_id, shipment_id, status, date, total, items}
+
+    Raises EmptyCartError nếu giỏ trống, InsufficientStockError nếu có
+    variant không đủ hàng (không có gì bị ghi).
+    """
+    attempt = 0
+    while True:
+        try:
+            return _place_order(customer_id, payment_method, carrier)
+        except pymysql.err.OperationalError as e:
+            attempt += 1
+            if e.args[0] not in RETRYABLE_ERRORS or attempt > CHECKOUT_RETRIES:
+                raise
+            print(f"Đặt hàng bị deadlock, thử lại lần {attempt}: {e}")
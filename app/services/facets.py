@@ -0,0 +1,275 @@
+"""
+Chỉ mục facet (màu, nhóm size, khoảng giá, category) cho bộ lọc sản phẩm.
+
+Bitmap là số nguyên Python, bit thứ i bật ứng với sản phẩm id = i:
+- category (thuộc sản phẩm): một bitmap cho mỗi category.
+- color, size, price (thuộc variant): một bitmap cho mỗi tổ hợp
+  (màu, nhóm size, nhóm giá) có ở ít nhất một variant. Sản phẩm khớp bộ lọc
+  variant khi có một variant khớp cùng lúc mọi facet đã chọn (màu đỏ và size
+  10-20 phải là cùng một variant), nên OR các tổ hợp khớp rồi mới AND với
+  category. Số tổ hợp nhỏ hơn nhiều số variant.
+Lọc và đếm là phép AND/OR trên bitmap, đếm bằng int.bit_count(), nên một
+request trả về được cả trang sản phẩm khớp và số lượng cho mọi giá trị facet.
+
+Đếm theo kiểu disjunctive: số lượng của một facet được tính với bộ lọc của
+các facet khác, để người dùng thấy còn bao nhiêu kết quả nếu chọn thêm giá
+trị trong cùng facet.
+
+Chỉ mục được dựng lúc khởi động bằng db.stream; các hàm ghi của Product /
+ProductVariant đánh dấu sản phẩm thay đổi (mark_dirty) và lần truy vấn kế
+tiếp nạp lại chúng bằng một câu IN. Sản phẩm do worker khác hay lệnh CLI
+sửa được lấy từ bảng DataVersion (ChangeFeed) và nạp lại cùng cách.
+"""
+import os
+import threading
+import time
+from app.database import db
+from app.services.change_feed import ChangeFeed
+
+INDEX_QUERY = """
+SELECT p.id, p.category_id, v.color, v.size, v.price
+FROM Products p
+LEFT JOIN ProductVariant v ON v.product_id = p.id
+"""
+
+FACETS = ("category", "color", "size", "price")
+# Facet thuộc variant, theo thứ tự trong tổ hợp (color, size, price)
+VARIANT_FACETS = ("color", "size", "price")
+
+
+def _edges(name, default):
+    return [float(edge) for edge in os.getenv(name, default).split(",") if edge.strip()]
+
+
+# Ranh giới các nhóm, đổi được qua biến môi trường
+SIZE_EDGES = _edges('FACET_SIZE_EDGES', "10,20,30,50,100")
+PRICE_EDGES = _edges('FACET_PRICE_EDGES', "100000,200000,500000,1000000,2000000")
+
+
+def _format_edge(value):
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+def bucket_label(value, edges):
+    """Nhãn nhóm chứa value, dạng "lo-hi" (nhóm cuối là "lo+")"""
+    lower = 0
+    for edge in edges:
+        if value < edge:
+            return f"{_format_edge(lower)}-{_format_edge(edge)}"
+        lower = edge
+    return f"{_format_edge(lower)}+"
+
+
+def bucket_labels(edges):
+    """Tất cả nhãn nhóm theo thứ tự tăng dần"""
+    labels, lower = [], 0
+    for edge in edges:
+        labels.append(f"{_format_edge(lower)}-{_format_edge(edge)}")
+        lower = edge
+    labels.append(f"{_format_edge(lower)}+")
+    return labels
+
+
+def facet_values(row):
+    """
+    Các khóa chỉ mục của một dòng Products LEFT JOIN ProductVariant:
+    ("category", giá trị) và ("variant", (màu, nhóm size, nhóm giá)) nếu có variant
+    """
+    values = [("category", str(row["category_id"]))]
+    combo = (
+        row["color"].strip().lower() if row.get("color") else None,
+        bucket_label(row["size"], SIZE_EDGES) if row.get("size") is not None else None,
+        bucket_label(float(row["price"]), PRICE_EDGES) if row.get("price") is not None else None,
+    )
+    if combo != (None, None, None):
+        values.append(("variant", combo))
+    return values
+
+
+def iter_bits(bitmap, skip=0, limit=None):
+    """Sinh ra vị trí các bit bật theo thứ tự tăng dần (bỏ qua `skip` bit đầu)"""
+    index = 0
+    while bitmap:
+        lowest = bitmap & -bitmap
+        if index >= skip:
+            if limit is not None and index >= skip + limit:
+                return
+            yield lowest.bit_length() - 1
+        index += 1
+        bitmap ^= lowest
+
+
+class FacetIndex:
+    """Bitmap trên id sản phẩm theo category và theo tổ hợp facet của variant"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # "category" -> {giá trị: bitmap}, "variant" -> {(màu, size, giá): bitmap}
+        self._bitmaps = {"category": {}, "variant": {}}
+        self._products = {}    # product_id -> tập khóa (facet_values)
+        self._all = 0          # bitmap mọi sản phẩm
+        self._dirty = set()
+        self._changes = ChangeFeed()
+        self.ready = False
+        self.build_seconds = None
+
+    # --- Dựng / cập nhật chỉ mục ---
+
+    def _add(self, product_id, values):
+        bit = 1 << product_id
+        self._all |= bit
+        keys = self._products.setdefault(product_id, set())
+        for facet, value in values:
+            bitmaps = self._bitmaps[facet]
+            bitmaps[value] = bitmaps.get(value, 0) | bit
+            keys.add((facet, value))
+
+    def _remove(self, product_id):
+        keys = self._products.pop(product_id, None)
+        if keys is None:
+            return
+        mask = ~(1 << product_id)
+        self._all &= mask
+        for facet, value in keys:
+            bitmaps = self._bitmaps[facet]
+            bitmaps[value] &= mask
+            if not bitmaps[value]:
+                del bitmaps[value]
+
+    def _load_rows(self, rows):
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(row["id"], set()).update(facet_values(row))
+        return grouped
+
+    def build(self, chunk_size=5000):
+        """Dựng lại toàn bộ chỉ mục từ Products và ProductVariant"""
+        started = time.perf_counter()
+        # Lần ghi xảy ra trong lúc dựng sẽ được ChangeFeed trả về sau đó
+        self._changes.start()
+        fresh = FacetIndex()
+        for rows in db.stream(INDEX_QUERY, chunk_size=chunk_size):
+            # Một sản phẩm có thể nằm vắt qua hai chunk, _add gộp vào tập cũ
+            for product_id, values in fresh._load_rows(rows).items():
+                fresh._add(product_id, values)
+        with self._lock:
+            self._bitmaps = fresh._bitmaps
+            self._products = fresh._products
+            self._all = fresh._all
+            self.ready = True
+            self.build_seconds = round(time.perf_counter() - started, 3)
+        print(f"Đã dựng chỉ mục facet: {len(self._products)} sản phẩm, {self.build_seconds}s")
+        return len(self._products)
+
+    def mark_dirty(self, *product_ids):
+        """Đánh dấu sản phẩm cần nạp lại (gọi sau khi ghi database)"""
+        with self._lock:
+            self._dirty.update(product_ids)
+
+    def refresh(self):
+        """
+        Nạp lại bằng một câu truy vấn các sản phẩm đã đánh dấu và các sản phẩm
+        process khác đã sửa (ChangeFeed)
+        """
+        if self.ready:
+            self.mark_dirty(*self._changes.poll())
+        with self._lock:
+            if not self._dirty or not self.ready:
+                return 0
+            product_ids = list(self._dirty)
+            self._dirty.clear()
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        try:
+            rows = db.fetch_all(f"{INDEX_QUERY} WHERE p.id IN ({placeholders})", tuple(product_ids))
+        except Exception:
+            self.mark_dirty(*product_ids)
+            raise
+        grouped = self._load_rows(rows)
+        with self._lock:
+            for product_id in product_ids:
+                self._remove(product_id)
+                if product_id in grouped:
+                    self._add(product_id, grouped[product_id])
+        return len(product_ids)
+
+    # --- Truy vấn ---
+
+    def _variant_match(self, filters, skip_facet=None):
+        """
+        OR các tổ hợp variant khớp mọi bộ lọc variant (trừ skip_facet).
+        Trả về dict {giá trị của skip_facet: bitmap} nếu có skip_facet, ngược
+        lại là một bitmap
+        """
+        position = VARIANT_FACETS.index(skip_facet) if skip_facet else None
+        grouped = {}
+        combined = 0
+        for combo, bitmap in self._bitmaps["variant"].items():
+            if any(combo[i] not in filters[facet]
+                   for i, facet in enumerate(VARIANT_FACETS) if facet in filters and i != position):
+                continue
+            if position is None:
+                combined |= bitmap
+            elif combo[position] is not None:
+                grouped[combo[position]] = grouped.get(combo[position], 0) | bitmap
+        return combined if position is None else grouped
+
+    def query(self, selected, skip=0, limit=10):
+        """
+        selected: dict {facet: list giá trị đã chọn} (facet không chọn thì bỏ qua).
+        Trả về (list product_id của trang theo id tăng dần, tổng số khớp,
+        {facet: {giá trị: số sản phẩm}})
+        """
+        self.refresh()
+        selected = {
+            facet: {str(value).strip().lower() if facet == "color" else str(value) for value in values}
+            for facet, values in selected.items() if values
+        }
+        for facet in selected:
+            if facet not in FACETS:
+                raise ValueError(f"Unknown facet: {facet}")
+        variant_filters = {facet: values for facet, values in selected.items() if facet != "category"}
+        with self._lock:
+            categories = self._bitmaps["category"]
+            category_filter = self._all
+            if "category" in selected:
+                category_filter = 0
+                for value in selected["category"]:
+                    category_filter |= categories.get(value, 0)
+            variant_filter = self._variant_match(variant_filters) if variant_filters else self._all
+            matched = category_filter & variant_filter
+
+            # Đếm kiểu disjunctive: mỗi facet dùng bộ lọc của các facet khác
+            counts = {"category": {
+                value: (bitmap & variant_filter).bit_count() for value, bitmap in categories.items()
+            }}
+            for facet in VARIANT_FACETS:
+                counts[facet] = {
+                    value: (bitmap & category_filter).bit_count()
+                    for value, bitmap in self._variant_match(variant_filters, facet).items()
+                }
+            colors = {combo[0] for combo in self._bitmaps["variant"] if combo[0] is not None}
+        for facet, edges in (("size", SIZE_EDGES), ("price", PRICE_EDGES)):
+            counts[facet] = {label: counts[facet].get(label, 0) for label in bucket_labels(edges)}
+        counts["color"] = {color: counts["color"].get(color, 0) for color in colors}
+        counts["color"] = dict(sorted(counts["color"].items(), key=lambda item: (-item[1], item[0])))
+        product_ids = list(iter_bits(matched, skip, limit))
+        return product_ids, matched.bit_count(), counts
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "products": len(self._products),
+                "values": {
+                    "category": len(self._bitmaps["category"]),
+                    **{facet: len({combo[i] for combo in self._bitmaps["variant"] if combo[i] is not None})
+                       for i, facet in enumerate(VARIANT_FACETS)},
+                },
+                "dirty": len(self._dirty),
+                "build_seconds": self.build_seconds,
+            }
+
+
+# Chỉ mục facet dùng chung trong process
+# Usage: from app.services.facets import facet_index
+facet_index = FacetIndex()
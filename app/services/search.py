@@ -0,0 +1,311 @@
+"""
+Tìm kiếm full-text sản phẩm bằng chỉ mục đảo ngược trong bộ nhớ.
+
+- Văn bản được bỏ dấu tiếng Việt (kể cả đ -> d) và chuyển chữ thường trước
+  khi tách từ, nên "gốm bát tràng" và "gom bat trang" cho cùng kết quả.
+- Xếp hạng bằng BM25; từ trong tên sản phẩm được nhân trọng số.
+- Chỉ mục được dựng một lần lúc khởi động bằng server-side cursor (db.stream).
+  Các hàm ghi của Product đánh dấu id thay đổi (mark_dirty); lần tìm kiếm kế
+  tiếp nạp lại các sản phẩm đó bằng một câu IN trước khi tra chỉ mục.
+- Chỉ mục nằm trong process: mỗi worker dựng một bản riêng. Sản phẩm do
+  worker khác hay lệnh CLI sửa được lấy từ bảng DataVersion (ChangeFeed, tối
+  đa mỗi INDEX_POLL_SECONDS giây) rồi nạp lại cùng cách.
+"""
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+from app.database import db
+from app.services.change_feed import ChangeFeed
+
+INDEX_QUERY = """
+SELECT p.id, p.name, p.description, p.artisan_description, p.category_id, p.status
+FROM Products p
+"""
+
+# Trọng số tần suất từ theo trường
+FIELD_WEIGHTS = {"name": 3, "description": 1, "artisan_description": 1}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def fold(text: str) -> str:
+    """Bỏ dấu tiếng Việt và chuyển chữ thường"""
+    text = text.lower().replace("đ", "d")
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text) -> list:
+    if not text:
+        return []
+    return _TOKEN_RE.findall(fold(text))
+
+
+class SearchIndex:
+    """
+    Chỉ mục đảo ngược: term -> {product_id: điểm BM25 của term trong sản phẩm
+    (chưa nhân idf)}. Điểm được tính sẵn khi thêm sản phẩm theo độ dài trung
+    bình lúc đó; build() tính lại toàn bộ.
+
+    Truy vấn dùng thuật toán ngưỡng (Fagin TA) trên danh sách posting sắp
+    theo điểm giảm dần: dừng khi k kết quả tốt nhất đã chắc chắn, không cần
+    cộng điểm cho mọi sản phẩm khớp.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}
+        self._sorted = {}      # term -> [(-điểm, product_id)] tăng dần, dựng lại khi term đổi
+        self._terms = {}       # product_id -> {term: tần suất có trọng số}
+        self._lengths = {}     # product_id -> độ dài tài liệu có trọng số
+        self._meta = {}        # product_id -> (category_id, status)
+        self._by_category = {}
+        self._by_status = {}
+        self._total_length = 0
+        self._dirty = set()
+        self._changes = ChangeFeed()
+        self._totals = {}      # (terms, category_id, status) -> tổng số kết quả
+        self.ready = False
+        self.build_seconds = None
+
+    # --- Dựng / cập nhật chỉ mục ---
+
+    def _impact(self, frequency, length, average_length):
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * length / (average_length or 1))
+        return frequency * (BM25_K1 + 1) / (frequency + norm)
+
+    def _add(self, row, weigh=True):
+        frequencies = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(row.get(field)):
+                frequencies[term] = frequencies.get(term, 0) + weight
+        product_id = row["id"]
+        length = sum(frequencies.values())
+        self._terms[product_id] = frequencies
+        self._lengths[product_id] = length
+        self._total_length += length
+        category_id, status = row.get("category_id"), (row.get("status") or "").lower()
+        self._meta[product_id] = (category_id, status)
+        self._by_category.setdefault(category_id, set()).add(product_id)
+        self._by_status.setdefault(status, set()).add(product_id)
+        self._totals.clear()
+        if weigh:
+            average_length = self._total_length / len(self._lengths)
+            for term, frequency in frequencies.items():
+                self._postings.setdefault(term, {})[product_id] = \
+                    self._impact(frequency, length, average_length)
+                self._sorted.pop(term, None)
+
+    def _remove(self, product_id):
+        frequencies = self._terms.pop(product_id, None)
+        if frequencies is None:
+            return
+        for term in frequencies:
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(product_id, None)
+                if not posting:
+                    del self._postings[term]
+            self._sorted.pop(term, None)
+        self._total_length -= self._lengths.pop(product_id, 0)
+        category_id, status = self._meta.pop(product_id)
+        self._by_category[category_id].discard(product_id)
+        self._by_status[status].discard(product_id)
+        self._totals.clear()
+
+    def _weigh_all(self):
+        """Tính điểm cho mọi posting theo độ dài trung bình hiện tại"""
+        average_length = self._total_length / len(self._lengths) if self._lengths else 1
+        postings = {}
+        for product_id, frequencies in self._terms.items():
+            length = self._lengths[product_id]
+            for term, frequency in frequencies.items():
+                postings.setdefault(term, {})[product_id] = \
+                    self._impact(frequency, length, average_length)
+        self._postings = postings
+        self._sorted = {}
+
+    def upsert(self, row):
+        """Thêm hoặc thay thế một sản phẩm (dict có id, name, description...)"""
+        with self._lock:
+            self._remove(row["id"])
+            self._add(row)
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove(product_id)
+
+    def build(self, chunk_size=5000):
+        """Dựng lại toàn bộ chỉ mục từ bảng Products"""
+        started = time.perf_counter()
+        # Lần ghi xảy ra trong lúc dựng sẽ được ChangeFeed trả về sau đó
+        self._changes.start()
+        fresh = SearchIndex()
+        for rows in db.stream(INDEX_QUERY, chunk_size=chunk_size):
+            for row in rows:
+                fresh._add(row, weigh=False)
+        fresh._weigh_all()
+        with self._lock:
+            for name in ("_postings", "_sorted", "_terms", "_lengths", "_meta",
+                         "_by_category", "_by_status", "_total_length"):
+                setattr(self, name, getattr(fresh, name))
+            self._totals = {}
+            self.ready = True
+            self.build_seconds = round(time.perf_counter() - started, 3)
+        print(f"Đã dựng chỉ mục tìm kiếm: {len(self._lengths)} sản phẩm, {self.build_seconds}s")
+        return len(self._lengths)
+
+    def mark_dirty(self, *product_ids):
+        """Đánh dấu sản phẩm cần nạp lại (gọi sau khi ghi database)"""
+        with self._lock:
+            self._dirty.update(product_ids)
+
+    def refresh(self):
+        """
+        Nạp lại bằng một câu truy vấn các sản phẩm đã đánh dấu và các sản phẩm
+        process khác đã sửa (ChangeFeed)
+        """
+        if self.ready:
+            self.mark_dirty(*self._changes.poll())
+        with self._lock:
+            if not self._dirty or not self.ready:
+                return 0
+            product_ids = list(self._dirty)
+            self._dirty.clear()
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        try:
+            rows = db.fetch_all(f"{INDEX_QUERY} WHERE p.id IN ({placeholders})", tuple(product_ids))
+        except Exception:
+            self.mark_dirty(*product_ids)
+            raise
+        with self._lock:
+            found = set()
+            for row in rows:
+                found.add(row["id"])
+                self._remove(row["id"])
+                self._add(row)
+            for product_id in product_ids:
+                if product_id not in found:
+                    self._remove(product_id)
+        return len(product_ids)
+
+    # --- Truy vấn ---
+
+    def _sorted_posting(self, term):
+        entries = self._sorted.get(term)
+        if entries is None:
+            entries = sorted((-impact, product_id) for product_id, impact in self._postings[term].items())
+            self._sorted[term] = entries
+        return entries
+
+    def _count(self, terms, postings, allowed, category_id, status):
+        """
+        Số sản phẩm khớp ít nhất một term (và bộ lọc). Hợp / giao các posting
+        bằng phép tập hợp của dict/set (chạy trong C), không lặp từng id bằng
+        Python. Kết quả được nhớ đến khi chỉ mục đổi, các trang sau của cùng
+        truy vấn không phải đếm lại.
+        """
+        key = (tuple(terms), category_id, status)
+        total = self._totals.get(key)
+        if total is not None:
+            return total
+        if allowed is not None and len(allowed) * 4 < min(map(len, postings)):
+            # Bộ lọc nhỏ hơn nhiều: chỉ kiểm tra các id của bộ lọc
+            total = sum(1 for product_id in allowed if any(product_id in posting for posting in postings))
+        else:
+            matched = postings[0].keys() if len(postings) == 1 else set().union(*postings)
+            total = len(matched) if allowed is None else len(allowed & matched)
+        if len(self._totals) >= 1024:
+            self._totals.clear()
+        self._totals[key] = total
+        return total
+
+    def search(self, query, category_id=None, status=None, skip=0, limit=10):
+        """
+        Tìm sản phẩm khớp ít nhất một từ trong query, xếp hạng BM25.
+        Trả về (list (product_id, score) của trang, tổng số kết quả)
+        """
+        self.refresh()
+        status = status.lower() if status else None
+        with self._lock:
+            count = len(self._lengths)
+            terms = [term for term in dict.fromkeys(tokenize(query)) if term in self._postings]
+            if not count or not terms:
+                return [], 0
+            postings = [self._postings[term] for term in terms]
+            idfs = [
+                math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+                for posting in postings
+            ]
+            lists = [self._sorted_posting(term) for term in terms]
+
+            allowed = None
+            if category_id is not None:
+                allowed = self._by_category.get(category_id, set())
+            if status is not None:
+                by_status = self._by_status.get(status, set())
+                allowed = by_status if allowed is None else allowed & by_status
+            total = self._count(terms, postings, allowed, category_id, status)
+            wanted = skip + limit
+            if not total or skip >= total:
+                return [], total
+
+            if allowed is not None and len(allowed) * 4 < sum(map(len, postings)):
+                # Bộ lọc nhỏ hơn nhiều các posting: chấm điểm thẳng các sản phẩm
+                # của bộ lọc, thuật toán ngưỡng sẽ phải bỏ qua phần lớn posting
+                top = heapq.nlargest(wanted, (
+                    (sum(idf * posting.get(product_id, 0.0) for idf, posting in zip(idfs, postings)), -product_id)
+                    for product_id in allowed if any(product_id in posting for posting in postings)
+                ))
+                ranked = top[skip:]
+                return [(-negative_id, round(score, 4)) for score, negative_id in ranked], total
+
+            # Thuật toán ngưỡng: duyệt song song các posting theo điểm giảm dần
+            top = []   # min-heap (score, -product_id) giữ `wanted` kết quả tốt nhất
+            seen = set()
+            depth = 0
+            while True:
+                threshold = 0.0
+                active = False
+                for idf, entries in zip(idfs, lists):
+                    if depth >= len(entries):
+                        continue
+                    active = True
+                    negative_impact, product_id = entries[depth]
+                    threshold -= idf * negative_impact
+                    if product_id in seen:
+                        continue
+                    seen.add(product_id)
+                    if allowed is not None and product_id not in allowed:
+                        continue
+                    score = sum(idf_ * posting.get(product_id, 0.0) for idf_, posting in zip(idfs, postings))
+                    if len(top) < wanted:
+                        heapq.heappush(top, (score, -product_id))
+                    elif (score, -product_id) > top[0]:
+                        heapq.heapreplace(top, (score, -product_id))
+                if not active or (len(top) >= wanted and top[0][0] >= threshold):
+                    break
+                depth += 1
+        ranked = sorted(top, reverse=True)[skip:]
+        return [(-negative_id, round(score, 4)) for score, negative_id in ranked], total
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "products": len(self._lengths),
+                "terms": len(self._postings),
+                "dirty": len(self._dirty),
+                "build_seconds": self.build_seconds,
+            }
+
+
+# Chỉ mục dùng chung trong process
+# Usage: from app.services.search import search_index
+search_index = SearchIndex()
@@ -0,0 +1,41 @@
+"""
+Tiện ích cho test: giới hạn số câu SQL của một endpoint.
+
+Usage (với fastapi.testclient.TestClient và database thật):
+
+    from app.testing import query_budget
+
+    def test_list_products_has_no_n_plus_one(client):
+        with query_budget(3):
+            client.get("/products/?include_variants=true&limit=50")
+
+Khối with fail (QueryBudgetExceeded) khi số câu lệnh vượt max_queries, hoặc
+khi cùng một câu (đã chuẩn hóa) chạy nhiều hơn max_repeats lần - dấu hiệu
+truy vấn trong vòng lặp. Thông báo lỗi liệt kê các câu đã chạy.
+"""
+from contextlib import contextmanager
+from app.query_stats import track_queries
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Endpoint chạy nhiều câu SQL hơn ngân sách đã khai báo"""
+
+
+@contextmanager
+def query_budget(max_queries, max_repeats=None):
+    """
+    max_queries: số câu lệnh tối đa trong khối with.
+    max_repeats: số lần tối đa một câu được lặp lại (mặc định: không kiểm tra).
+    """
+    with track_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        raise QueryBudgetExceeded(
+            f"Query budget exceeded: {stats.count} > {max_queries}\n{stats.summary()}"
+        )
+    if max_repeats is not None:
+        repeated = stats.repeated(max_repeats + 1)
+        if repeated:
+            raise QueryBudgetExceeded(
+                f"Statement repeated more than {max_repeats} times (N+1?)\n{stats.summary()}"
+            )
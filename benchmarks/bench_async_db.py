@@ -0,0 +1,119 @@
+"""
+Benchmark: thông lượng khi nhiều request đồng thời gọi database.
+
+So sánh hai cách gọi model trong route async:
+- inline: gọi thẳng hàm pymysql blocking trong event loop (cách cũ)
+- executor: đi qua db.run (executor có giới hạn + timeout)
+
+Driver MySQL được thay bằng kết nối giả, mỗi câu truy vấn ngủ
+--query-ms mili giây, nên benchmark chạy được mà không cần MySQL và chỉ
+đo ảnh hưởng của việc chặn event loop.
+
+Chạy: python -m benchmarks.bench_async_db --requests 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+from unittest import mock
+
+import httpx
+
+from app.database import db
+import app.database as database_module
+from main import app
+
+PRODUCT_ROW = {
+    "id": 1, "name": "Bình gốm Bát Tràng", "description": "Gốm men lam",
+    "product_category_id": 1, "category_id": 1, "status": "In stock",
+    "artisan_description": "Nghệ nhân làng gốm", "category_name": "Gốm",
+    "category": '{"id": 1, "name": "Gốm"}',
+}
+VARIANT_ROWS = [
+    {"id": i, "product_id": 1, "color": "blue", "size": 20 + i, "price": 150000.0, "amount": 10}
+    for i in range(1, 4)
+]
+
+
+class FakeCursor:
+    def __init__(self, delay):
+        self.delay = delay
+        self.query = ""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=()):
+        time.sleep(self.delay)
+        self.query = query
+
+    def fetchone(self):
+        return dict(PRODUCT_ROW)
+
+    def fetchall(self):
+        return [dict(v) for v in VARIANT_ROWS]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def cursor(self, *args):
+        return FakeCursor(self.delay)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+async def inline_run(func, *args, timeout=None, **kwargs):
+    """Hành vi cũ: gọi thẳng hàm blocking trong event loop"""
+    return func(*args, **kwargs)
+
+
+async def drive(total, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                response = await client.get("/products/1")
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--query-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    delay = args.query_ms / 1000
+    with mock.patch.object(database_module.pymysql, "connect", lambda **kwargs: FakeConnection(delay)):
+        for mode in ("inline", "executor"):
+            patch = mock.patch.object(db, "run", inline_run) if mode == "inline" else mock.patch.object(db, "run", db.run)
+            with patch:
+                elapsed = asyncio.run(drive(args.requests, args.concurrency))
+            print(f"{mode:>8}: {args.requests} requests in {elapsed:.3f}s "
+                  f"-> {args.requests / elapsed:.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Benchmark tải: độ trễ đặt hàng (POST /orders/checkout) khi nhiều khách
+đặt cùng lúc.
+
+So sánh hai cách:
+- per-model: mỗi bước dùng kết nối riêng và commit riêng như các model cũ
+  (đọc giỏ, đọc + trừ tồn từng variant, Payment, Orders, từng OrderDetail,
+  Shipment, xóa giỏ)
+- transaction: app.services.checkout, một transaction trên một kết nối
+
+Driver MySQL được thay bằng kết nối giả, mỗi câu lệnh (kể cả BEGIN/COMMIT)
+ngủ khoảng --query-ms mili giây, nên kết quả phản ánh số round trip và
+thời gian giữ kết nối của pool. In p50/p95/p99 và thông lượng.
+
+Chạy: python -m benchmarks.bench_checkout --requests 500 --concurrency 100 --lines 5
+"""
+import argparse
+import asyncio
+import random
+import time
+from unittest import mock
+
+import httpx
+
+import app.database as database_module
+import app.security as security
+from app.database import db
+import app.services.checkout as checkout_module
+from main import app
+
+
+def cart_lines(count):
+    return [
+        {"variant_id": i, "quantity": 1, "price": 150000.0, "amount": 10 ** 9, "product_id": i}
+        for i in range(1, count + 1)
+    ]
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+        self.lastrowid = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=()):
+        self.connection.roundtrip()
+        self.lastrowid = 1
+        self.rows = [dict(line) for line in self.connection.lines] if "FROM Cart" in query else []
+        if "JOIN Cart c" in query:
+            return len(self.connection.lines)
+        return 1
+
+    def executemany(self, query, seq_of_params):
+        # pymysql gộp INSERT nhiều dòng thành một câu lệnh
+        self.connection.roundtrip()
+        return len(list(seq_of_params))
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else {"id": 1, "product_id": 1, "amount": 10 ** 9, "price": 150000.0}
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, delay, lines):
+        self.delay = delay
+        self.lines = lines
+
+    def roundtrip(self):
+        time.sleep(random.uniform(0.5, 1.5) * self.delay)
+
+    def cursor(self, *args):
+        return FakeCursor(self)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def begin(self):
+        self.roundtrip()
+
+    def commit(self):
+        self.roundtrip()
+
+    def rollback(self):
+        self.roundtrip()
+
+    def close(self):
+        pass
+
+
+def per_model_checkout(customer_id, payment_method='COD', carrier='GHTK'):
+    """Đặt hàng bằng các lời gọi độc lập, mỗi lời gọi một kết nối và một commit"""
+    lines = db.fetch_all(checkout_module.CART_LINES_QUERY.replace("FOR UPDATE", ""), (customer_id,))
+    for line in lines:
+        variant = db.fetch_one("SELECT * FROM ProductVariant WHERE id = %s", (line["variant_id"],))
+        if variant["amount"] < line["quantity"]:
+            raise ValueError("Insufficient stock")
+        db.execute_query("UPDATE ProductVariant SET amount = amount - %s WHERE id = %s",
+                         (line["quantity"], line["variant_id"]))
+    total = sum(line["price"] * line["quantity"] for line in lines)
+    payment_id = db.insert("INSERT INTO Payment (payment_method, status) VALUES (%s, 'Pending')", (payment_method,))
+    order_id = db.insert("INSERT INTO Orders (customer_id, payment_id, total_amount) VALUES (%s, %s, %s)",
+                         (customer_id, payment_id, total))
+    for line in lines:
+        db.execute_query("INSERT INTO OrderDetail (order_id, variant_id, quantity, price) VALUES (%s, %s, %s, %s)",
+                         (order_id, line["variant_id"], line["quantity"], line["price"]))
+    shipment_id = db.insert("INSERT INTO Shipment (order_id, carrier) VALUES (%s, %s)", (order_id, carrier))
+    db.execute_query("DELETE FROM Cart WHERE user_id = %s", (customer_id,))
+    return {
+        "order_id": order_id, "payment_id": payment_id, "shipment_id": shipment_id,
+        "status": "pending", "date": "2026-01-01T00:00:00", "total": total,
+        "items": [{"variant_id": l["variant_id"], "quantity": l["quantity"], "price": l["price"]} for l in lines],
+    }
+
+
+def percentile(sorted_values, fraction):
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def drive(total, concurrency, headers):
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/orders/checkout", headers=headers)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return sorted(latencies), time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--lines", type=int, default=5, help="Cart lines per checkout")
+    parser.add_argument("--query-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    security.SECRET_KEY = security.SECRET_KEY or "bench-secret"
+    token = security.create_access_token({"sub": "1", "role": "customer", "name": "bench"})
+    headers = {"Authorization": f"Bearer {token}"}
+    lines = cart_lines(args.lines)
+    connect = lambda **kwargs: FakeConnection(args.query_ms / 1000, lines)
+
+    for mode in ("per-model", "transaction"):
+        patch = mock.patch.object(checkout_module, "_place_order",
+                                  per_model_checkout if mode == "per-model" else checkout_module._place_order)
+        with mock.patch.object(database_module.pymysql, "connect", connect), patch:
+            latencies, elapsed = asyncio.run(drive(args.requests, args.concurrency, headers))
+            db.disconnect()
+        p50, p95, p99 = (percentile(latencies, f) * 1000 for f in (0.50, 0.95, 0.99))
+        print(f"{mode:>12}: p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms, "
+              f"{args.requests / elapsed:.1f} checkouts/s")
+
+
+if __name__ == "__main__":
+    main()
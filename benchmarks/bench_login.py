@@ -0,0 +1,137 @@
+"""
+Benchmark: thông lượng đăng nhập ở nhiều mức đồng thời.
+
+So sánh:
+- inline: bcrypt chạy thẳng trong event loop (cách cũ)
+- pool: bcrypt chạy trong pool process (verify_password_async)
+
+Mỗi mức đồng thời cũng đo độ trễ của event loop (loop lag) trong lúc đăng
+nhập, tức là thời gian mọi request khác bị đứng. Database được thay bằng kết
+nối giả trả về một customer có mật khẩu đã băm bằng bcrypt.
+
+Chạy: python -m benchmarks.bench_login --requests 64 --levels 1,4,16,64
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from unittest import mock
+
+import httpx
+
+import app.database as database_module
+import app.routes.login as login_routes
+import app.security as security
+from app.security import hash_password, password_hasher, verify_password
+from main import app
+
+PASSWORD = "mat-khau-bench"
+
+
+class FakeCursor:
+    def __init__(self, user):
+        self.user = user
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=()):
+        pass
+
+    def fetchone(self):
+        return dict(self.user)
+
+    def fetchall(self):
+        return [dict(self.user)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, user):
+        self.user = user
+
+    def cursor(self, *args):
+        return FakeCursor(self.user)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+async def inline_verify(plain_password, hashed_password):
+    """Hành vi cũ: bcrypt chặn event loop"""
+    return verify_password(plain_password, hashed_password)
+
+
+async def run_level(total, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    probe_latencies = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def login():
+            async with semaphore:
+                response = await client.post(
+                    "/login/", json={"username": "bench", "password": PASSWORD, "role": "customer"}
+                )
+                response.raise_for_status()
+
+        async def probe(stop):
+            # Đo độ trễ event loop: thời gian thức dậy muộn so với lịch hẹn
+            while not stop.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(0.01)
+                probe_latencies.append(time.perf_counter() - started - 0.01)
+
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe_task
+    return elapsed, probe_latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--levels", default="1,4,16,64")
+    args = parser.parse_args()
+
+    # Benchmark không cần .env thật
+    security.SECRET_KEY = security.SECRET_KEY or "bench-secret"
+    user = {"id": 1, "name": "Bench", "password": hash_password(PASSWORD)}
+    levels = [int(level) for level in args.levels.split(",")]
+    password_hasher.queue_size = max(password_hasher.queue_size, max(levels))
+    password_hasher.start()
+
+    with mock.patch.object(database_module.pymysql, "connect", lambda **kwargs: FakeConnection(user)):
+        for mode in ("inline", "pool"):
+            patch = (mock.patch.object(login_routes, "verify_password_async", inline_verify)
+                     if mode == "inline" else mock.patch.object(login_routes, "verify_password_async",
+                                                                login_routes.verify_password_async))
+            with patch:
+                for level in levels:
+                    elapsed, probes = asyncio.run(run_level(args.requests, level))
+                    probe_ms = max(probes) * 1000 if probes else float("nan")
+                    median_ms = statistics.median(probes) * 1000 if probes else float("nan")
+                    print(f"{mode:>6} c={level:<3} {args.requests / elapsed:7.1f} logins/s  "
+                          f"loop lag median {median_ms:6.1f}ms max {probe_ms:7.1f}ms")
+    password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
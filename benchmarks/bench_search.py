@@ -0,0 +1,81 @@
+"""
+Micro-benchmark: SearchIndex.search trên chỉ mục trong bộ nhớ, dữ liệu sinh
+bằng benchmarks.seed.generate (không cần MySQL).
+
+Mỗi truy vấn chạy lần đầu (tổng số kết quả chưa được nhớ, như request đầu
+tiên sau khi chỉ mục đổi) và các lần sau (trang kế tiếp của cùng truy vấn).
+Bản đo qua HTTP và MySQL thật: kịch bản product_search của benchmarks.suite.
+
+Chạy: python -m benchmarks.bench_search --products 100000 --rounds 50
+"""
+import argparse
+import random
+import time
+
+from app.services.search import SearchIndex
+from benchmarks.seed import ITEMS, MATERIALS, SCALE, generate
+
+# (q, category_id, status): từ có trong mọi sản phẩm, từ phổ biến, nhiều từ, có bộ lọc
+QUERIES = [
+    ("thu cong", None, None),
+    ("gom", None, None),
+    ("binh gom", None, None),
+    ("gio may tre", 3, None),
+    ("den long son mai", None, "in stock"),
+]
+
+
+def build_index(products, seed):
+    scale = dict(SCALE, products=products, variants_per_product=0, customers=0, orders=0, reviews=0)
+    index = SearchIndex()
+    started = time.perf_counter()
+    for product_id, name, description, category_id, status, artisan in generate(scale, seed)["products"]:
+        index._add({
+            "id": product_id, "name": name, "description": description,
+            "artisan_description": artisan, "category_id": category_id, "status": status,
+        }, weigh=False)
+    index._weigh_all()
+    index.ready = True
+    return index, time.perf_counter() - started
+
+
+def timed(func, rounds):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2], samples[min(int(len(samples) * 0.95), len(samples) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    index, seconds = build_index(args.products, args.seed)
+    print(f"index: {args.products} products, {len(index._postings)} terms, built in {seconds:.1f}s")
+    rng = random.Random(args.seed)
+    queries = QUERIES + [(f"{rng.choice(ITEMS)} {rng.choice(MATERIALS)}", None, None) for _ in range(3)]
+    for q, category_id, status in queries:
+        _, total = index.search(q, category_id, status)
+
+        def first_page():
+            index._totals.clear()
+            index.search(q, category_id, status, skip=0, limit=20)
+
+        def next_page():
+            index.search(q, category_id, status, skip=20, limit=20)
+
+        cold = timed(first_page, args.rounds)
+        warm = timed(next_page, args.rounds)
+        label = f"{q!r} category={category_id} status={status}"
+        print(f"{label:>48} total {total:>6}: first p50 {cold[0]:6.2f} ms p95 {cold[1]:6.2f} ms, "
+              f"next p50 {warm[0]:6.2f} ms p95 {warm[1]:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
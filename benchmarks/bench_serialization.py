@@ -0,0 +1,71 @@
+"""
+Micro-benchmark: serialize một trang 100 sản phẩm (kèm variants) và một
+trang 100 review.
+
+- default: validate qua response_model rồi encode json (như FastAPI làm)
+- fast: projector biên dịch sẵn + FastJSONResponse (orjson nếu đã cài)
+
+Chạy: python -m benchmarks.bench_serialization --rounds 200
+"""
+import argparse
+import json
+import timeit
+from decimal import Decimal
+
+from app.schemas import PaginatedProductList, PaginatedReviewList
+from app.serialization import FastJSONResponse, compile_projector, orjson
+
+
+def product_page(size=100):
+    items = []
+    for i in range(1, size + 1):
+        items.append({
+            "id": i, "name": f"Bình gốm Bát Tràng {i}", "description": "Gốm men lam vẽ tay " * 5,
+            "category_id": 1, "status": "In stock", "artisan_description": "Nghệ nhân làng gốm " * 5,
+            "category_name": "Gốm sứ", "rating_count": 12, "average_rating": Decimal("4.2500"),
+            "variants": [
+                {"id": i * 10 + v, "product_id": i, "color": "xanh", "size": 20 + v,
+                 "price": Decimal("150000.00"), "amount": 10}
+                for v in range(3)
+            ],
+        })
+    return {"items": items, "total": 10000, "skip": 0, "limit": size, "next_cursor": "WzEwMF0"}
+
+
+def review_page(size=100):
+    items = [
+        {"id": i, "customer_id": i, "variant_id": 1, "rating": 5, "content": "Sản phẩm rất đẹp " * 4,
+         "date": "2025-01-01T10:00:00", "customer_name": "Nguyễn Văn A"}
+        for i in range(1, size + 1)
+    ]
+    return {"items": items, "total": 10000, "skip": 0, "limit": size, "next_cursor": None}
+
+
+def default_path(model, content):
+    validated = model.model_validate(content)
+    return json.dumps(validated.model_dump(mode="json"), ensure_ascii=False).encode("utf-8")
+
+
+def fast_path(model, content):
+    return FastJSONResponse(compile_projector(model)(content)).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"json backend for fast path: {'orjson' if orjson else 'json'}")
+    for label, model, content in (
+        ("products", PaginatedProductList, product_page()),
+        ("reviews", PaginatedReviewList, review_page()),
+    ):
+        # Hai đường phải cho ra cùng dữ liệu
+        assert json.loads(default_path(model, content)) == json.loads(fast_path(model, content))
+        for name, func in (("default", default_path), ("fast", fast_path)):
+            seconds = timeit.timeit(lambda: func(model, content), number=args.rounds)
+            print(f"{label:>8} {name:>7}: {seconds / args.rounds * 1000:7.3f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
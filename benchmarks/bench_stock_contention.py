@@ -0,0 +1,185 @@
+"""
+Benchmark: nhiều người cùng mua một variant còn ít hàng.
+
+So sánh hai cách trừ tồn kho:
+- read-check-write: đọc amount, kiểm tra trong Python rồi UPDATE (cách cũ
+  của PUT /products/variants/{id}/stock)
+- conditional: ProductVariant.decrement_stock, một câu UPDATE ... WHERE amount >= %s
+
+Mỗi người mua trừ 1 đơn vị; in số lần bán thành công, tồn kho cuối và số
+bị bán quá (oversell), cùng thông lượng.
+
+Mặc định chạy trên kho giả trong bộ nhớ: mỗi câu truy vấn ngủ khoảng
+--query-ms mili giây, câu UPDATE có điều kiện được thực hiện nguyên tử như khóa dòng
+của InnoDB. Với --mysql, chạy trên database thật (biến môi trường DB_*)
+với variant --variant-id, và thêm chế độ reserve (reserve_many nhiều
+variant --reserve-ids trong một transaction).
+
+Chạy: python -m benchmarks.bench_stock_contention --buyers 500 --stock 100 --concurrency 50
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+from unittest import mock
+
+from app.database import db
+import app.database as database_module
+from app.models.product_variant import InsufficientStockError, ProductVariant
+
+
+class FakeStore:
+    def __init__(self, stock, delay):
+        self.amount = stock
+        self.delay = delay
+        self.lock = threading.Lock()
+
+
+class FakeCursor:
+    def __init__(self, store):
+        self.store = store
+        self.row = None
+        self.lastrowid = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=()):
+        store = self.store
+        # Độ trễ dao động như mạng thật, tránh các thread chạy đều từng nhịp
+        time.sleep(random.uniform(0.5, 1.5) * store.delay)
+        if query.lstrip().upper().startswith("SELECT"):
+            self.row = {"id": params[0], "product_id": 1, "amount": store.amount}
+            return 1
+        with store.lock:
+            # UPDATE trả product_id qua LAST_INSERT_ID, 0 nếu không có dòng nào
+            self.lastrowid = 0
+            if "amount >=" in query:
+                quantity = params[0]
+                if store.amount < quantity:
+                    return 0
+                store.amount -= quantity
+            else:
+                store.amount += params[0]
+            self.lastrowid = 1
+            return 1
+
+    def fetchone(self):
+        return self.row
+
+    def fetchall(self):
+        return [self.row]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, store):
+        self.store = store
+
+    def cursor(self, *args):
+        return FakeCursor(self.store)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def begin(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def read_check_write(variant_id):
+    variant = ProductVariant.get_by_id(variant_id)
+    if not variant or variant["amount"] < 1:
+        return False
+    ProductVariant.update_stock(variant_id, -1)
+    return True
+
+
+def conditional(variant_id):
+    return ProductVariant.decrement_stock(variant_id, 1)
+
+
+def reserve(variant_ids):
+    try:
+        ProductVariant.reserve({variant_id: 1 for variant_id in variant_ids})
+        return True
+    except InsufficientStockError:
+        return False
+
+
+async def drive(func, arg, buyers, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            return await db.run(func, arg)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(buyers)))
+    return sum(1 for ok in results if ok), time.perf_counter() - started
+
+
+def set_stock(variant_ids, stock):
+    placeholders = ", ".join(["%s"] * len(variant_ids))
+    db.execute(f"UPDATE ProductVariant SET amount = %s WHERE id IN ({placeholders})", (stock, *variant_ids))
+
+
+def get_stock(variant_id):
+    return db.fetch_one("SELECT amount FROM ProductVariant WHERE id = %s", (variant_id,))["amount"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buyers", type=int, default=500)
+    parser.add_argument("--stock", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--query-ms", type=float, default=2.0)
+    parser.add_argument("--mysql", action="store_true", help="Run against the database configured by DB_* env vars")
+    parser.add_argument("--variant-id", type=int, default=1)
+    parser.add_argument("--reserve-ids", type=str, default="1,2,3", help="Variants reserved together in reserve mode")
+    args = parser.parse_args()
+
+    modes = [("read-check-write", read_check_write), ("conditional", conditional)]
+
+    if not args.mysql:
+        for mode, func in modes:
+            store = FakeStore(args.stock, args.query_ms / 1000)
+            with mock.patch.object(database_module.pymysql, "connect", lambda **kwargs: FakeConnection(store)):
+                sold, elapsed = asyncio.run(drive(func, args.variant_id, args.buyers, args.concurrency))
+                # Bỏ các kết nối giả của lượt này khỏi pool
+                db.disconnect()
+            # Với read-check-write, số lần "bán" vượt quá stock chính là oversell
+            print(f"{mode:>16}: sold {sold}/{args.stock}, final stock {store.amount}, "
+                  f"oversold {max(sold - args.stock, 0)}, {args.buyers / elapsed:.1f} req/s")
+        return
+
+    for mode, func in modes:
+        set_stock([args.variant_id], args.stock)
+        sold, elapsed = asyncio.run(drive(func, args.variant_id, args.buyers, args.concurrency))
+        print(f"{mode:>16}: sold {sold}/{args.stock}, final stock {get_stock(args.variant_id)}, "
+              f"oversold {max(sold - args.stock, 0)}, {args.buyers / elapsed:.1f} req/s")
+
+    reserve_ids = [int(variant_id) for variant_id in args.reserve_ids.split(",")]
+    set_stock(reserve_ids, args.stock)
+    sold, elapsed = asyncio.run(drive(reserve, reserve_ids, args.buyers, args.concurrency))
+    finals = [get_stock(variant_id) for variant_id in reserve_ids]
+    print(f"{'reserve':>16}: {sold}/{args.stock} carts reserved {reserve_ids}, final stock {finals}, "
+          f"oversold {max(sold - args.stock, 0)}, {args.buyers / elapsed:.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
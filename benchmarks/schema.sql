@@ -0,0 +1,104 @@
+-- Schema gốc cho database benchmark (dựng lại từ các câu truy vấn trong
+-- app/models). Sau file này benchmarks/seed.py chạy lần lượt migrations/*.sql
+-- như trên production.
+
+CREATE TABLE Categories (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE Products (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    description TEXT,
+    category_id INT NOT NULL,
+    status VARCHAR(50) NOT NULL DEFAULT 'In stock',
+    artisan_description TEXT NOT NULL,
+    FOREIGN KEY (category_id) REFERENCES Categories(id)
+);
+
+CREATE TABLE ProductVariant (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    product_id INT NOT NULL,
+    color VARCHAR(50) NOT NULL,
+    size INT,
+    price DECIMAL(12, 2) NOT NULL,
+    amount INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (product_id) REFERENCES Products(id) ON DELETE CASCADE
+);
+
+CREATE TABLE Customers (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    address VARCHAR(255),
+    email VARCHAR(255) NOT NULL UNIQUE,
+    phone VARCHAR(20),
+    user_name VARCHAR(100) NOT NULL UNIQUE,
+    password VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE Employee (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    phone VARCHAR(20),
+    job_title VARCHAR(100),
+    user_name VARCHAR(100) NOT NULL UNIQUE,
+    password VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE Payment (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    payment_method VARCHAR(50) NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    payment_date DATETIME
+);
+
+CREATE TABLE Orders (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    customer_id INT NOT NULL,
+    payment_id INT,
+    total_amount DECIMAL(14, 2) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    date DATETIME NOT NULL,
+    FOREIGN KEY (customer_id) REFERENCES Customers(id),
+    FOREIGN KEY (payment_id) REFERENCES Payment(id)
+);
+
+CREATE TABLE OrderDetail (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    order_id INT NOT NULL,
+    variant_id INT NOT NULL,
+    quantity INT NOT NULL,
+    price DECIMAL(12, 2) NOT NULL,
+    FOREIGN KEY (order_id) REFERENCES Orders(id) ON DELETE CASCADE,
+    FOREIGN KEY (variant_id) REFERENCES ProductVariant(id)
+);
+
+CREATE TABLE Shipment (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    order_id INT NOT NULL,
+    carrier VARCHAR(50) NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    FOREIGN KEY (order_id) REFERENCES Orders(id) ON DELETE CASCADE
+);
+
+CREATE TABLE Reviews (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    customer_id INT NOT NULL,
+    variant_id INT NOT NULL,
+    rating TINYINT NOT NULL,
+    content TEXT,
+    date DATETIME NOT NULL,
+    FOREIGN KEY (customer_id) REFERENCES Customers(id),
+    FOREIGN KEY (variant_id) REFERENCES ProductVariant(id) ON DELETE CASCADE
+);
+
+CREATE TABLE Cart (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    productvariant_id INT NOT NULL,
+    quantity INT NOT NULL,
+    total_price DECIMAL(14, 2) NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES Customers(id),
+    FOREIGN KEY (productvariant_id) REFERENCES ProductVariant(id) ON DELETE CASCADE
+);
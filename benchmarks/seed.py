@@ -0,0 +1,226 @@
+"""
+Tạo database benchmark và nạp dữ liệu giả có thể tái lập (cùng --seed thì
+cùng dữ liệu): danh mục, sản phẩm, variant, khách hàng, đơn hàng, review.
+
+Database được xóa và tạo lại mỗi lần chạy trên MySQL tại DB_HOST / DB_USER /
+DB_PASSWORD, nên tên phải chứa "bench" để không xóa nhầm database thật.
+Các bước: benchmarks/schema.sql, lần lượt migrations/*.sql, nạp dữ liệu,
+rồi tính lại VariantRatingStats / ProductRatingStats / PurchaseEligibility
+bằng chính code của app.
+
+MySQL dùng một lần, ví dụ:
+    docker run --rm -d -p 3306:3306 -e MYSQL_ROOT_PASSWORD=bench mysql:8.0
+    DB_HOST=127.0.0.1 DB_USER=root DB_PASSWORD=bench python -m benchmarks.seed
+
+Mọi khách hàng có mật khẩu PASSWORD, tên đăng nhập customer_name(i).
+"""
+import argparse
+import os
+import random
+import re
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pymysql
+
+ROOT = Path(__file__).resolve().parent.parent
+SCHEMA = ROOT / "benchmarks" / "schema.sql"
+MIGRATIONS = ROOT / "migrations"
+
+DEFAULT_DATABASE = "handicrafts_bench"
+PASSWORD = "mat-khau-bench"
+BATCH_SIZE = 1000
+
+# Quy mô mặc định, đổi bằng tham số dòng lệnh
+SCALE = {
+    "categories": 20,
+    "products": 2000,
+    "variants_per_product": 4,
+    "customers": 2000,
+    "orders": 5000,
+    "reviews": 20000,
+}
+
+COLORS = ["Nâu", "Be", "Đen", "Trắng", "Xanh", "Đỏ", "Vàng", "Xám"]
+SIZES = [None, 10, 15, 20, 25, 30, 40, 50]
+MATERIALS = ["mây", "tre", "gốm", "lụa", "gỗ", "cói", "sơn mài", "thổ cẩm"]
+ITEMS = ["giỏ", "bình", "khay", "đèn", "túi", "hộp", "tranh", "khăn"]
+ORDER_STATUSES = ["received"] * 6 + ["pending", "confirmed", "shipping", "cancelled"]
+START_DATE = datetime(2024, 1, 1)
+
+
+def customer_name(i):
+    return f"khach{i}"
+
+
+def use_database(name):
+    """Trỏ app sang database benchmark, phải gọi trước khi import app"""
+    if "bench" not in name:
+        raise SystemExit(f"Refusing to use database {name!r}: name must contain 'bench'")
+    os.environ["DB_NAME"] = name
+
+
+def add_scale_arguments(parser):
+    parser.add_argument("--database", default=os.getenv("BENCH_DB_NAME", DEFAULT_DATABASE))
+    parser.add_argument("--seed", type=int, default=42, help="Seed của dữ liệu giả")
+    for name, default in SCALE.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default)
+
+
+def scale_from_args(args):
+    return {name: getattr(args, name) for name in SCALE}
+
+
+def _statements(sql):
+    """Tách file .sql thành từng câu lệnh (bỏ comment --)"""
+    body = "\n".join(line for line in sql.splitlines() if not line.lstrip().startswith("--"))
+    return [statement.strip() for statement in re.split(r";\s*(?:\n|$)", body) if statement.strip()]
+
+
+def _connect(database=None):
+    return pymysql.connect(
+        host=os.getenv("DB_HOST"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=database,
+        charset="utf8mb4",
+        autocommit=True,
+    )
+
+
+def _insert_many(cursor, query, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        cursor.executemany(query, rows[start:start + BATCH_SIZE])
+
+
+def generate(scale, seed):
+    """Sinh toàn bộ dòng dữ liệu (id tự đánh từ 1) từ seed"""
+    rng = random.Random(seed)
+    data = {}
+
+    data["categories"] = [
+        (i, f"{rng.choice(ITEMS).capitalize()} {rng.choice(MATERIALS)} {i}")
+        for i in range(1, scale["categories"] + 1)
+    ]
+
+    data["products"], data["variants"] = [], []
+    variant_id = 0
+    for i in range(1, scale["products"] + 1):
+        material, item = rng.choice(MATERIALS), rng.choice(ITEMS)
+        data["products"].append((
+            i,
+            f"{item.capitalize()} {material} thủ công {i}",
+            f"{item.capitalize()} làm từ {material}, đan tay theo lối truyền thống. " * rng.randint(1, 4),
+            rng.randint(1, scale["categories"]),
+            "In stock" if rng.random() < 0.85 else "Out of stock",
+            f"Nghệ nhân làng nghề {material} với {rng.randint(5, 40)} năm kinh nghiệm.",
+        ))
+        for color in rng.sample(COLORS, min(scale["variants_per_product"], len(COLORS))):
+            variant_id += 1
+            data["variants"].append((
+                variant_id, i, color, rng.choice(SIZES),
+                rng.randrange(50, 5000) * 1000, rng.randint(0, 200),
+            ))
+
+    data["customers"] = [
+        (i, f"Khách hàng {i}", f"{rng.randint(1, 500)} Đường số {rng.randint(1, 50)}, TP. HCM",
+         f"{customer_name(i)}@bench.local", f"09{rng.randrange(10 ** 8):08d}", customer_name(i))
+        for i in range(1, scale["customers"] + 1)
+    ]
+
+    prices = {row[0]: row[4] for row in data["variants"]}
+    span = int((datetime(2026, 1, 1) - START_DATE).total_seconds())
+    data["payments"], data["orders"], data["order_details"], data["shipments"] = [], [], [], []
+    detail_id = 0
+    for i in range(1, scale["orders"] + 1):
+        date = START_DATE + timedelta(seconds=rng.randrange(span))
+        status = rng.choice(ORDER_STATUSES)
+        lines = rng.sample(range(1, variant_id + 1), min(rng.randint(1, 4), variant_id))
+        total = 0
+        for line in lines:
+            detail_id += 1
+            quantity = rng.randint(1, 3)
+            total += prices[line] * quantity
+            data["order_details"].append((detail_id, i, line, quantity, prices[line]))
+        paid = status in ("received", "shipping", "confirmed")
+        data["payments"].append((i, rng.choice(["COD", "Bank", "Momo"]), "Paid" if paid else "Pending",
+                                 date if paid else None))
+        data["orders"].append((i, rng.randint(1, scale["customers"]), i, total, status, date))
+        data["shipments"].append((i, i, rng.choice(["GHTK", "GHN", "VNPost"]),
+                                  "Delivered" if status == "received" else "Pending"))
+
+    data["reviews"] = [
+        (i, rng.randint(1, scale["customers"]), rng.randint(1, variant_id),
+         rng.choices([1, 2, 3, 4, 5], weights=[1, 1, 3, 6, 9])[0],
+         f"Sản phẩm {rng.choice(['đẹp', 'chắc chắn', 'đúng mô tả', 'giao nhanh', 'hơi nhỏ'])}." * rng.randint(1, 3),
+         START_DATE + timedelta(seconds=rng.randrange(span)))
+        for i in range(1, scale["reviews"] + 1)
+    ]
+    return data
+
+
+INSERTS = [
+    ("categories", "INSERT INTO Categories (id, name) VALUES (%s, %s)"),
+    ("products", "INSERT INTO Products (id, name, description, category_id, status, artisan_description) "
+                 "VALUES (%s, %s, %s, %s, %s, %s)"),
+    ("variants", "INSERT INTO ProductVariant (id, product_id, color, size, price, amount) "
+                 "VALUES (%s, %s, %s, %s, %s, %s)"),
+    ("customers", "INSERT INTO Customers (id, name, address, email, phone, user_name, password) "
+                  "VALUES (%s, %s, %s, %s, %s, %s, %s)"),
+    ("payments", "INSERT INTO Payment (id, payment_method, status, payment_date) VALUES (%s, %s, %s, %s)"),
+    ("orders", "INSERT INTO Orders (id, customer_id, payment_id, total_amount, status, date) "
+               "VALUES (%s, %s, %s, %s, %s, %s)"),
+    ("order_details", "INSERT INTO OrderDetail (id, order_id, variant_id, quantity, price) "
+                      "VALUES (%s, %s, %s, %s, %s)"),
+    ("shipments", "INSERT INTO Shipment (id, order_id, carrier, status) VALUES (%s, %s, %s, %s)"),
+    ("reviews", "INSERT INTO Reviews (id, customer_id, variant_id, rating, content, date) "
+                "VALUES (%s, %s, %s, %s, %s, %s)"),
+]
+
+
+def seed_database(database, scale, seed):
+    """Tạo lại database và nạp dữ liệu. Trả về số dòng mỗi bảng"""
+    use_database(database)
+    started = time.perf_counter()
+    data = generate(scale, seed)
+
+    # Mọi khách dùng chung một hash để không phải chạy bcrypt hàng nghìn lần
+    from app.security import hash_password
+    password_hash = hash_password(PASSWORD)
+    data["customers"] = [row + (password_hash,) for row in data["customers"]]
+
+    connection = _connect()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+            cursor.execute(f"CREATE DATABASE `{database}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+            cursor.execute(f"USE `{database}`")
+            for path in [SCHEMA, *sorted(MIGRATIONS.glob("*.sql"))]:
+                for statement in _statements(path.read_text(encoding="utf-8")):
+                    cursor.execute(statement)
+            for table, query in INSERTS:
+                _insert_many(cursor, query, data[table])
+    finally:
+        connection.close()
+
+    # Bảng tính sẵn được dựng bằng chính code của app
+    from app.models.rating_stats import RatingStats
+    from app.models.purchase_eligibility import PurchaseEligibility
+    RatingStats.rebuild()
+    PurchaseEligibility.rebuild()
+
+    counts = {table: len(data[table]) for table, _ in INSERTS}
+    print(f"Đã nạp database {database} trong {time.perf_counter() - started:.1f}s: {counts}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_scale_arguments(parser)
+    args = parser.parse_args()
+    seed_database(args.database, scale_from_args(args), args.seed)
+
+
+if __name__ == "__main__":
+    main()
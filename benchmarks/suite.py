@@ -0,0 +1,256 @@
+"""
+Bộ benchmark tái lập: nạp dữ liệu giả vào database MySQL dùng một lần
+(benchmarks/seed.py) rồi gọi app FastAPI thật qua ASGI (httpx.ASGITransport,
+không có mạng) trên các endpoint nóng. Startup / shutdown của app chạy qua
+asgi_lifespan.LifespanManager như dưới uvicorn (pool bcrypt, dựng chỉ mục
+catalog); các kịch bản chỉ bắt đầu khi chỉ mục đã dựng xong.
+
+- products_list:   GET /products/?include_variants=true (phân trang skip)
+- products_cursor: như products_list nhưng phân trang bằng cursor (keyset)
+- product_detail:  GET /products/{id}
+- product_search:  GET /products/search?q=... (1-3 từ, đôi khi lọc category);
+                   mục tiêu vài ms ở --products 100000
+- product_reviews: GET /products/{id}/reviews
+- variant_reviews: GET /variants/{id}/reviews
+- login:           POST /login/ (bcrypt trong pool process)
+
+Mỗi kịch bản chạy --warmup request (không tính) rồi --requests request với
+--concurrency request đồng thời; id được chọn ngẫu nhiên theo --seed nên hai
+lần chạy gọi cùng một dãy URL. Kết quả là JSON: p50/p95/p99/mean/max (ms),
+thông lượng, mã trạng thái và số câu SQL trung bình mỗi request.
+--compare in chênh lệch so với một file kết quả trước đó.
+
+Chạy (MySQL tại DB_HOST / DB_USER / DB_PASSWORD, xem benchmarks/seed.py):
+    python -m benchmarks.suite --output bench.json
+    python -m benchmarks.suite --skip-seed --compare bench.json --scenarios products_list,login
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+import httpx
+from asgi_lifespan import LifespanManager
+
+from app.pagination import encode_cursor
+from app.services.search import fold
+from benchmarks.seed import (
+    ITEMS, MATERIALS, PASSWORD, add_scale_arguments, customer_name, scale_from_args, seed_database, use_database,
+)
+
+
+def _products_list(rng, scale):
+    skip = rng.randrange(max(scale["products"] - 20, 1))
+    return "GET", f"/products/?include_variants=true&limit=20&skip={skip}", None
+
+
+def _products_cursor(rng, scale):
+    # Cùng vị trí ngẫu nhiên với products_list (id sản phẩm là 1..N), nhưng
+    # dùng cursor như client đi theo next_cursor
+    after_id = rng.randrange(max(scale["products"] - 20, 1))
+    return "GET", f"/products/?include_variants=true&limit=20&cursor={encode_cursor(after_id)}", None
+
+
+def _product_detail(rng, scale):
+    return "GET", f"/products/{rng.randint(1, scale['products'])}", None
+
+
+def _product_search(rng, scale):
+    # Từ của tên sản phẩm do seed sinh ra, có dấu hoặc không
+    words = rng.sample(ITEMS + MATERIALS, rng.randint(1, 3))
+    params = {"q": " ".join(words if rng.random() < 0.5 else [fold(word) for word in words]), "limit": 20}
+    if rng.random() < 0.3:
+        params["category_id"] = rng.randint(1, scale["categories"])
+    return "GET", f"/products/search?{urlencode(params)}", None
+
+
+def _product_reviews(rng, scale):
+    return "GET", f"/products/{rng.randint(1, scale['products'])}/reviews?limit=20", None
+
+
+def _variant_reviews(rng, scale):
+    variants = scale["products"] * scale["variants_per_product"]
+    return "GET", f"/variants/{rng.randint(1, variants)}/reviews?limit=10", None
+
+
+def _login(rng, scale):
+    body = {"username": customer_name(rng.randint(1, scale["customers"])), "password": PASSWORD, "role": "customer"}
+    return "POST", "/login/", body
+
+
+SCENARIOS = {
+    "products_list": _products_list,
+    "products_cursor": _products_cursor,
+    "product_detail": _product_detail,
+    "product_search": _product_search,
+    "product_reviews": _product_reviews,
+    "variant_reviews": _variant_reviews,
+    "login": _login,
+}
+
+
+def percentile(sorted_values, fraction):
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def run_scenario(app, make_request, total, concurrency, warmup, rng, scale):
+    """Chạy một kịch bản, trả về thống kê độ trễ (ms) và thông lượng"""
+    from app.query_stats import track_queries
+
+    requests = [make_request(rng, scale) for _ in range(warmup + total)]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def send(method, url, body):
+            started = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            return time.perf_counter() - started, response.status_code
+
+        for request in requests[:warmup]:
+            await send(*request)
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(request):
+            async with semaphore:
+                return await send(*request)
+
+        with track_queries() as stats:
+            started = time.perf_counter()
+            results = await asyncio.gather(*(one(request) for request in requests[warmup:]))
+            elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    statuses = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "requests": total,
+        "errors": sum(count for status, count in statuses.items() if not status.startswith("2")),
+        "status_codes": statuses,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        "throughput_rps": round(total / elapsed, 2),
+        "db_queries_per_request": round(stats.count / total, 2),
+    }
+
+
+async def wait_for_indexes(timeout):
+    """Chờ startup dựng xong chỉ mục tìm kiếm / facet (chạy ở thread nền)"""
+    from app.services.search import search_index
+    from app.services.facets import facet_index
+
+    deadline = time.monotonic() + timeout
+    while not (search_index.ready and facet_index.ready):
+        if time.monotonic() > deadline:
+            print("Chỉ mục catalog chưa dựng xong, vẫn chạy benchmark", file=sys.stderr)
+            return
+        await asyncio.sleep(0.1)
+
+
+async def run_suite(app, names, args, scale):
+    """Chạy các kịch bản trong một vòng đời app (startup một lần, shutdown khi xong)"""
+    results = {}
+    async with LifespanManager(app, startup_timeout=60, shutdown_timeout=60) as manager:
+        await wait_for_indexes(timeout=300)
+        for name in names:
+            rng = random.Random(f"{args.seed}:{name}")
+            results[name] = summary = await run_scenario(
+                manager.app, SCENARIOS[name], args.requests, args.concurrency, args.warmup, rng, scale
+            )
+            print(f"{name:>16}: p50 {summary['p50_ms']:.1f} ms, p95 {summary['p95_ms']:.1f} ms, "
+                  f"p99 {summary['p99_ms']:.1f} ms, {summary['throughput_rps']:.1f} req/s, "
+                  f"{summary['errors']} errors", file=sys.stderr)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, results):
+    """In chênh lệch p50/p95/p99 và thông lượng so với kết quả trước"""
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        changes = []
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            if previous[key]:
+                changes.append(f"{key} {previous[key]} -> {current[key]} "
+                               f"({(current[key] - previous[key]) / previous[key] * 100:+.1f}%)")
+        print(f"{name:>16}: " + ", ".join(changes), file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_scale_arguments(parser)
+    parser.add_argument("--skip-seed", action="store_true", help="Dùng lại database đã nạp (cùng quy mô)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--output", help="Ghi JSON ra file thay vì stdout")
+    parser.add_argument("--compare", help="File JSON kết quả trước để so sánh")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    scale = scale_from_args(args)
+    # DB_NAME phải được đặt trước khi import app
+    use_database(args.database)
+    if not args.skip_seed:
+        seed_database(args.database, scale, args.seed)
+
+    from app.database import db
+    from main import app
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "database": args.database,
+            "seed": args.seed,
+            "scale": scale,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+        },
+        "scenarios": {},
+    }
+    try:
+        results["scenarios"] = asyncio.run(run_suite(app, names, args, scale))
+    finally:
+        db.disconnect()
+
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            compare(json.load(file), results)
+
+
+if __name__ == "__main__":
+    main()
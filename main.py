@@ -1,6 +1,13 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import products_router, signup_router,login_router,reviews_router
+from app.routes import products_router, signup_router,login_router,reviews_router,cart_router,orders_router,metrics_router
+from app.security import password_hasher
+from app.compression import CompressionMiddleware
+from app.query_stats import QueryStatsMiddleware
+from app.metrics import MetricsMiddleware, metrics_flusher
+from app.services.search import search_index
+from app.services.facets import facet_index
+import asyncio
 
 app = FastAPI(
     title="Handicraft API",
@@ -17,6 +24,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Nén response (gzip / brotli), giữ sẵn bản nén cho các trang có ETag
+app.add_middleware(CompressionMiddleware)
+
+# Thống kê SQL theo request (header X-DB-Queries khi DB_DEBUG=1)
+app.add_middleware(QueryStatsMiddleware)
+
+# Độ trễ / số request theo route cho GET /metrics (ngoài cùng để đo cả thời gian nén)
+app.add_middleware(MetricsMiddleware)
+
+@app.on_event("startup")
+async def start_password_hasher():
+    # Tạo pool process băm mật khẩu cùng lúc với app
+    password_hasher.start()
+    # Ghi snapshot metric định kỳ khi chạy nhiều worker
+    metrics_flusher.start()
+
+
+@app.on_event("startup")
+async def build_catalog_indexes():
+    # Dựng chỉ mục tìm kiếm và facet ở thread nền,
+    # /products/search và /products/facets trả 503 cho đến khi xong
+    def build():
+        for name, index in (("tìm kiếm", search_index), ("facet", facet_index)):
+            try:
+                index.build()
+            except Exception as e:
+                print(f"Lỗi dựng chỉ mục {name}: {e}")
+    asyncio.get_running_loop().run_in_executor(None, build)
+
+
+@app.on_event("shutdown")
+async def stop_password_hasher():
+    password_hasher.shutdown()
+    metrics_flusher.shutdown()
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -27,6 +69,9 @@ app.include_router(products_router)
 app.include_router(reviews_router)
 app.include_router(signup_router)
 app.include_router(login_router)
+app.include_router(cart_router)
+app.include_router(orders_router)
+app.include_router(metrics_router)
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
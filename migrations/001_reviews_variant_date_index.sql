@@ -0,0 +1,6 @@
+-- Index phục vụ danh sách review theo variant/sản phẩm, mới nhất trước
+-- (Review.get_by_product_variant, Review.get_page_by_product)
+CREATE INDEX idx_reviews_variant_date ON Reviews (variant_id, date, id);
+
+-- Lấy các variant của một sản phẩm khi join từ Reviews sang ProductVariant
+CREATE INDEX idx_productvariant_product ON ProductVariant (product_id, id);
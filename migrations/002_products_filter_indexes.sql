@@ -0,0 +1,4 @@
+-- Index cho các bộ lọc danh sách sản phẩm (Product.FILTERS), sắp xếp theo id
+CREATE INDEX idx_products_category ON Products (category_id, id);
+CREATE INDEX idx_products_status ON Products (status, id);
+CREATE INDEX idx_products_category_status ON Products (category_id, status, id);
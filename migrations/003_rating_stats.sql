@@ -0,0 +1,49 @@
+-- Thống kê rating lưu sẵn, cập nhật cùng transaction với Reviews
+-- (app/models/rating_stats.py), được tính sẵn cho các review đã có ở cuối
+-- file. Tính lại: python -m app.cli rebuild-ratings
+CREATE TABLE IF NOT EXISTS VariantRatingStats (
+    variant_id INT NOT NULL PRIMARY KEY,
+    review_count INT NOT NULL DEFAULT 0,
+    rating_sum INT NOT NULL DEFAULT 0,
+    star_1 INT NOT NULL DEFAULT 0,
+    star_2 INT NOT NULL DEFAULT 0,
+    star_3 INT NOT NULL DEFAULT 0,
+    star_4 INT NOT NULL DEFAULT 0,
+    star_5 INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (variant_id) REFERENCES ProductVariant(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS ProductRatingStats (
+    product_id INT NOT NULL PRIMARY KEY,
+    review_count INT NOT NULL DEFAULT 0,
+    rating_sum INT NOT NULL DEFAULT 0,
+    star_1 INT NOT NULL DEFAULT 0,
+    star_2 INT NOT NULL DEFAULT 0,
+    star_3 INT NOT NULL DEFAULT 0,
+    star_4 INT NOT NULL DEFAULT 0,
+    star_5 INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (product_id) REFERENCES Products(id) ON DELETE CASCADE
+);
+
+-- Tính thống kê cho các review đã có (như rebuild-ratings); ghi đè nếu
+-- app đã kịp tạo dòng trước khi migration chạy xong
+INSERT INTO VariantRatingStats (variant_id, review_count, rating_sum, star_1, star_2, star_3, star_4, star_5)
+SELECT r.variant_id, COUNT(*), SUM(r.rating),
+    SUM(r.rating = 1), SUM(r.rating = 2), SUM(r.rating = 3), SUM(r.rating = 4), SUM(r.rating = 5)
+FROM Reviews r
+GROUP BY r.variant_id
+ON DUPLICATE KEY UPDATE
+    review_count = VALUES(review_count), rating_sum = VALUES(rating_sum),
+    star_1 = VALUES(star_1), star_2 = VALUES(star_2), star_3 = VALUES(star_3),
+    star_4 = VALUES(star_4), star_5 = VALUES(star_5);
+
+INSERT INTO ProductRatingStats (product_id, review_count, rating_sum, star_1, star_2, star_3, star_4, star_5)
+SELECT pv.product_id, COUNT(*), SUM(r.rating),
+    SUM(r.rating = 1), SUM(r.rating = 2), SUM(r.rating = 3), SUM(r.rating = 4), SUM(r.rating = 5)
+FROM Reviews r
+JOIN ProductVariant pv ON r.variant_id = pv.id
+GROUP BY pv.product_id
+ON DUPLICATE KEY UPDATE
+    review_count = VALUES(review_count), rating_sum = VALUES(rating_sum),
+    star_1 = VALUES(star_1), star_2 = VALUES(star_2), star_3 = VALUES(star_3),
+    star_4 = VALUES(star_4), star_5 = VALUES(star_5);
@@ -0,0 +1,24 @@
+-- Mỗi khách chỉ có một dòng cho mỗi variant trong giỏ, để Cart.save dùng
+-- INSERT ... ON DUPLICATE KEY UPDATE (app/models/cart.py)
+
+-- Gộp các dòng trùng (nếu có) vào dòng có id nhỏ nhất trước khi thêm khóa unique
+UPDATE Cart c
+JOIN (
+    SELECT user_id, productvariant_id, MIN(id) AS keep_id, SUM(quantity) AS quantity
+    FROM Cart
+    GROUP BY user_id, productvariant_id
+    HAVING COUNT(*) > 1
+) d ON c.id = d.keep_id
+SET c.quantity = d.quantity;
+
+DELETE c FROM Cart c
+JOIN Cart k
+  ON c.user_id = k.user_id
+ AND c.productvariant_id = k.productvariant_id
+ AND c.id > k.id;
+
+UPDATE Cart c
+JOIN ProductVariant pv ON c.productvariant_id = pv.id
+SET c.total_price = pv.price * c.quantity;
+
+ALTER TABLE Cart ADD UNIQUE KEY uq_cart_user_variant (user_id, productvariant_id);
@@ -0,0 +1,14 @@
+-- Cặp (khách, variant) đã mua và nhận hàng, dùng để kiểm tra quyền viết
+-- review (app/models/purchase_eligibility.py). Được thêm khi đơn chuyển sang
+-- 'received'. Tính lại: python -m app.cli rebuild-eligibility
+CREATE TABLE IF NOT EXISTS PurchaseEligibility (
+    customer_id INT NOT NULL,
+    variant_id INT NOT NULL,
+    PRIMARY KEY (customer_id, variant_id)
+);
+
+INSERT IGNORE INTO PurchaseEligibility (customer_id, variant_id)
+SELECT DISTINCT o.customer_id, od.variant_id
+FROM Orders o
+JOIN OrderDetail od ON o.id = od.order_id
+WHERE o.status = 'received';
@@ -0,0 +1,7 @@
+-- Phiên bản dữ liệu theo scope ("catalog", "product:<id>", "reviews",
+-- "ratings") cho ETag của các endpoint catalog (app/cache.py VersionStore).
+-- Được tăng sau mỗi lần ghi, dùng chung cho mọi worker và lệnh CLI.
+CREATE TABLE IF NOT EXISTS DataVersion (
+    scope VARCHAR(64) NOT NULL PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0
+);
@@ -0,0 +1,7 @@
+-- Thời điểm đổi gần nhất của mỗi scope trong DataVersion. Chỉ mục tìm kiếm
+-- và facet trong bộ nhớ đọc các scope "product:<id>" đổi sau lần đọc trước
+-- (app/services/change_feed.py) để biết cả lần ghi của worker khác / CLI.
+ALTER TABLE DataVersion
+    ADD COLUMN changed_at TIMESTAMP(6) NOT NULL
+        DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    ADD INDEX idx_dataversion_changed_at (changed_at);
@@ -0,0 +1,453 @@
+"""
+Database giả cho test: pymysql.connect của app.database được thay bằng
+FakeConnection trên một FakeStore trong bộ nhớ.
+
+- Mỗi câu lệnh được ghi vào app.query_stats như InstrumentedDictCursor, nên
+  app.testing.query_budget đếm được số câu SQL của một request.
+- FakeStore chỉ hiểu các câu lệnh có handler (HANDLERS); câu lạ làm test
+  fail thay vì trả về kết quả rỗng. Handler trả về (rows, rowcount) hoặc
+  (rows, rowcount, lastrowid).
+- Câu UPDATE khóa dòng bị sửa đến khi transaction commit/rollback như khóa
+  dòng của InnoDB (autocommit thì nhả ngay), rollback trả lại giá trị cũ.
+"""
+import re
+import threading
+import time
+from datetime import datetime
+from unittest import mock
+
+import pytest
+
+import app.database as database_module
+from app.cache import cache
+from app.database import db
+from app.query_stats import record_query
+
+
+def _where_params(query, params, conditions):
+    """Tách tham số của các điều kiện WHERE có mặt trong câu (theo đúng thứ tự)"""
+    values = {}
+    index = 0
+    for name, condition in conditions:
+        if condition in query:
+            values[name] = params[index]
+            index += 1
+    return values, params[index:]
+
+
+PRODUCT_CONDITIONS = [
+    ("category_id", "p.category_id = %s"),
+    ("status", "p.status = %s"),
+    ("after_id", "p.id > %s"),
+]
+
+
+def _filter_products(store, values):
+    products = sorted(store.products.values(), key=lambda p: p["id"])
+    for name, value in values.items():
+        if name == "after_id":
+            products = [p for p in products if p["id"] > value]
+        else:
+            products = [p for p in products if p[name] == value]
+    return products
+
+
+def _product_page(store, connection, query, params):
+    values, rest = _where_params(query, params, PRODUCT_CONDITIONS)
+    limit = rest[0]
+    offset = rest[1] if "OFFSET" in query else 0
+    rows = _filter_products(store, values)[offset:offset + limit]
+    return [{**p, "category_name": f"Danh mục {p['category_id']}", "rating_count": 0,
+             "average_rating": None} for p in rows], len(rows)
+
+
+def _product_count(store, connection, query, params):
+    values, _ = _where_params(query, params, PRODUCT_CONDITIONS)
+    return [{"total": len(_filter_products(store, values))}], 1
+
+
+def _variants_by_products(store, connection, query, params):
+    wanted = set(params)
+    rows = sorted((v for v in store.variants.values() if v["product_id"] in wanted),
+                  key=lambda v: (v["product_id"], v["id"]))
+    return [dict(v) for v in rows], len(rows)
+
+
+def _product_by_id(store, connection, query, params):
+    product = store.products.get(params[0])
+    if product is None:
+        return [], 0
+    category = {"id": product["category_id"], "name": store.categories.get(product["category_id"], "")}
+    return [{**product, "category": category, "rating_count": 0, "average_rating": None}], 1
+
+
+def _variants_of_product(store, connection, query, params):
+    rows = sorted((v for v in store.variants.values() if v["product_id"] == params[0]), key=lambda v: v["id"])
+    return [dict(v) for v in rows], len(rows)
+
+
+def _decrement(store, connection, query, params):
+    quantity, variant_id, minimum = params
+    variant = store.variants.get(variant_id)
+    if variant is None:
+        return [], 0, 0
+    connection.lock_row(variant_id)
+    # Đọc lại sau khi đã giữ khóa dòng, như InnoDB đọc bản mới nhất khi UPDATE
+    if variant["amount"] < minimum:
+        return [], 0, 0
+    connection.remember(variant_id, variant["amount"])
+    variant["amount"] -= quantity
+    store.lowest[variant_id] = min(store.lowest.get(variant_id, variant["amount"]), variant["amount"])
+    # product_id = LAST_INSERT_ID(product_id): MySQL trả product_id qua lastrowid
+    return [], 1, variant["product_id"]
+
+
+def _select_versions(store, connection, query, params):
+    rows = [{"scope": scope, "version": store.versions[scope]} for scope in params if scope in store.versions]
+    return rows, len(rows)
+
+
+def _bump_versions(store, connection, query, params):
+    store.bump(*params)
+    return [], len(params)
+
+
+def _changed_versions(store, connection, query, params):
+    rows = [{"scope": scope, "changed_at": changed_at}
+            for scope, changed_at in store.changed.items() if changed_at > params[0]]
+    return rows, len(rows)
+
+
+def _index_products(store, connection, query, params):
+    rows = [dict(store.products[product_id]) for product_id in params if product_id in store.products]
+    return rows, len(rows)
+
+
+def _cart_upsert(store, connection, query, params):
+    user_id, quantity, _, variant_id = params
+    if variant_id not in store.variants:
+        return [], 0
+    line = store.cart.get((user_id, variant_id))
+    if line is None:
+        store.cart[(user_id, variant_id)] = {"id": len(store.cart) + 1, "quantity": quantity}
+        return [], 1
+    new_quantity = line["quantity"] + quantity if "Cart.quantity + VALUES(quantity)" in query else quantity
+    if new_quantity == line["quantity"]:
+        # Dòng không đổi: MySQL (không có CLIENT.FOUND_ROWS) báo 0 dòng
+        return [], 0
+    line["quantity"] = new_quantity
+    return [], 2
+
+
+def _cart_lines(store, connection, query, params):
+    rows = []
+    for (user_id, variant_id), line in sorted(store.cart.items(), key=lambda item: item[1]["id"]):
+        if user_id != params[0]:
+            continue
+        variant = store.variants[variant_id]
+        product = store.products[variant["product_id"]]
+        rows.append({
+            "id": line["id"], "productvariant_id": variant_id, "quantity": line["quantity"],
+            "price": variant["price"], "total_price": variant["price"] * line["quantity"],
+            "color": variant["color"], "size": variant["size"], "stock": variant["amount"],
+            "product_id": product["id"], "product_name": product["name"],
+        })
+    total = sum(row["total_price"] for row in rows)
+    count = sum(row["quantity"] for row in rows)
+    return [{**row, "cart_total": total, "item_count": count} for row in rows], len(rows)
+
+
+def _variant_exists(store, connection, query, params):
+    rows = [{"found": 1}] if params[0] in store.variants else []
+    return rows, len(rows)
+
+
+def _order_for_update(store, connection, query, params):
+    order = store.orders.get(params[0])
+    rows = [{"id": order["id"], "status": order["status"]}] if order else []
+    return rows, len(rows)
+
+
+def _order_set_status(store, connection, query, params):
+    status, order_id = params
+    store.orders[order_id]["status"] = status
+    return [], 1
+
+
+def _order_pairs(store, connection, query, params):
+    order = store.orders[params[0]]
+    rows = [{"customer_id": order["customer_id"], "variant_id": v} for v in order["variants"]]
+    return rows, len(rows)
+
+
+def _grant_eligibility(store, connection, query, params):
+    order = store.orders[params[0]]
+    pairs = {(order["customer_id"], variant_id) for variant_id in order["variants"]}
+    added = pairs - store.eligibility
+    store.eligibility |= added
+    return [], len(added)
+
+
+def _revoke_eligibility(store, connection, query, params):
+    order = store.orders[params[0]]
+    covered = {
+        (other["customer_id"], variant_id)
+        for other in store.orders.values() if other["status"] == "received" and other["id"] != order["id"]
+        for variant_id in other["variants"]
+    }
+    removed = {(order["customer_id"], v) for v in order["variants"]} & store.eligibility - covered
+    store.eligibility -= removed
+    return [], len(removed)
+
+
+def _is_eligible(store, connection, query, params):
+    rows = [{"eligible": 1}] if tuple(params) in store.eligibility else []
+    return rows, len(rows)
+
+
+def _categories(store, connection, query, params):
+    rows = [{"id": category_id, "name": name} for category_id, name in sorted(store.categories.items())]
+    return rows, len(rows)
+
+
+def _insert_products(store, connection, query, params):
+    # Câu INSERT nhiều dòng của Transaction.insert_many: mỗi dòng là "(#n)",
+    # tham số thứ n do FakeCursor.mogrify giữ lại
+    rows = [connection.mogrified[int(n)] for n in re.findall(r"\(#(\d+)\)", query)]
+    first_id = max(store.products, default=0) + 1
+    for offset, (name, description, category_id, status, artisan_description) in enumerate(rows):
+        store.products[first_id + offset] = {
+            "id": first_id + offset, "name": name, "description": description, "category_id": category_id,
+            "status": status, "artisan_description": artisan_description,
+        }
+    return [], len(rows), first_id
+
+
+def _insert_variant(store, connection, query, params):
+    product_id, color, size, price, amount = params
+    variant_id = max(store.variants, default=0) + 1
+    store.add_variant(variant_id, product_id, amount=amount, price=price)
+    store.variants[variant_id].update(color=color, size=size)
+    return [], 1, variant_id
+
+
+def _set_product_status(store, connection, query, params):
+    status, product_id = params
+    product = store.products.get(product_id)
+    if product is None or product["status"] == status:
+        return [], 0
+    product["status"] = status
+    return [], 1
+
+
+def _product_exists(store, connection, query, params):
+    rows = [{"found": 1}] if params[0] in store.products else []
+    return rows, len(rows)
+
+
+HANDLERS = [
+    (re.compile(r"^UPDATE Products SET status = %s WHERE id = %s$"), _set_product_status),
+    (re.compile(r"^SELECT 1 AS found FROM Products WHERE id = %s$"), _product_exists),
+    (re.compile(r"^SELECT \* FROM Categories$"), _categories),
+    (re.compile(r"^SELECT @@auto_increment_increment AS step$"),
+     lambda store, connection, query, params: ([{"step": 1}], 1)),
+    (re.compile(r"^INSERT INTO Products \(name, description, category_id, status, artisan_description\) VALUES \(#"),
+     _insert_products),
+    (re.compile(r"^INSERT INTO ProductVariant \(product_id, color, size, price, amount\) VALUES \(%s"),
+     _insert_variant),
+    (re.compile(r"SELECT id, status FROM Orders WHERE id = %s FOR UPDATE"), _order_for_update),
+    (re.compile(r"UPDATE Orders SET status = %s WHERE id = %s"), _order_set_status),
+    (re.compile(r"^SELECT o\.customer_id, od\.variant_id FROM Orders o JOIN OrderDetail od .* WHERE o\.id = %s$"),
+     _order_pairs),
+    (re.compile(r"INSERT IGNORE INTO PurchaseEligibility .* WHERE o\.id = %s"), _grant_eligibility),
+    (re.compile(r"DELETE pe FROM PurchaseEligibility pe .* WHERE NOT EXISTS"), _revoke_eligibility),
+    (re.compile(r"SELECT 1 AS eligible FROM PurchaseEligibility"), _is_eligible),
+    (re.compile(r"INSERT INTO Cart \(user_id, productvariant_id, quantity, total_price\) SELECT %s, pv\.id, %s"),
+     _cart_upsert),
+    (re.compile(r"FROM Cart c JOIN ProductVariant pv ON c\.productvariant_id = pv\.id JOIN Products p"), _cart_lines),
+    (re.compile(r"SELECT 1 AS found FROM ProductVariant WHERE id = %s"), _variant_exists),
+    (re.compile(r"SELECT scope, version FROM DataVersion WHERE scope IN \("), _select_versions),
+    (re.compile(r"INSERT INTO DataVersion \(scope, version\) VALUES .* ON DUPLICATE KEY UPDATE"), _bump_versions),
+    (re.compile(r"SELECT scope, changed_at FROM DataVersion WHERE changed_at > %s"), _changed_versions),
+    (re.compile(r"SELECT NOW\(6\) AS now"), lambda store, connection, query, params: ([{"now": datetime.now()}], 1)),
+    (re.compile(r"SELECT p\.id, p\.name, .* FROM Products p WHERE p\.id IN \("), _index_products),
+    (re.compile(r"SELECT COUNT\(\*\) as total FROM Products p"), _product_count),
+    (re.compile(r"FROM Products p LEFT JOIN Categories c .* ORDER BY p\.id LIMIT"), _product_page),
+    (re.compile(r"SELECT \* FROM ProductVariant WHERE product_id IN \("), _variants_by_products),
+    (re.compile(r"^SELECT \* FROM ProductVariant WHERE product_id = %s$"), _variants_of_product),
+    (re.compile(r"FROM Products p LEFT JOIN Categories c .* WHERE p\.id = %s;$"), _product_by_id),
+    (re.compile(r"UPDATE ProductVariant SET amount = amount - %s, product_id = LAST_INSERT_ID\(product_id\) "
+                r"WHERE id = %s AND amount >= %s"), _decrement),
+]
+
+
+class FakeStore:
+    """Bảng Categories / Products / ProductVariant / Cart / DataVersion trong bộ nhớ"""
+
+    def __init__(self):
+        self.categories = {1: "Gốm sứ", 2: "Mây tre đan", 3: "Sơn mài"}
+        self.products = {}
+        self.variants = {}
+        self.cart = {}      # (user_id, variant_id) -> {id, quantity}
+        self.orders = {}    # order_id -> {id, customer_id, status, variants}
+        self.eligibility = set()   # (customer_id, variant_id)
+        self.versions = {}
+        self.changed = {}   # scope -> changed_at của DataVersion
+        self.lowest = {}    # variant_id -> tồn kho thấp nhất từng ghi
+        # Mỗi câu lệnh chạy nguyên tử; khóa dòng giữ đến cuối transaction
+        self.statement_lock = threading.Lock()
+        self.row_locks = {}
+        self.executed = []
+
+    def add_product(self, product_id, category_id=1, status="In stock", variants=2):
+        self.products[product_id] = {
+            "id": product_id,
+            "name": f"Sản phẩm {product_id}",
+            "description": "Mô tả",
+            "category_id": category_id,
+            "status": status,
+            "artisan_description": "Nghệ nhân",
+        }
+        for index in range(variants):
+            self.add_variant(product_id * 100 + index, product_id)
+
+    def add_variant(self, variant_id, product_id, amount=10, price=150000.0):
+        self.variants[variant_id] = {
+            "id": variant_id, "product_id": product_id, "color": "Nâu",
+            "size": 20, "price": price, "amount": amount,
+        }
+
+    def add_order(self, order_id, customer_id, variants, status="pending"):
+        self.orders[order_id] = {"id": order_id, "customer_id": customer_id,
+                                 "status": status, "variants": list(variants)}
+
+    def bump(self, *scopes):
+        """Tăng DataVersion như VersionStore.bump (cũng dùng để giả lập worker khác ghi)"""
+        for scope in scopes:
+            self.versions[scope] = self.versions.get(scope, 0) + 1
+            self.changed[scope] = datetime.now()
+
+    def row_lock(self, key):
+        with self.statement_lock:
+            return self.row_locks.setdefault(key, threading.Lock())
+
+    def run(self, connection, query, params):
+        sql = " ".join(query.split())
+        self.executed.append(sql)
+        for pattern, handler in HANDLERS:
+            if pattern.search(sql):
+                return handler(self, connection, sql, tuple(params or ()))
+        raise AssertionError(f"FakeStore has no handler for: {sql}")
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+        self.rowcount = 0
+        self.lastrowid = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        started = time.perf_counter()
+        try:
+            result = self.connection.run(query, params)
+            self.rows, self.rowcount = result[:2]
+            self.lastrowid = result[2] if len(result) > 2 else None
+            return self.rowcount
+        finally:
+            record_query(query, started)
+
+    def executemany(self, query, seq_of_params):
+        return sum(self.execute(query, params) for params in seq_of_params)
+
+    def mogrify(self, query, params):
+        self.connection.mogrified.append(tuple(params))
+        return f"(#{len(self.connection.mogrified) - 1})"
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, store):
+        self.store = store
+        self.in_transaction = False
+        self.held = []      # khóa dòng đang giữ
+        self.undo = {}      # variant_id -> amount trước khi sửa
+        self.mogrified = [] # tham số của các dòng FakeCursor.mogrify đã trả về
+
+    def cursor(self, *args):
+        return FakeCursor(self)
+
+    def run(self, query, params):
+        try:
+            return self.store.run(self, query, params)
+        finally:
+            if not self.in_transaction:
+                self._release(commit=True)
+
+    def lock_row(self, variant_id):
+        lock = self.store.row_lock(variant_id)
+        if lock not in self.held:
+            lock.acquire()
+            self.held.append(lock)
+
+    def remember(self, variant_id, amount):
+        self.undo.setdefault(variant_id, amount)
+
+    def _release(self, commit):
+        if not commit:
+            for variant_id, amount in self.undo.items():
+                self.store.variants[variant_id]["amount"] = amount
+        self.undo.clear()
+        for lock in reversed(self.held):
+            lock.release()
+        self.held.clear()
+
+    def begin(self):
+        self.in_transaction = True
+
+    def commit(self):
+        self.in_transaction = False
+        self._release(commit=True)
+
+    def rollback(self):
+        self.in_transaction = False
+        self._release(commit=False)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def store():
+    """FakeStore rỗng; app.database mở kết nối vào store này trong suốt test"""
+    fake = FakeStore()
+    db.disconnect()
+    cache.clear()
+    with mock.patch.object(database_module.pymysql, "connect", lambda **kwargs: FakeConnection(fake)):
+        yield fake
+        db.disconnect()
+    cache.clear()
+
+
+@pytest.fixture
+def client(store):
+    from fastapi.testclient import TestClient
+    from main import app
+    return TestClient(app)
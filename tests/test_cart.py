@@ -0,0 +1,26 @@
+import pytest
+
+from app.dependencies import get_current_principal
+
+
+@pytest.fixture
+def customer(client, store):
+    store.add_product(1, variants=1)
+    client.app.dependency_overrides[get_current_principal] = lambda: {"id": 7, "role": "customer"}
+    yield client
+    client.app.dependency_overrides.clear()
+
+
+def test_setting_the_same_quantity_again_is_not_a_404(customer):
+    first = customer.put("/cart/items/100", json={"quantity": 3})
+    again = customer.put("/cart/items/100", json={"quantity": 3})
+
+    assert first.status_code == 200, first.text
+    assert again.status_code == 200, again.text
+    assert again.json()["items"][0]["quantity"] == 3
+
+
+def test_unknown_variant_is_a_404(customer):
+    response = customer.put("/cart/items/999", json={"quantity": 3})
+
+    assert response.status_code == 404
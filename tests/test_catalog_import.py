@@ -0,0 +1,26 @@
+import json
+
+from app.services.catalog_import import import_catalog
+
+
+def product_line(name, category_id, colors=("Nâu",)):
+    return json.dumps({
+        "name": name, "description": "Mô tả", "category_id": category_id, "status": "In stock",
+        "artisan_description": "Nghệ nhân",
+        "variants": [{"color": color, "size": 20, "price": 150000.0, "amount": 5} for color in colors],
+    }, ensure_ascii=False)
+
+
+def test_import_checks_categories_and_writes_valid_products(store):
+    lines = [
+        product_line("Bình gốm", 1, colors=("Nâu", "Men lam")),
+        product_line("Giỏ mây", 9),
+        product_line("Hộp sơn mài", 3),
+    ]
+
+    report = import_catalog(lines, "ndjson")
+
+    assert report["created"] == 2
+    assert report["errors"] == [{"row": 2, "error": "Category 9 not found"}]
+    assert sorted(p["name"] for p in store.products.values()) == ["Bình gốm", "Hộp sơn mài"]
+    assert sorted(v["color"] for v in store.variants.values()) == ["Men lam", "Nâu", "Nâu"]
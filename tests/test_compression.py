@@ -0,0 +1,71 @@
+import asyncio
+import gzip
+
+from app.compression import CompressionMiddleware
+
+
+def make_app(bodies):
+    """App ASGI trả lần lượt các body trong `bodies`, luôn cùng một ETag"""
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json"), (b"etag", b'"same"')],
+        })
+        await send({"type": "http.response.body", "body": bodies.pop(0)})
+    return app
+
+
+def call(middleware, accept_encoding=b"gzip", messages=None):
+    messages = [] if messages is None else messages
+
+    async def send(message):
+        messages.append(message)
+
+    headers = [(b"accept-encoding", accept_encoding)] if accept_encoding else []
+    asyncio.run(middleware({"type": "http", "headers": headers}, None, send))
+    return messages[-1]["body"]
+
+
+def vary(messages):
+    return [value for key, value in messages[0]["headers"] if key == b"vary"]
+
+
+def test_cached_compressed_body_always_matches_rendered_body():
+    old = b'{"items": [' + b'"gio may", ' * 200 + b'"cu"]}'
+    new = b'{"items": [' + b'"binh gom", ' * 200 + b'"moi"]}'
+    middleware = CompressionMiddleware(make_app([old, new, new]), minimum_size=10)
+
+    assert gzip.decompress(call(middleware)) == old
+    # Cùng ETag nhưng body khác: không được trả bản nén của body cũ
+    assert gzip.decompress(call(middleware)) == new
+    assert gzip.decompress(call(middleware)) == new
+    assert middleware.cache.hits == 1
+
+
+def test_compressed_body_cache_is_bounded_by_bytes():
+    bodies = [f'{{"page": {i}, "items": "{i}"}}'.encode() * 50 for i in range(10)]
+    middleware = CompressionMiddleware(make_app(list(bodies)), minimum_size=10, cache_bytes=500)
+
+    for _ in bodies:
+        call(middleware)
+
+    stats = middleware.cache.stats()
+    assert 0 < stats["entries"] < len(bodies)
+    assert stats["bytes"] <= 500
+    assert stats["evictions"] == len(bodies) - stats["entries"]
+
+
+def test_every_compressible_response_varies_on_accept_encoding():
+    large = b'{"items": [' + b'"gio may", ' * 200 + b'"cu"]}'
+    cases = [
+        (large, b"gzip"),        # bản nén
+        (b'{"ok": true}', b"gzip"),   # nhỏ hơn minimum_size
+        (large, None),           # client không gửi Accept-Encoding
+        (large, b"identity"),
+    ]
+    for body, accept_encoding in cases:
+        messages = []
+        middleware = CompressionMiddleware(make_app([body]), minimum_size=100)
+        call(middleware, accept_encoding, messages)
+        assert vary(messages) == [b"Accept-Encoding"], accept_encoding
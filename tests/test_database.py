@@ -0,0 +1,152 @@
+import pymysql
+import pytest
+
+from app.database import Transaction
+from app.models.product import Product
+
+
+class AutoIncrementServer:
+    """
+    Bảng AUTO_INCREMENT giả: mỗi câu INSERT nhiều dòng nhận một dải id liên
+    tiếp (bước auto_increment_increment); giữa hai câu có thể có người khác
+    chèn dòng, nên id của các câu không nối tiếp nhau.
+    """
+
+    def __init__(self, step=1, concurrent_rows=0):
+        self.step = step
+        self.next_id = 1
+        self.concurrent_rows = concurrent_rows
+        self.rows = {}          # id -> dòng (chuỗi VALUES)
+        self.statements = []
+
+    def insert(self, rows):
+        first_id = self.next_id
+        for index, row in enumerate(rows):
+            self.rows[first_id + index * self.step] = row
+        self.next_id = first_id + len(rows) * self.step
+        # Một transaction khác chèn dòng trước câu kế tiếp
+        self.next_id += self.concurrent_rows * self.step
+        return first_id
+
+
+class FakeCursor:
+    def __init__(self, server):
+        self.server = server
+        self.rows = []
+        self.lastrowid = None
+
+    def mogrify(self, query, args):
+        return query % tuple(pymysql.converters.escape_item(arg, "utf8mb4") for arg in args)
+
+    def execute(self, query, params=None):
+        if "@@auto_increment_increment" in query:
+            self.rows = [{"step": self.server.step}]
+            return 1
+        self.server.statements.append(query)
+        values = query.split("VALUES", 1)[1].strip()
+        rows = values[1:-1].split("),(")
+        self.lastrowid = self.server.insert(rows)
+        return len(rows)
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+
+    def cursor(self, *args):
+        return FakeCursor(self.server)
+
+
+@pytest.mark.parametrize("step, concurrent_rows", [(1, 0), (2, 0), (1, 3), (5, 7)])
+def test_insert_many_returns_the_ids_of_each_row(step, concurrent_rows):
+    server = AutoIncrementServer(step, concurrent_rows)
+    tx = Transaction(FakeConnection(server))
+    names = [f"Giỏ mây {i} " + "đan tay " * 20 for i in range(50)]
+
+    ids = tx.insert_many("INSERT INTO Products (name) VALUES (%s)", [(name,) for name in names], max_bytes=1000)
+
+    # Đã phải chia thành nhiều câu, id vẫn khớp đúng dòng của nó
+    assert len(server.statements) > 1
+    assert [server.rows[product_id] for product_id in ids] == [f"'{name}'" for name in names]
+
+
+def test_product_save_many_ids_survive_statement_split(monkeypatch):
+    monkeypatch.setattr("app.database.MAX_INSERT_BYTES", 2000)
+    server = AutoIncrementServer(step=2, concurrent_rows=1)
+    tx = Transaction(FakeConnection(server))
+    products = [
+        Product(f"Bình gốm {i}", "Mô tả dài " * 30, 1, "In stock", "Nghệ nhân Bát Tràng")
+        for i in range(40)
+    ]
+
+    product_ids = Product.save_many(tx, products)
+
+    assert len(server.statements) > 1
+    assert [server.rows[pid].split(",")[0] for pid in product_ids] == [f"'Bình gốm {i}'" for i in range(40)]
+    assert tx.callbacks  # cache / chỉ mục được xóa sau commit
+
+
+def test_variant_save_many_ids_follow_auto_increment_step():
+    from app.models.product_variant import ProductVariant
+
+    server = AutoIncrementServer(step=3)
+    tx = Transaction(FakeConnection(server))
+    variants = [{"color": f"Màu {i}", "size": 20, "price": 150000.0, "amount": 5} for i in range(4)]
+
+    created = ProductVariant.save_many(tx, 7, variants)
+
+    assert [v["id"] for v in created] == [1, 4, 7, 10]
+    assert [server.rows[v["id"]].split(",")[1].strip() for v in created] == [f"'Màu {i}'" for i in range(4)]
+
+
+class PingCounter:
+    def __init__(self):
+        self.pings = 0
+        self.closed = False
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+
+    def close(self):
+        self.closed = True
+
+
+def test_pool_only_pings_connections_idle_longer_than_ping_after(monkeypatch):
+    import time
+
+    from app.database import ConnectionPool
+
+    connection = PingCounter()
+    monkeypatch.setattr("app.database.pymysql.connect", lambda **kwargs: connection)
+    pool = ConnectionPool({}, min_size=1, max_size=1, ping_after=30)
+
+    for _ in range(3):
+        pool.release(pool.acquire())
+    assert connection.pings == 0
+
+    # Kết nối rảnh quá ping_after: ping một lần trước khi dùng lại
+    pool._idle = [(connection, time.monotonic() - 60)]
+    assert pool.acquire() is connection
+    assert connection.pings == 1
+    assert pool.stats()["pings"] == 1
+
+
+def test_lost_connection_is_discarded_from_the_pool(store):
+    from app.database import db
+
+    discarded = db.pool_stats()["discarded"]
+    with pytest.raises(pymysql.err.OperationalError):
+        with db.connection():
+            raise pymysql.err.OperationalError(2013, "Lost connection to MySQL server during query")
+    assert db.pool_stats()["discarded"] == discarded + 1
+
+    with pytest.raises(ValueError):
+        with db.connection():
+            raise ValueError("Sản phẩm không hợp lệ")
+    assert db.pool_stats()["discarded"] == discarded + 1
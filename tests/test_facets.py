@@ -0,0 +1,49 @@
+from app.services.facets import FacetIndex, iter_bits
+
+
+def make_index(rows):
+    index = FacetIndex()
+    for product_id, values in index._load_rows(rows).items():
+        index._add(product_id, values)
+    return index
+
+
+def variant(product_id, color, size, price=150000, category_id=1):
+    return {"id": product_id, "category_id": category_id, "color": color, "size": size, "price": price}
+
+
+def test_variant_facets_must_match_on_the_same_variant():
+    index = make_index([
+        # Sản phẩm 1: đỏ size 40 và xanh size 15, không variant nào vừa đỏ vừa 10-20
+        variant(1, "Red", 40),
+        variant(1, "Blue", 15),
+        variant(2, "red", 15),
+    ])
+
+    product_ids, total, counts = index.query({"color": ["red"], "size": ["10-20"]})
+
+    assert product_ids == [2]
+    assert total == 1
+    # Số lượng mỗi facet tính theo bộ lọc của facet còn lại, trên cùng variant
+    assert counts["color"] == {"red": 1, "blue": 1}
+    assert counts["size"]["10-20"] == 1
+    assert counts["size"]["30-50"] == 1
+    assert counts["category"] == {"1": 1}
+
+
+def test_products_without_variants_only_match_category_filters():
+    index = make_index([
+        {"id": 3, "category_id": 2, "color": None, "size": None, "price": None},
+        variant(4, "nâu", 25, category_id=2),
+    ])
+
+    assert index.query({"category": ["2"]})[:2] == ([3, 4], 2)
+    assert index.query({"category": ["2"], "color": ["nâu"]})[:2] == ([4], 1)
+
+
+def test_iter_bits_pages_over_set_bits():
+    bitmap = sum(1 << i for i in (0, 3, 64, 65, 200))
+
+    assert list(iter_bits(bitmap)) == [0, 3, 64, 65, 200]
+    assert list(iter_bits(bitmap, skip=1, limit=3)) == [3, 64, 65]
+    assert list(iter_bits(0)) == []
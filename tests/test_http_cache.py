@@ -0,0 +1,75 @@
+from app.models.product_variant import ProductVariant
+from app.testing import query_budget
+
+
+def test_etag_only_depends_on_database_versions(client, store):
+    store.add_product(1)
+
+    first = client.get("/products/")
+    second = client.get("/products/")
+
+    assert first.status_code == 200
+    assert first.headers["etag"] == second.headers["etag"]
+
+    # Ghi từ worker khác / lệnh CLI: chỉ bảng DataVersion thay đổi
+    store.bump("catalog")
+    third = client.get("/products/", headers={"If-None-Match": first.headers["etag"]})
+
+    assert third.status_code == 200
+    assert third.headers["etag"] != first.headers["etag"]
+
+
+def test_matching_etag_returns_304_after_one_query(client, store):
+    store.add_product(1)
+    etag = client.get("/products/?include_variants=true").headers["etag"]
+
+    with query_budget(1) as stats:
+        response = client.get("/products/?include_variants=true", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert stats.count == 1
+
+
+def test_stock_change_bumps_catalog_and_product_versions(client, store):
+    store.add_product(1)
+    etag = client.get("/products/").headers["etag"]
+
+    assert ProductVariant.decrement_stock(100, 1)
+
+    assert store.versions["catalog"] == 1
+    assert store.versions["product:1"] == 1
+    response = client.get("/products/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_cached_body_is_reloaded_when_another_worker_bumps_the_version(client, store):
+    store.add_product(1)
+    first = client.get("/products/1")
+    assert first.json()["name"] == "Sản phẩm 1"
+
+    # Worker khác sửa sản phẩm: cache trong process này không bị xóa,
+    # chỉ DataVersion đổi
+    store.products[1]["name"] = "Bình gốm Bát Tràng"
+    store.variants[100]["color"] = "Xanh"
+    store.bump("catalog", "product:1")
+    second = client.get("/products/1", headers={"If-None-Match": first.headers["etag"]})
+
+    assert second.status_code == 200
+    assert second.headers["etag"] != first.headers["etag"]
+    assert second.json()["name"] == "Bình gốm Bát Tràng"
+    assert second.json()["variants"][0]["color"] == "Xanh"
+    # ETag mới đi với body mới: client gửi lại thì nhận 304 cho đúng body đó
+    third = client.get("/products/1", headers={"If-None-Match": second.headers["etag"]})
+    assert third.status_code == 304
+
+
+def test_cached_body_is_reused_while_versions_are_unchanged(client, store):
+    store.add_product(1)
+    client.get("/products/1")
+
+    with query_budget(1) as stats:
+        response = client.get("/products/1")
+
+    assert response.status_code == 200
+    assert stats.count == 1  # chỉ câu SELECT DataVersion
@@ -0,0 +1,22 @@
+from app import metrics
+
+
+def worker_snapshot(requests, index_products, dirty):
+    labels = metrics._label_key({"index": "search"})
+    return {
+        "http_requests_total": {"type": "counter", "help": "", "buckets": [],
+                                "samples": {metrics._label_key({}): requests}},
+        "catalog_index_products": {"type": "gauge", "help": "", "buckets": [],
+                                   "samples": {labels: index_products}},
+        "catalog_index_dirty": {"type": "gauge", "help": "", "buckets": [],
+                                "samples": {labels: dirty}},
+    }
+
+
+def test_merge_sums_counters_but_not_per_worker_index_copies():
+    merged = metrics.merge([worker_snapshot(5, 1000, 2), worker_snapshot(7, 1000, 0), worker_snapshot(1, 998, 3)])
+
+    label = metrics._label_key({"index": "search"})
+    assert merged["http_requests_total"]["samples"][metrics._label_key({})] == 13
+    assert merged["catalog_index_products"]["samples"][label] == 1000
+    assert merged["catalog_index_dirty"]["samples"][label] == 3
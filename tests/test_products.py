@@ -0,0 +1,77 @@
+import pytest
+
+from app.testing import query_budget
+
+# Trang sản phẩm: phiên bản cho ETag + danh sách + COUNT + một câu IN (...)
+# cho toàn bộ variant
+LIST_QUERIES = 4
+
+
+@pytest.fixture
+def catalog(store):
+    for product_id in range(1, 121):
+        store.add_product(product_id, category_id=1 + product_id % 3, variants=3)
+    return store
+
+
+@pytest.mark.parametrize("limit", [1, 20, 100])
+def test_product_list_with_variants_uses_fixed_query_count(client, catalog, limit):
+    with query_budget(LIST_QUERIES, max_repeats=1) as stats:
+        response = client.get(f"/products/?include_variants=true&limit={limit}")
+
+    assert response.status_code == 200, response.text
+    items = response.json()["items"]
+    assert len(items) == limit
+    assert all(len(item["variants"]) == 3 for item in items)
+    assert stats.count == LIST_QUERIES
+
+
+@pytest.mark.parametrize("limit", [1, 20, 100])
+def test_category_list_with_variants_uses_fixed_query_count(client, catalog, limit):
+    with query_budget(LIST_QUERIES, max_repeats=1) as stats:
+        response = client.get(f"/products/category/2?include_variants=true&limit={limit}")
+
+    assert response.status_code == 200, response.text
+    items = response.json()["items"]
+    assert items and all(item["category_id"] == 2 for item in items)
+    assert all(len(item["variants"]) == 3 for item in items)
+    assert stats.count == LIST_QUERIES
+
+
+def test_empty_category_page_keeps_total_and_cache_headers(client, catalog):
+    full = client.get("/products/category/2?limit=100").json()
+    response = client.get("/products/category/2?skip=100")
+
+    assert response.status_code == 200
+    assert response.json() == {"items": [], "total": full["total"], "skip": 100, "limit": 10, "next_cursor": None}
+    assert response.headers["etag"]
+    assert response.headers["cache-control"]
+    again = client.get("/products/category/2?skip=100", headers={"If-None-Match": response.headers["etag"]})
+    assert again.status_code == 304
+
+
+def test_update_status_of_unknown_product_is_404(client, store):
+    response = client.put("/products/42/status", params={"status": "In stock"})
+
+    assert response.status_code == 404
+
+
+def test_update_status_rejects_invalid_status_with_400(client, store):
+    store.add_product(1)
+
+    response = client.put("/products/1/status", params={"status": "sold"})
+
+    assert response.status_code == 400
+
+
+def test_update_status_only_invalidates_when_the_row_changed(client, store):
+    store.add_product(1, status="In stock")
+
+    unchanged = client.put("/products/1/status", params={"status": "In stock"})
+    assert unchanged.status_code == 200
+    assert "product:1" not in store.versions
+
+    changed = client.put("/products/1/status", params={"status": "out of stock"})
+    assert changed.status_code == 200
+    assert store.products[1]["status"] == "out of stock"
+    assert store.versions["product:1"] == 1
@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from app.models import purchase_eligibility
+from app.models.order import Order
+from app.models.purchase_eligibility import PurchaseEligibility
+
+
+@pytest.fixture
+def orders(store):
+    purchase_eligibility._eligible.clear()
+    store.add_order(1, customer_id=7, variants=[100, 101])
+    store.add_order(2, customer_id=7, variants=[101])
+    yield store
+    purchase_eligibility._eligible.clear()
+
+
+def test_cancelling_a_received_order_revokes_eligibility(orders):
+    Order.update_status(1, "received")
+    assert PurchaseEligibility.is_eligible(7, 100)   # kết quả được cache
+
+    Order.update_status(1, "cancelled")
+
+    assert orders.eligibility == set()
+    assert not PurchaseEligibility.is_eligible(7, 100)
+
+
+def test_revoke_keeps_pairs_covered_by_another_received_order(orders):
+    Order.update_status(1, "received")
+    Order.update_status(2, "received")
+    assert PurchaseEligibility.is_eligible(7, 101)
+
+    Order.update_status(1, "cancelled")
+
+    assert orders.eligibility == {(7, 101)}
+    assert PurchaseEligibility.is_eligible(7, 101)
+    assert not PurchaseEligibility.is_eligible(7, 100)
+
+
+def test_cached_grant_expires_when_revoked_elsewhere(orders, monkeypatch):
+    monkeypatch.setattr(purchase_eligibility._eligible, "ttl", 0.05)
+    Order.update_status(1, "received")
+    assert PurchaseEligibility.is_eligible(7, 100)
+
+    # Worker khác hủy đơn: cache của process này không được xóa
+    orders.eligibility.clear()
+    assert PurchaseEligibility.is_eligible(7, 100)
+    time.sleep(0.1)
+
+    assert not PurchaseEligibility.is_eligible(7, 100)
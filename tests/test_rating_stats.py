@@ -0,0 +1,53 @@
+import re
+
+from app.models.rating_stats import RatingStats
+
+
+class StatsTx:
+    """Transaction giả cho hai bảng thống kê rating (variant 10 thuộc sản phẩm 1)"""
+
+    def __init__(self):
+        self.tables = {"VariantRatingStats": {}, "ProductRatingStats": {}}
+
+    def fetch_one(self, query, params):
+        return {"product_id": 1} if params == (10,) else None
+
+    def execute(self, query, params):
+        sql = " ".join(query.split())
+        table = re.search(r"(?:INTO|UPDATE) (\w+)", sql).group(1)
+        star = re.search(r"star_\d", sql).group(0)
+        rows = self.tables[table]
+        if sql.startswith("INSERT"):
+            key, count, total, stars = params
+            row = rows.setdefault(key, {"review_count": 0, "rating_sum": 0, star: 0})
+            row["review_count"] += count
+            row["rating_sum"] += total
+            row[star] = row.get(star, 0) + stars
+            return 1
+        count, total, stars, key = params
+        row = rows.get(key)
+        if row is None:
+            return 0
+        row["review_count"] = max(row["review_count"] - count, 0)
+        row["rating_sum"] = max(row["rating_sum"] - total, 0)
+        row[star] = max(row.get(star, 0) - stars, 0)
+        return 1
+
+
+def test_removing_a_review_without_stats_row_creates_no_negative_row():
+    tx = StatsTx()
+
+    assert RatingStats.apply(tx, 10, 4, -1) == 1
+
+    assert tx.tables == {"VariantRatingStats": {}, "ProductRatingStats": {}}
+
+
+def test_add_then_remove_returns_to_zero_and_never_below():
+    tx = StatsTx()
+    RatingStats.apply(tx, 10, 5, 1)
+    RatingStats.apply(tx, 10, 5, -1)
+    RatingStats.apply(tx, 10, 5, -1)
+
+    empty = {"review_count": 0, "rating_sum": 0, "star_5": 0}
+    assert tx.tables["VariantRatingStats"] == {10: empty}
+    assert tx.tables["ProductRatingStats"] == {1: empty}
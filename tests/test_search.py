@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from app.services.search import SearchIndex, tokenize
+
+WORDS = ["gom", "may", "tre", "son", "mai", "binh", "gio", "den", "lua", "coi"]
+
+
+@pytest.fixture
+def index():
+    rng = random.Random(7)
+    index = SearchIndex()
+    for product_id in range(1, 401):
+        index.upsert({
+            "id": product_id,
+            "name": " ".join(rng.sample(WORDS, 2)),
+            "description": " ".join(rng.choices(WORDS, k=6)),
+            "artisan_description": "",
+            "category_id": 1 + product_id % 4,
+            "status": "In stock" if product_id % 3 else "Out of stock",
+        })
+    return index
+
+
+@pytest.mark.parametrize("query", ["gom", "gom may", "binh den lua", "coi tre son mai gio"])
+@pytest.mark.parametrize("category_id, status", [(None, None), (2, None), (None, "out of stock"), (3, "in stock")])
+def test_total_and_ranking_match_brute_force(index, query, category_id, status):
+    terms = set(tokenize(query))
+    expected = {
+        product_id for product_id, frequencies in index._terms.items()
+        if terms & set(frequencies)
+        and (category_id is None or index._meta[product_id][0] == category_id)
+        and (status is None or index._meta[product_id][1] == status)
+    }
+
+    hits, total = index.search(query, category_id, status, skip=0, limit=len(expected) or 1)
+    page, page_total = index.search(query, category_id, status, skip=5, limit=10)
+
+    assert total == page_total == len(expected)
+    assert {product_id for product_id, _ in hits} == expected
+    scores = [score for _, score in hits]
+    assert scores == sorted(scores, reverse=True)
+    assert page == hits[5:15]
+
+
+def test_total_is_recounted_after_index_changes(index):
+    _, before = index.search("tre")
+    index.upsert({"id": 9999, "name": "tre", "category_id": 1, "status": "In stock"})
+    _, after = index.search("tre")
+
+    assert after == before + 1
+
+
+def test_changes_from_other_processes_are_picked_up(store):
+    store.add_product(1, variants=0)
+    store.add_product(2, variants=0)
+    index = SearchIndex()
+    for product_id in (1, 2):
+        index.upsert(store.products[product_id])
+    index._changes.interval = 0
+    index._changes.start()
+    index.ready = True
+
+    # Worker khác / lệnh CLI sửa sản phẩm 2 và xóa sản phẩm 1: chỉ DataVersion
+    # báo cho process này biết
+    store.products[2]["name"] = "Bình gốm Bát Tràng"
+    del store.products[1]
+    store.bump("catalog", "product:1", "product:2")
+
+    hits, total = index.search("binh gom")
+
+    assert total == 1
+    assert hits[0][0] == 2
+    assert index.search("san pham")[1] == 0
@@ -0,0 +1,56 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.models.product_variant import InsufficientStockError, ProductVariant
+
+WORKERS = 16
+
+
+def run_concurrently(func, attempts):
+    """Chạy func `attempts` lần trên WORKERS thread, bắt đầu cùng lúc"""
+    barrier = threading.Barrier(WORKERS)
+
+    def attempt(index):
+        if index < WORKERS:
+            barrier.wait()
+        return func(index)
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        return list(executor.map(attempt, range(attempts)))
+
+
+@pytest.mark.parametrize("stock, quantity", [(25, 1), (40, 3)])
+def test_concurrent_decrement_never_oversells(store, stock, quantity):
+    store.add_product(1, variants=0)
+    store.add_variant(100, 1, amount=stock)
+
+    results = run_concurrently(lambda index: ProductVariant.decrement_stock(100, quantity), 100)
+
+    assert sum(results) == stock // quantity
+    assert store.variants[100]["amount"] == stock % quantity
+    assert store.lowest[100] >= 0
+
+
+def test_concurrent_reserve_many_is_all_or_nothing(store):
+    store.add_product(1, variants=0)
+    store.add_variant(100, 1, amount=30)
+    store.add_variant(101, 1, amount=12)
+
+    def reserve(index):
+        # Xen kẽ thứ tự các dòng: reserve_many vẫn khóa theo id tăng dần
+        items = [(101, 1), (100, 1)] if index % 2 else {100: 1, 101: 1}
+        try:
+            ProductVariant.reserve(items)
+            return True
+        except InsufficientStockError:
+            return False
+
+    results = run_concurrently(reserve, 60)
+
+    # Variant 101 hết hàng trước; các lần giữ thất bại đã trả lại variant 100
+    assert sum(results) == 12
+    assert store.variants[100]["amount"] == 30 - 12
+    assert store.variants[101]["amount"] == 0
+    assert min(store.lowest.values()) >= 0